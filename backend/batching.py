@@ -0,0 +1,233 @@
+"""
+Dynamic micro-batching for image inference
+Collects concurrent image requests and runs one stacked forward pass per ensemble model
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
+
+import torch
+
+import metrics
+
+
+class _PendingImage:
+    """A single image request waiting to be batched"""
+
+    __slots__ = ("image", "color_order", "model_names", "future", "enqueued_at", "timings")
+
+    def __init__(self, image, model_names: Optional[list] = None, color_order: str = 'rgb'):
+        self.image = image
+        self.color_order = color_order
+        self.model_names = model_names
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        # Stage timings of the submitting request, filled in by the batching thread
+        self.timings = metrics.current_timings()
+
+
+class ImageBatchScheduler:
+    """
+    Groups concurrent image requests into batches for DeepfakeModelLoader
+
+    A batch is dispatched as soon as it holds `max_batch_size` images or when
+    `max_wait_ms` has elapsed since its first image arrived, whichever comes first.
+    """
+
+    def __init__(self, model_loader, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 weights: Dict[str, float] = None):
+        self.model_loader = model_loader
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.weights = weights
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._worker = None
+        self._running = False
+
+        # Counters
+        self.batches_run = 0
+        self.images_processed = 0
+        self.batch_size_counts = {}
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    @classmethod
+    def from_env(cls, model_loader) -> "ImageBatchScheduler":
+        """Build a scheduler from IMAGE_BATCH_MAX_SIZE / IMAGE_BATCH_WINDOW_MS"""
+        return cls(
+            model_loader,
+            max_batch_size=int(os.getenv("IMAGE_BATCH_MAX_SIZE", "8")),
+            max_wait_ms=float(os.getenv("IMAGE_BATCH_WINDOW_MS", "5"))
+        )
+
+    def start(self):
+        """Start the background batching thread"""
+        if self._running:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="image-batcher", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the batching thread after the current batch finishes"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def submit(self, image, model_names: Optional[list] = None, color_order: str = 'rgb') -> Future:
+        """
+        Queue an image (path, array or tensor) and return a Future resolving to its ensemble result
+
+        `model_names` restricts the ensemble to a subset of the loaded models;
+        `color_order` is the channel order of array input ('rgb' or 'bgr').
+        """
+        if not self._running:
+            self.start()
+        pending = _PendingImage(image, model_names, color_order)
+        self._queue.put(pending)
+        return pending.future
+
+    def ensemble_predict(self, image, timeout: Optional[float] = None,
+                         model_names: Optional[list] = None, color_order: str = 'rgb') -> Dict[str, Any]:
+        """Blocking equivalent of DeepfakeModelLoader.ensemble_predict"""
+        return self.submit(image, model_names, color_order).result(timeout=timeout)
+
+    def _collect_batch(self, first: _PendingImage) -> list:
+        """Gather requests until the batch is full or the window closes"""
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown requested; finish this batch first
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while self._running:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+            self._process_batch(batch)
+
+    def _process_batch(self, batch: list):
+        started_at = time.perf_counter()
+        with metrics.collect_timings() as batch_timings:
+            outcomes = self._run_batch(batch)
+
+        # Every request in the batch is charged an equal share of the stacked forward,
+        # so the stage histogram counts it once; hand the timings over before resolving
+        # the futures so the waiting request sees them
+        share = 1.0 / len(batch)
+        for pending in batch:
+            if pending.timings is not None:
+                pending.timings.append(("batch_queue", started_at - pending.enqueued_at))
+                pending.timings.extend((name, seconds * share) for name, seconds in batch_timings)
+
+        for pending, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                pending.future.set_exception(outcome)
+            else:
+                pending.future.set_result(outcome)
+
+        self._record_batch(batch, started_at)
+
+    def _run_batch(self, batch: list) -> list:
+        """Return (pending, result or exception) for every request in the batch"""
+        outcomes = []
+
+        # Resize every image; failures drop out of the stacked forward
+        resized = []
+        ready = []
+        for pending in batch:
+            try:
+                resized.append(self.model_loader.resize_input(pending.image, pending.color_order))
+                ready.append(pending)
+            except Exception as e:
+                outcomes.append((pending, {
+                    "error": f"Failed to load image: {e}",
+                    "individual_predictions": {}
+                }))
+
+        if ready:
+            try:
+                # The batch is finished with before this thread prepares the next one
+                predictions = self._predict(ready, self.model_loader.normalize_inputs(resized, reuse=True))
+                for pending, individual in zip(ready, predictions):
+                    outcomes.append((pending, self.model_loader.aggregate_predictions(individual, self.weights)))
+            except Exception as e:
+                outcomes.extend((pending, e) for pending in ready)
+
+        return outcomes
+
+    def _predict(self, ready: list, stacked: torch.Tensor) -> list:
+        """Per-image model predictions, running each model once over the images that asked for it"""
+        requested = [pending.model_names for pending in ready]
+        if all(names == requested[0] for names in requested):
+            return self.model_loader.predict_ensemble_batch(stacked, requested[0], record_latency=True)
+
+        # Requests with latency budgets may want different subsets
+        all_models = list(self.model_loader.models.keys())
+        predictions = [{} for _ in ready]
+        if self.model_loader.cascade is not None:
+            # Requests without a subset still go through the cascade
+            default_rows = [i for i, names in enumerate(requested) if names is None]
+            if default_rows:
+                cascaded = self.model_loader.predict_ensemble_batch(stacked[default_rows], record_latency=True)
+                for i, prediction in zip(default_rows, cascaded):
+                    predictions[i] = prediction
+            requested = [names if names is not None else [] for names in requested]
+        else:
+            requested = [names or all_models for names in requested]
+
+        for model_name in all_models:
+            rows = [i for i, names in enumerate(requested) if model_name in names]
+            if not rows:
+                continue
+            rows_batch = stacked if len(rows) == len(ready) else stacked[rows]
+            for i, prediction in zip(rows, self.model_loader.predict_batch(rows_batch, [model_name],
+                                                                                record_latency=True)):
+                predictions[i].update(prediction)
+        return predictions
+
+    def _record_batch(self, batch: list, started_at: float):
+        delays = [started_at - pending.enqueued_at for pending in batch]
+        with self._stats_lock:
+            self.batches_run += 1
+            self.images_processed += len(batch)
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+            self.total_queue_delay += sum(delays)
+            self.max_queue_delay = max(self.max_queue_delay, max(delays))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batch size and queue delay counters"""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.max_wait * 1000.0,
+                "batches_run": self.batches_run,
+                "images_processed": self.images_processed,
+                "queued_images": self._queue.qsize(),
+                "average_batch_size": (self.images_processed / self.batches_run) if self.batches_run else 0.0,
+                "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+                "average_queue_delay_ms": (self.total_queue_delay / self.images_processed * 1000.0) if self.images_processed else 0.0,
+                "max_queue_delay_ms": self.max_queue_delay * 1000.0
+            }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cascade benchmark
+Scores the same images with the full ensemble and with the confidence-gated
+cascade, then reports how often each cascade stage fires, the CPU time per
+image for both, and how often the two verdicts agree.
+
+Usage: python benchmark_cascade.py [--low 0.2] [--high 0.8] [paths ...]
+Paths may be images, videos (frames are sampled) or directories of either.
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+
+from deepfake_models import EnsembleCascade
+from inference import DeepSecureInference
+from uploads import IMAGE_SUFFIXES
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATHS = [
+    os.path.join(BACKEND_DIR, "DeepSecure-AI", "images"),
+    os.path.join(BACKEND_DIR, "DeepSecure-AI", "videos")
+]
+VIDEO_SUFFIXES = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def load_images(paths: list, frames_per_video: int) -> list:
+    """(name, RGB array) for every image, plus evenly spaced frames of every video"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        else:
+            files.append(path)
+
+    images = []
+    for path in files:
+        lower = path.lower()
+        if lower.endswith(IMAGE_SUFFIXES):
+            image = cv2.imread(path)
+            if image is not None:
+                images.append((os.path.basename(path), cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+        elif lower.endswith(VIDEO_SUFFIXES):
+            capture = cv2.VideoCapture(path)
+            total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            step = max(total // frames_per_video, 1)
+            for index in range(0, total, step)[:frames_per_video]:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ok, frame = capture.read()
+                if ok:
+                    images.append((f"{os.path.basename(path)}#{index}", cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+            capture.release()
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--low", type=float, default=float(os.getenv("CASCADE_UNCERTAIN_LOW", "0.2")))
+    parser.add_argument("--high", type=float, default=float(os.getenv("CASCADE_UNCERTAIN_HIGH", "0.8")))
+    parser.add_argument("--order", default=os.getenv("CASCADE_ORDER", ""))
+    parser.add_argument("--frames-per-video", type=int, default=8)
+    args = parser.parse_args()
+
+    engine = DeepSecureInference(start_batching=False)
+    loader = engine.model_loader
+    if loader is None:
+        print("❌ The deepfake models are not loaded; nothing to benchmark")
+        return
+
+    images = load_images(args.paths, args.frames_per_video)
+    if not images:
+        print("❌ No images found")
+        return
+    engine.warm_up(batch_sizes=[1])
+
+    order = [name.strip() for name in args.order.split(",") if name.strip()]
+    cascade = EnsembleCascade(args.low, args.high, order or None)
+
+    full_cpu = cascade_cpu = 0.0
+    agree = 0
+    max_difference = 0.0
+    for name, image in images:
+        tensor = loader.load_input_tensor(image).unsqueeze(0)
+
+        loader.cascade = None
+        started = time.process_time()
+        full = loader.aggregate_predictions(loader.predict_ensemble_batch(tensor)[0])
+        full_cpu += time.process_time() - started
+
+        loader.cascade = cascade
+        started = time.process_time()
+        gated = loader.aggregate_predictions(loader.predict_ensemble_batch(tensor)[0])
+        cascade_cpu += time.process_time() - started
+
+        agree += full["ensemble_is_fake"] == gated["ensemble_is_fake"]
+        max_difference = max(max_difference, abs(full["ensemble_fake_probability"] - gated["ensemble_fake_probability"]))
+
+    count = len(images)
+    stats = cascade.get_stats()
+    print(f"📊 {count} images, uncertainty band [{args.low}, {args.high}], order {', '.join(stats['order'])}")
+    print()
+    print(f"{'stage':<8}{'model':<16}{'fired':>8}{'fire rate':>12}{'exits':>8}")
+    for stage in stats["stages"]:
+        print(f"{stage['stage']:<8}{stage['model']:<16}{stage['fired']:>8}{stage['fire_rate']:>12.1%}{stage['exits']:>8}")
+    print()
+    print(f"CPU per image, full ensemble: {full_cpu / count * 1000.0:.1f} ms")
+    print(f"CPU per image, cascade:       {cascade_cpu / count * 1000.0:.1f} ms")
+    print(f"CPU saved:                    {(1 - cascade_cpu / full_cpu) if full_cpu else 0.0:.1%}")
+    print(f"Forwards skipped:             {stats['forwards_skipped_fraction']:.1%}")
+    print(f"Verdict agreement:            {agree}/{count}")
+    print(f"Max probability difference:   {max_difference:.4f}")
+
+
+if __name__ == "__main__":
+    main()
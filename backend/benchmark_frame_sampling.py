@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Frame sampling benchmark
+Compares the original read-every-frame loop with FrameSampler (sequential
+grab() and seeking) and, when ffmpeg is installed, FfmpegFrameSampler on frames
+read, frames grabbed, seeks, decode wall time and the time to preprocess the
+frames into model input, and checks that every method returns the same frames.
+
+Usage: python benchmark_frame_sampling.py [--frames 10] [--synthetic-minutes 2]
+                                          [--synthetic-size 640x360] [videos ...]
+Without videos, a synthetic 60 fps clip of --synthetic-minutes is written to a temp dir.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+from torchvision import transforms
+
+from video_sampling import FrameSampler, FfmpegFrameSampler
+
+# Same preprocessing as DeepfakeModelLoader._get_transforms
+PREPROCESS = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+
+def legacy_extract(video_path: str, max_frames: int):
+    """The loop FrameSampler replaced: read() every frame up to the last sampled one"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    sample_indices = np.linspace(0, total_frames - 1, min(max_frames, total_frames), dtype=int)
+    decoded = 0
+    for i in range(total_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        decoded += 1
+        if i in sample_indices:
+            frames.append(frame)
+        if len(frames) >= max_frames:
+            break
+    cap.release()
+    return frames, {"frames_read": decoded, "frames_grabbed": 0, "seeks": 0}
+
+
+def write_synthetic_video(path: str, minutes: float, fps: int = 60, size=(640, 360)):
+    """Moving gradient with the frame number drawn on it, so every frame is distinct"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    width, height = size
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+    for i in range(int(minutes * 60 * fps)):
+        frame = cv2.merge([np.roll(gradient, i * 4, axis=1), gradient, np.full_like(gradient, i % 256)])
+        cv2.putText(frame, str(i), (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 6)
+        writer.write(frame)
+    writer.release()
+
+
+def run(name: str, extract, video_path: str, max_frames: int, repeats: int):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        frames, stats = extract(video_path, max_frames)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    started = time.perf_counter()
+    for frame in frames:
+        PREPROCESS(Image.fromarray(np.ascontiguousarray(frame[..., ::-1])))
+    preprocess = time.perf_counter() - started
+    return name, frames, stats, best, preprocess
+
+
+def same_frames(frames: list, reference: list) -> bool:
+    """Exact match, or near match at the smaller size for frames scaled while decoding"""
+    if len(frames) != len(reference):
+        return False
+    for frame, expected in zip(frames, reference):
+        if frame.shape != expected.shape:
+            expected = cv2.resize(expected, frame.shape[1::-1], interpolation=cv2.INTER_AREA)
+            if np.abs(frame.astype(np.int16) - expected).mean() > 4:
+                return False
+        elif not np.array_equal(frame, expected):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="*")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--seek-min-gap", type=int, default=int(os.getenv("VIDEO_SEEK_MIN_GAP", "30")))
+    parser.add_argument("--synthetic-minutes", type=float, default=2.0)
+    parser.add_argument("--synthetic-size", default="640x360")
+    parser.add_argument("--ffmpeg", default=os.getenv("VIDEO_FFMPEG_PATH", "ffmpeg"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    videos = args.videos
+    temp_dir = None
+    if not videos:
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "synthetic.mp4")
+        size = tuple(int(side) for side in args.synthetic_size.split("x"))
+        print(f"🎬 Writing a {args.synthetic_minutes:g} minute 60 fps {args.synthetic_size} synthetic clip...")
+        write_synthetic_video(path, args.synthetic_minutes, size=size)
+        videos = [path]
+
+    methods = [
+        ("read every frame", legacy_extract),
+        ("grab() sequential", FrameSampler(seek_min_gap=0).sample),
+        (f"seek (gap > {args.seek_min_gap})", FrameSampler(seek_min_gap=args.seek_min_gap).sample)
+    ]
+    ffmpeg = FfmpegFrameSampler(seek_min_gap=args.seek_min_gap, ffmpeg_path=args.ffmpeg)
+    if ffmpeg.available:
+        methods += [
+            ("ffmpeg sequential", FfmpegFrameSampler(seek_min_gap=0, ffmpeg_path=args.ffmpeg).sample),
+            (f"ffmpeg seek (gap > {args.seek_min_gap})", ffmpeg.sample)
+        ]
+    else:
+        print(f"⚠️ {args.ffmpeg} not found, skipping the ffmpeg decoder")
+
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        print()
+        print(f"📊 {os.path.basename(video)}: {total} frames, sampling {args.frames}")
+        print(f"{'method':<28}{'read':>8}{'grabbed':>10}{'seeks':>8}{'wall ms':>10}{'preprocess ms':>15}"
+              f"{'same frames':>14}")
+
+        reference = None
+        for name, extract in methods:
+            name, frames, stats, elapsed, preprocess = run(name, extract, video, args.frames, args.repeats)
+            if reference is None:
+                reference = frames
+            same = same_frames(frames, reference)
+            print(f"{name:<28}{stats['frames_read']:>8}{stats.get('frames_grabbed', '-'):>10}{stats['seeks']:>8}"
+                  f"{elapsed * 1000.0:>10.1f}{preprocess * 1000.0:>15.1f}{'yes' if same else 'NO':>14}")
+
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
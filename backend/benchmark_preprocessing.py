@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Preprocessing benchmark
+Checks that BatchPreprocessor matches the PIL Resize / ToTensor / Normalize
+chain it replaced, then compares the throughput of the two at several input
+resolutions and batch sizes.
+
+Usage: python benchmark_preprocessing.py [--batch-sizes 1,8,16] [--repeats 5] [images ...]
+Without images, the sample images plus synthetic frames from 224x224 to 4K are used.
+Exits non-zero when any image differs by more than one intensity level.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from preprocessing import BatchPreprocessor, MEAN, STD
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES = [
+    os.path.join(BACKEND_DIR, "DeepSecure-AI", "images", name) for name in ("fake_image.jpg", "lady.jpg")
+]
+SYNTHETIC_SIZES = [(224, 224), (640, 360), (1280, 720), (1920, 1080), (3840, 2160)]
+
+# The per-image chain DeepfakeModelLoader used before BatchPreprocessor
+PIL_TRANSFORMS = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=list(MEAN), std=list(STD))
+])
+
+# One intensity level after normalization, with some slack for float rounding
+TOLERANCE = 1.0 / (255.0 * min(STD)) + 1e-4
+
+
+def pil_batch(images: list) -> torch.Tensor:
+    return torch.stack([PIL_TRANSFORMS(Image.fromarray(image)) for image in images])
+
+
+def synthetic_frame(width: int, height: int, seed: int) -> np.ndarray:
+    """Smooth colour blobs plus noise, closer to camera footage than uniform noise"""
+    rng = np.random.default_rng(seed)
+    blobs = rng.integers(0, 256, (max(height // 32, 2), max(width // 32, 2), 3), dtype=np.uint8)
+    frame = cv2.resize(blobs, (width, height), interpolation=cv2.INTER_CUBIC).astype(np.int16)
+    frame += rng.integers(-16, 16, frame.shape, dtype=np.int16)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def best_seconds(function, repeats: int) -> float:
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--batch-sizes", default="1,8,16")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.images or DEFAULT_IMAGES:
+        image = cv2.imread(path)
+        if image is not None:
+            inputs.append((os.path.basename(path), cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+    if not args.images:
+        inputs += [(f"synthetic {width}x{height}", synthetic_frame(width, height, seed))
+                   for seed, (width, height) in enumerate(SYNTHETIC_SIZES)]
+    if not inputs:
+        print("❌ No images found")
+        sys.exit(1)
+
+    preprocessor = BatchPreprocessor()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size.strip()]
+
+    print(f"🔍 Parity with the PIL chain (tolerance {TOLERANCE:.4f}, one intensity level)")
+    print(f"{'image':<26}{'max diff':>10}{'mean diff':>11}{'bgr max diff':>14}{'ok':>5}")
+    failures = 0
+    for name, image in inputs:
+        expected = pil_batch([image])
+        difference = (preprocessor.prepare([image]) - expected).abs()
+        bgr_difference = (preprocessor.prepare([image[..., ::-1]], 'bgr') - expected).abs().max().item()
+        ok = difference.max().item() <= TOLERANCE and bgr_difference <= TOLERANCE
+        failures += not ok
+        print(f"{name:<26}{difference.max().item():>10.4f}{difference.mean().item():>11.5f}"
+              f"{bgr_difference:>14.4f}{'yes' if ok else 'NO':>5}")
+
+    print()
+    print("📊 Throughput (images/s)")
+    print(f"{'image':<26}{'batch':>6}{'PIL':>10}{'batched':>10}{'speed-up':>10}")
+    for name, image in inputs:
+        for batch_size in batch_sizes:
+            images = [image] * batch_size
+            pil = best_seconds(lambda: pil_batch(images), args.repeats)
+            batched = best_seconds(lambda: preprocessor.prepare(images, reuse=True), args.repeats)
+            print(f"{name:<26}{batch_size:>6}{batch_size / pil:>10.1f}{batch_size / batched:>10.1f}"
+                  f"{pil / batched:>9.1f}x")
+
+    if failures:
+        print(f"❌ {failures} image(s) differ from the PIL chain by more than one intensity level")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
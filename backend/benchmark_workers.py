@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for multi-worker deployments
+Starts the API in each serving mode, sends a few image requests and reports the
+RSS and PSS of the whole process tree. PSS splits shared pages between the
+processes mapping them, so it shows what copy-on-write sharing actually saves.
+
+Usage: python benchmark_workers.py [--workers 4] [--image path]
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGE = os.path.join(BACKEND_DIR, "DeepSecure-AI", "images", "lady.jpg")
+
+
+def read_memory(pid: int):
+    """(rss, pss) in bytes for one process, from /proc/<pid>/smaps_rollup"""
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1]) * 1024
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1]) * 1024
+    return rss, pss
+
+
+def process_tree(root_pid: int) -> list:
+    """root_pid and all of its descendants"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def tree_memory(root_pids: list):
+    rss = pss = count = 0
+    for root_pid in root_pids:
+        for pid in process_tree(root_pid):
+            try:
+                process_rss, process_pss = read_memory(pid)
+            except OSError:
+                continue
+            rss += process_rss
+            pss += process_pss
+            count += 1
+    return rss, pss, count
+
+
+def wait_for_health(url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise RuntimeError(f"API at {url} did not become healthy within {timeout:.0f}s")
+
+
+def wait_for_socket(path: str, timeout: float):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if time.time() > deadline:
+            raise RuntimeError(f"Inference server did not start within {timeout:.0f}s")
+        time.sleep(1)
+
+
+def measure(name: str, args, env_overrides: dict, with_server: bool = False) -> dict:
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+
+    # Run outside the backend directory so production.env, which main.py loads
+    # with override, does not mask the settings of each mode. mkdtemp makes it
+    # 0700, as the inference server requires of its socket directory.
+    workdir = tempfile.mkdtemp(prefix="deepsecure-bench-")
+    socket_path = os.path.join(workdir, "inference.sock")
+
+    env = dict(os.environ)
+    env.update(env_overrides)
+    env["INFERENCE_SERVER_ADDRESS"] = socket_path
+    env["RESULT_CACHE_SIZE"] = "0"
+    env["RESULT_CACHE_DB"] = ""
+    env["JOB_WORKERS"] = "0"
+
+    processes = []
+    try:
+        if with_server:
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(BACKEND_DIR, "inference_server.py")], cwd=workdir, env=env
+            ))
+            wait_for_socket(socket_path, args.timeout)
+
+        processes.append(subprocess.Popen(
+            ["gunicorn", "main:app", "--pythonpath", BACKEND_DIR,
+             "-c", os.path.join(BACKEND_DIR, "gunicorn_conf.py"), "-w", str(args.workers),
+             "-k", "uvicorn.workers.UvicornWorker", "--bind", f"127.0.0.1:{port}",
+             "--timeout", str(int(args.timeout))],
+            cwd=workdir, env=env
+        ))
+        started_at = time.time()
+        wait_for_health(url, args.timeout)
+        ready_after = time.time() - started_at
+
+        # Let every worker serve a few requests so lazily allocated state is counted
+        with open(args.image, "rb") as f:
+            image = f.read()
+        for _ in range(args.requests):
+            response = requests.post(f"{url}/detect/image", files={"file": ("bench.jpg", image, "image/jpeg")}, timeout=args.timeout)
+            response.raise_for_status()
+        time.sleep(1)
+
+        rss, pss, count = tree_memory([p.pid for p in processes])
+        return {"mode": name, "processes": count, "rss": rss, "pss": pss, "ready_after": ready_after}
+    finally:
+        for process in reversed(processes):
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--image", default=DEFAULT_IMAGE)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    modes = [
+        ("per-worker models", {"PRELOAD_MODELS": "false", "INFERENCE_EXECUTOR": "thread"}, False),
+        ("preload (copy-on-write)", {"PRELOAD_MODELS": "true", "INFERENCE_EXECUTOR": "thread"}, False),
+        ("inference server", {"PRELOAD_MODELS": "false", "INFERENCE_EXECUTOR": "remote"}, True),
+    ]
+
+    print(f"📊 {args.workers} gunicorn workers, {args.requests} image requests per mode")
+    results = []
+    for name, env_overrides, with_server in modes:
+        print(f"🔄 Measuring {name}...")
+        results.append(measure(name, args, env_overrides, with_server))
+
+    print()
+    print(f"{'mode':<26}{'processes':>10}{'RSS MiB':>10}{'PSS MiB':>10}{'ready s':>10}")
+    for result in results:
+        print(f"{result['mode']:<26}{result['processes']:>10}"
+              f"{result['rss'] / 2**20:>10.0f}{result['pss'] / 2**20:>10.0f}{result['ready_after']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
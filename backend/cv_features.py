@@ -0,0 +1,109 @@
+"""
+Computer vision features
+Single-pass feature extraction for the computer vision fallback: each image is
+decoded and converted to grayscale once, and every analyzer reads that buffer
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+FEATURE_NAMES = ("noise_analysis", "compression_artifacts", "face_consistency")
+
+# Weights of the fake probability, in FEATURE_NAMES order
+FEATURE_WEIGHTS = np.array([0.4, 0.3, 0.3])
+
+HAAR_CASCADE = 'haarcascade_frontalface_default.xml'
+
+# Score of an analyzer that cannot run (and of face consistency with no face found)
+NEUTRAL_SCORE = 0.5
+
+
+class CVFeatureExtractor:
+    """
+    Computes the noise, compression and face consistency features in one pass
+
+    The Haar face cascade is loaded once per thread, since detectMultiScale
+    is not safe to call concurrently on a shared classifier. An analyzer that
+    fails scores NEUTRAL_SCORE, so one bad analyzer does not sink the others.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _cascade(self):
+        """This thread's face cascade, or None when OpenCV ships without one"""
+        if not hasattr(self._local, "cascade"):
+            cascade = None
+            data = getattr(cv2, "data", None)
+            if hasattr(cv2, "CascadeClassifier") and data is not None:
+                path = os.path.join(data.haarcascades, HAAR_CASCADE)
+                if os.path.exists(path):
+                    cascade = cv2.CascadeClassifier(path)
+            self._local.cascade = cascade
+        return self._local.cascade
+
+    def extract(self, image, face_score: Optional[float] = None) -> np.ndarray:
+        """
+        Feature vector of an image, in FEATURE_NAMES order
+
+        Args:
+            image: Path to an image file, or a decoded BGR (or grayscale) uint8 array
+            face_score: Use this face consistency score instead of detecting faces,
+                for callers that already know the outcome
+
+        Raises:
+            ValueError: If the image cannot be decoded
+        """
+        if not isinstance(image, np.ndarray):
+            image = cv2.imread(image)
+            if image is None:
+                raise ValueError("Could not decode image")
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        return np.array([
+            self._noise(gray),
+            self._compression(gray),
+            self._face_consistency(gray) if face_score is None else face_score
+        ])
+
+    @staticmethod
+    def fake_probability(features: np.ndarray) -> float:
+        """Weighted combination of a feature vector"""
+        return float(min(np.dot(FEATURE_WEIGHTS, features), 1.0))
+
+    @staticmethod
+    def as_dict(features: np.ndarray) -> Dict[str, float]:
+        return {name: float(value) for name, value in zip(FEATURE_NAMES, features)}
+
+    def _noise(self, gray: np.ndarray) -> float:
+        """Laplacian variance; higher variance might indicate artificial noise (typical range 0-1000)"""
+        try:
+            _, deviation = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F))
+            return min(float(deviation[0, 0]) ** 2 / 500.0, 1.0)
+        except cv2.error:
+            return NEUTRAL_SCORE
+
+    def _compression(self, gray: np.ndarray) -> float:
+        """Edge density as a proxy for compression artifacts"""
+        try:
+            edges = cv2.Canny(gray, 50, 150)
+            return min(cv2.countNonZero(edges) / edges.size * 10, 1.0)
+        except cv2.error:
+            return NEUTRAL_SCORE
+
+    def _face_consistency(self, gray: np.ndarray) -> float:
+        """Mean texture variance over the detected faces"""
+        cascade = self._cascade()
+        if cascade is None:
+            return NEUTRAL_SCORE
+        try:
+            faces = cascade.detectMultiScale(gray, 1.1, 4)
+        except cv2.error:
+            return NEUTRAL_SCORE
+        if len(faces) == 0:
+            return NEUTRAL_SCORE
+        return float(np.mean([min(np.var(gray[y:y + h, x:x + w]) / 1000.0, 1.0) for x, y, w, h in faces]))
@@ -4,11 +4,13 @@ Implements FaceForensics++, DFDC, and other state-of-the-art deepfake detection
 """
 
 import os
+import hashlib
+import itertools
+import threading
+import time
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-import torchvision.transforms as transforms
-from PIL import Image
 import cv2
 import numpy as np
 import requests
@@ -16,6 +18,14 @@ from pathlib import Path
 import gdown
 from typing import Dict, Any, Optional, Tuple
 
+from metrics import timed_stage, observe_batch_size
+from preprocessing import BatchPreprocessor
+from quantization import quantized_checkpoint_path
+from execution_backends import (
+    BACKENDS, EXPORT_SUFFIXES, EagerBackend, OptimizedBackend, QuantizedBackend,
+    exported_model_path, load_backend, parse_backend_overrides
+)
+
 # Import EfficientNet for backbone
 try:
     from efficientnet_pytorch import EfficientNet
@@ -139,31 +149,138 @@ class CelebDFModel(nn.Module):
     def forward(self, x):
         return self.backbone(x)
 
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class EnsembleCascade:
+    """
+    Confidence-gated cascade across the ensemble members
+    
+    Models run cheapest first. After each stage the running (renormalized)
+    ensemble score is checked, and only images whose score is still inside the
+    uncertainty band [low, high] go on to the next, more expensive model.
+    Counts how often each stage fires and the forward time it saves.
+    """
+    
+    DEFAULT_ORDER = ['faceforensics', 'celebdf', 'dfdc']
+    
+    def __init__(self, low: float = 0.2, high: float = 0.8, order: list = None):
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"Cascade band must satisfy 0 <= low <= high <= 1, got [{low}, {high}]")
+        self.low = float(low)
+        self.high = float(high)
+        self.order = list(order) if order else list(self.DEFAULT_ORDER)
+        self._lock = threading.Lock()
+        
+        # Counters
+        self.images = 0
+        self.stage_runs = {}
+        self.stage_exits = {}
+        self.forwards_run = 0
+        self.forwards_full = 0
+        self.estimated_seconds_saved = 0.0
+    
+    @classmethod
+    def from_env(cls) -> Optional["EnsembleCascade"]:
+        """Build a cascade from ENSEMBLE_CASCADE / CASCADE_UNCERTAIN_LOW / CASCADE_UNCERTAIN_HIGH / CASCADE_ORDER"""
+        if os.getenv("ENSEMBLE_CASCADE", "false").lower() != "true":
+            return None
+        order = [name.strip() for name in os.getenv("CASCADE_ORDER", "").split(",") if name.strip()]
+        return cls(
+            low=float(os.getenv("CASCADE_UNCERTAIN_LOW", "0.2")),
+            high=float(os.getenv("CASCADE_UNCERTAIN_HIGH", "0.8")),
+            order=order or None
+        )
+    
+    def is_uncertain(self, fake_probability: float) -> bool:
+        return self.low <= fake_probability <= self.high
+    
+    def describe(self) -> str:
+        """Stable description, folded into the model version so cached results follow the thresholds"""
+        return f"cascade:{self.low}:{self.high}:{','.join(self.order)}"
+    
+    def record(self, stage_runs: Dict[int, int], stage_exits: Dict[int, int], images: int,
+               forwards_run: int, forwards_full: int, seconds_saved: float):
+        with self._lock:
+            self.images += images
+            for stage, count in stage_runs.items():
+                self.stage_runs[stage] = self.stage_runs.get(stage, 0) + count
+            for stage, count in stage_exits.items():
+                self.stage_exits[stage] = self.stage_exits.get(stage, 0) + count
+            self.forwards_run += forwards_run
+            self.forwards_full += forwards_full
+            self.estimated_seconds_saved += seconds_saved
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Stage fire rates and the forward work the cascade avoided"""
+        with self._lock:
+            images = self.images
+            return {
+                "uncertainty_band": [self.low, self.high],
+                "order": list(self.order),
+                "images": images,
+                "stages": [
+                    {
+                        "stage": stage + 1,
+                        "model": model,
+                        "fired": self.stage_runs.get(stage, 0),
+                        "fire_rate": (self.stage_runs.get(stage, 0) / images) if images else 0.0,
+                        "exits": self.stage_exits.get(stage, 0)
+                    }
+                    for stage, model in enumerate(self.order)
+                ],
+                "forwards_skipped_fraction": (1 - self.forwards_run / self.forwards_full) if self.forwards_full else 0.0,
+                "average_forward_ms_saved": (self.estimated_seconds_saved / images * 1000.0) if images else 0.0
+            }
+
+
 class DeepfakeModelLoader:
     """
     Handles loading and managing multiple deepfake detection models
     """
     
-    def __init__(self, device='cpu'):
+    DEFAULT_WEIGHTS = {
+        'faceforensics': 0.4,
+        'dfdc': 0.4,
+        'celebdf': 0.2
+    }
+    
+    # Smoothing factor for the per-model forward latency estimates
+    LATENCY_SMOOTHING = 0.3
+    
+    def __init__(self, device='cpu', precision: str = None, backend: str = None):
         self.device = device
+        # 'int8' loads the checkpoints written by quantization.py where they exist
+        self.precision = precision or os.getenv("MODEL_PRECISION", "fp32")
+        # INT8 models always run forwards of exactly this many images (see run_fixed_batch)
+        self.int8_batch_size = max(1, int(os.getenv("INT8_BATCH_SIZE", "1")))
+        # Execution backend for fp32 models, overridable per model with MODEL_BACKENDS
+        self.backend = backend or os.getenv("MODEL_BACKEND", "eager")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown MODEL_BACKEND {self.backend!r}, expected one of {BACKENDS}")
+        self.backend_overrides = {} if backend else parse_backend_overrides(os.getenv("MODEL_BACKENDS", ""))
+        # Whether the 'optimized' backend also runs torch.compile (where a C++ compiler is available)
+        self.compile = os.getenv("MODEL_COMPILE", "true").lower() == "true"
+        # Model name -> loaded backend (EagerBackend, TorchScriptBackend, ...), called with a batch
         self.models = {}
+        self.model_checksums = {}
+        self.latency_estimates = {}
+        self._latency_lock = threading.Lock()
+        # Set to an EnsembleCascade to gate the expensive members on uncertainty
+        self.cascade = None
         self.models_available = EFFICIENTNET_AVAILABLE
-        self.transforms = self._get_transforms() if EFFICIENTNET_AVAILABLE else None
+        self.preprocessor = BatchPreprocessor()
         self.model_urls = {
             'faceforensics': 'https://github.com/ondyari/FaceForensics/releases/download/v1.0/xception.pth',
             'dfdc': 'https://www.googleapis.com/drive/v3/files/1QZnqOT8HQZ8Q8Q8Q8Q8Q8Q8Q8Q8Q8Q8Q/view',
             'celebdf': 'https://drive.google.com/file/d/1_sample_celebdf_model_id/view'
         }
     
-    def _get_transforms(self):
-        """Get image preprocessing transforms"""
-        return transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
-        ])
-    
     def download_model(self, model_name: str, save_path: str) -> bool:
         """Download pretrained model weights"""
         try:
@@ -202,6 +319,25 @@ class DeepfakeModelLoader:
         try:
             print(f"🔄 Loading {model_name} model...")
             
+            if self.precision == 'int8':
+                quantized_path = quantized_checkpoint_path(model_path)
+                if os.path.exists(quantized_path):
+                    self.models[model_name] = QuantizedBackend(quantized_path, self.int8_batch_size, self.device)
+                    self.model_checksums[model_name] = file_sha256(quantized_path)
+                    print(f"✅ {model_name} INT8 model loaded successfully")
+                    return True
+                print(f"⚠️ No INT8 checkpoint at {quantized_path}, loading fp32 (run quantization.py)")
+            
+            backend = self.backend_overrides.get(model_name, self.backend)
+            if backend in EXPORT_SUFFIXES:
+                exported_path = exported_model_path(model_path, backend)
+                if os.path.exists(exported_path):
+                    self.models[model_name] = load_backend(backend, exported_path, self.device)
+                    self.model_checksums[model_name] = file_sha256(exported_path)
+                    print(f"✅ {model_name} model loaded successfully ({backend})")
+                    return True
+                print(f"⚠️ No {backend} export at {exported_path}, running eager (run execution_backends.py)")
+            
             if model_name == 'faceforensics':
                 model = FaceForensicsModel()
                 if os.path.exists(model_path):
@@ -211,7 +347,7 @@ class DeepfakeModelLoader:
                 
                 model.to(self.device)
                 model.eval()
-                self.models[model_name] = model
+                self.models[model_name] = EagerBackend(model)
                 
             elif model_name == 'dfdc':
                 model = DFDCModel()
@@ -220,7 +356,7 @@ class DeepfakeModelLoader:
                 
                 model.to(self.device)
                 model.eval()
-                self.models[model_name] = model
+                self.models[model_name] = EagerBackend(model)
                 
             elif model_name == 'celebdf':
                 model = CelebDFModel()
@@ -229,7 +365,14 @@ class DeepfakeModelLoader:
                 
                 model.to(self.device)
                 model.eval()
-                self.models[model_name] = model
+                self.models[model_name] = EagerBackend(model)
+            
+            if backend == 'optimized' and model_name in self.models:
+                self.models[model_name] = OptimizedBackend(model, compile=self.compile, device=self.device)
+            
+            # Fingerprint the weights so cached results follow checkpoint changes
+            if model_name in self.models:
+                self.model_checksums[model_name] = file_sha256(model_path) if os.path.exists(model_path) else "untrained"
             
             print(f"✅ {model_name} model loaded successfully")
             return True
@@ -238,6 +381,17 @@ class DeepfakeModelLoader:
             print(f"❌ Failed to load {model_name}: {e}")
             return False
     
+    def freeze(self):
+        """
+        Make every loaded model read-only for serving
+        
+        Parameters stop tracking gradients, so inference never allocates autograd
+        state for them and never writes to the weight pages. Workers forked after
+        this keep sharing those pages copy-on-write with the parent.
+        """
+        for model in self.models.values():
+            model.freeze()
+    
     def load_all_models(self, checkpoint_dir: str) -> Dict[str, bool]:
         """Load all available deepfake detection models"""
         results = {}
@@ -269,68 +423,293 @@ class DeepfakeModelLoader:
         
         return results
     
-    def predict_image(self, image_path: str, model_names: list = None) -> Dict[str, Any]:
-        """Predict deepfake probability for an image using multiple models"""
+    def load_input_tensor(self, image, color_order: str = 'rgb') -> torch.Tensor:
+        """
+        Preprocess an image into a [3, 224, 224] tensor
+        
+        Args:
+            image: Path to an image file, a PIL image, or a uint8 image as a numpy
+                array (HxWxC) or tensor (HxWxC or CxHxW)
+            color_order: Channel order of array/tensor input, 'rgb' or 'bgr' (OpenCV)
+        """
+        return self.load_input_batch([image], color_order)[0]
+    
+    def load_input_batch(self, images, color_order: str = 'rgb', reuse: bool = False) -> torch.Tensor:
+        """
+        Preprocess several images into a stacked [N, 3, 224, 224] tensor
         
+        Args:
+            images: A list of images accepted by load_input_tensor, or an NxHxWxC
+                array / NxCxHxW or NxHxWxC tensor
+            color_order: Channel order of array/tensor input, 'rgb' or 'bgr'
+            reuse: Write into this thread's reusable input buffer; the batch is
+                overwritten by the thread's next reuse call
+        """
+        with timed_stage("preprocess"):
+            return self.preprocessor.prepare(images, color_order, reuse)
+    
+    def resize_input(self, image, color_order: str = 'rgb') -> torch.Tensor:
+        """Resize one image to a uint8 [3, 224, 224] tensor, to be batched by normalize_inputs"""
+        with timed_stage("preprocess"):
+            return self.preprocessor.resize(image, color_order)
+    
+    def normalize_inputs(self, resized: list, reuse: bool = False) -> torch.Tensor:
+        """Stack resize_input results into a normalized batch (see load_input_batch for `reuse`)"""
+        with timed_stage("preprocess"):
+            return self.preprocessor.normalize(resized, reuse)
+    
+    def _format_prediction(self, model_name: str, output: torch.Tensor) -> Dict[str, Any]:
+        """Convert a single row of model output into a prediction dictionary"""
+        if model_name == 'dfdc':
+            # DFDC outputs single probability
+            prob = torch.sigmoid(output).cpu().numpy()[0]
+            return {
+                "fake_probability": float(prob),
+                "is_fake": bool(prob > 0.5)
+            }
+        
+        # Binary classification models
+        probs = F.softmax(output, dim=0).cpu().numpy()
+        return {
+            "real_probability": float(probs[0]),
+            "fake_probability": float(probs[1]),
+            "is_fake": bool(probs[1] > 0.5)
+        }
+    
+    def predict_batch(self, input_batch: torch.Tensor, model_names: list = None,
+                      record_latency: bool = False) -> list:
+        """
+        Predict deepfake probabilities for a stacked batch of preprocessed images
+        
+        Each model runs a single forward pass over the whole [N, 3, 224, 224] batch.
+        With record_latency, each forward's wall time feeds the latency estimates;
+        only the request path (scheduler batches, single images) sets it, since a
+        budgeted request waits for its whole batch, not a per-image share of it.
+        
+        Returns:
+            List with one {model_name: prediction} dictionary per input image
+        """
         if model_names is None:
             model_names = list(self.models.keys())
         
-        # Load and preprocess image
-        try:
-            image = Image.open(image_path).convert('RGB')
-            input_tensor = self.transforms(image).unsqueeze(0).to(self.device)
-        except Exception as e:
-            return {"error": f"Failed to load image: {e}"}
-        
-        predictions = {}
+        input_batch = input_batch.to(self.device)
+        batch_size = input_batch.shape[0]
+        predictions = [{} for _ in range(batch_size)]
+        observe_batch_size(batch_size)
         
         for model_name in model_names:
             if model_name not in self.models:
-                predictions[model_name] = {"error": "Model not loaded"}
+                for item in predictions:
+                    item[model_name] = {"error": "Model not loaded"}
                 continue
             
             try:
-                with torch.no_grad():
-                    model = self.models[model_name]
-                    
-                    # Debug: print input tensor shape
-                    print(f"🔍 {model_name}: Input shape: {input_tensor.shape}")
-                    
-                    output = model(input_tensor)
+                started_at = time.perf_counter()
+                with timed_stage(f"forward_{model_name}"), torch.no_grad():
+                    output = self.models[model_name](input_batch)
+                if record_latency:
+                    self._record_latency(model_name, time.perf_counter() - started_at)
+                
+                for i in range(batch_size):
+                    predictions[i][model_name] = self._format_prediction(model_name, output[i])
                     
-                    if model_name == 'dfdc':
-                        # DFDC outputs single probability
-                        prob = torch.sigmoid(output).cpu().numpy()[0][0]
-                        predictions[model_name] = {
-                            "fake_probability": float(prob),
-                            "is_fake": bool(prob > 0.5)
-                        }
-                    else:
-                        # Binary classification models
-                        probs = F.softmax(output, dim=1).cpu().numpy()[0]
-                        predictions[model_name] = {
-                            "real_probability": float(probs[0]),
-                            "fake_probability": float(probs[1]),
-                            "is_fake": bool(probs[1] > 0.5)
-                        }
-                        
             except Exception as e:
                 print(f"❌ {model_name} prediction error: {e}")
-                predictions[model_name] = {"error": f"Prediction failed: {e}"}
+                for item in predictions:
+                    item[model_name] = {"error": f"Prediction failed: {e}"}
         
         return predictions
     
-    def ensemble_predict(self, image_path: str, weights: Dict[str, float] = None) -> Dict[str, Any]:
-        """Ensemble prediction using multiple models"""
+    def reset_latency_estimates(self):
+        with self._latency_lock:
+            self.latency_estimates.clear()
+    
+    def predict_ensemble_batch(self, input_batch: torch.Tensor, model_names: list = None,
+                               record_latency: bool = False) -> list:
+        """
+        Per-image predictions for ensemble scoring
         
+        Runs the cascade when one is configured and no explicit subset is asked
+        for, otherwise every requested model over the whole batch.
+        """
+        if model_names is None and self.cascade is not None:
+            return self.cascade_predict_batch(input_batch, record_latency)
+        return self.predict_batch(input_batch, model_names, record_latency)
+    
+    def cascade_predict_batch(self, input_batch: torch.Tensor, record_latency: bool = False) -> list:
+        """
+        Cascade over a stacked batch: each stage runs one model over the images still uncertain
+        
+        Returns:
+            List with one {model_name: prediction} dictionary per input image,
+            holding only the models that ran for that image
+        """
+        cascade = self.cascade
+        order = [name for name in cascade.order if name in self.models]
+        order += [name for name in self.models if name not in order]
+        
+        batch_size = input_batch.shape[0]
+        predictions = [{} for _ in range(batch_size)]
+        active = list(range(batch_size))
+        stage_runs = {}
+        stage_exits = {}
+        forwards_run = 0
+        
+        for stage, model_name in enumerate(order):
+            rows_batch = input_batch if len(active) == batch_size else input_batch[active]
+            for i, prediction in zip(active, self.predict_batch(rows_batch, [model_name], record_latency)):
+                predictions[i].update(prediction)
+            stage_runs[stage] = len(active)
+            forwards_run += len(active)
+            
+            if stage == len(order) - 1:
+                stage_exits[stage] = len(active)
+                break
+            
+            uncertain = []
+            for i in active:
+                running = self._aggregate_predictions(predictions[i])
+                if "error" in running or cascade.is_uncertain(running["ensemble_fake_probability"]):
+                    uncertain.append(i)
+            stage_exits[stage] = len(active) - len(uncertain)
+            active = uncertain
+            if not active:
+                break
+        
+        # Forward time avoided per skipped image, priced with the request-path estimates
+        # (an upper bound when the skipped images would have shared a batch)
+        with self._latency_lock:
+            estimates = dict(self.latency_estimates)
+        seconds_saved = sum(
+            estimates.get(name, 0.0)
+            for prediction in predictions
+            for name in order if name not in prediction
+        )
+        cascade.record(stage_runs, stage_exits, batch_size, forwards_run, batch_size * len(order), seconds_saved)
+        return predictions
+    
+    def _record_latency(self, model_name: str, seconds: float):
+        """Fold the wall time of one request-path forward pass into the model's latency estimate"""
+        with self._latency_lock:
+            previous = self.latency_estimates.get(model_name)
+            if previous is None:
+                self.latency_estimates[model_name] = seconds
+            else:
+                self.latency_estimates[model_name] = (
+                    self.LATENCY_SMOOTHING * seconds + (1 - self.LATENCY_SMOOTHING) * previous
+                )
+    
+    def select_models(self, budget_seconds: float, weights: Dict[str, float] = None,
+                      forwards: float = 1.0) -> Tuple[list, Optional[float]]:
+        """
+        Choose the subset of models to run within a latency budget
+        
+        Models run one after another, so a subset costs the sum of its models'
+        estimated forward latencies: an exponential moving average of the wall
+        time of recent request-path forwards, whole micro-batches included, since
+        a request waits for its entire batch. Bulk and video chunks do not feed it,
+        and queueing delays are not included. `forwards` scales the cost for
+        requests that need several, such as one per face crop.
+        Among the subsets that fit, the one carrying the most ensemble weight
+        wins, ties going to the cheaper one. If nothing fits, only the fastest
+        model runs.
+        
+        Returns:
+            (model names, estimated seconds). Every model is chosen, with no
+            estimate, until each has been measured at least once.
+        """
         if weights is None:
-            weights = {
-                'faceforensics': 0.4,
-                'dfdc': 0.4,
-                'celebdf': 0.2
-            }
+            weights = self.DEFAULT_WEIGHTS
         
-        individual_predictions = self.predict_image(image_path)
+        names = list(self.models.keys())
+        with self._latency_lock:
+            estimates = dict(self.latency_estimates)
+        if not names or any(name not in estimates for name in names):
+            return names, None
+        
+        best = None
+        for size in range(1, len(names) + 1):
+            for subset in itertools.combinations(names, size):
+                cost = sum(estimates[name] for name in subset) * forwards
+                if cost > budget_seconds:
+                    continue
+                score = (sum(weights.get(name, 1.0) for name in subset), -cost)
+                if best is None or score > best[0]:
+                    best = (score, list(subset), cost)
+        
+        if best is None:
+            fastest = min(names, key=lambda name: estimates[name])
+            return [fastest], estimates[fastest] * forwards
+        return best[1], best[2]
+    
+    def predict_image(self, image, model_names: list = None, color_order: str = 'rgb') -> Dict[str, Any]:
+        """Predict deepfake probability for an image (path, array or tensor) using multiple models"""
+        
+        # Load and preprocess image
+        try:
+            input_tensor = self.load_input_tensor(image, color_order).unsqueeze(0)
+        except Exception as e:
+            return {"error": f"Failed to load image: {e}"}
+        
+        return self.predict_batch(input_tensor, model_names)[0]
+    
+    def predict_arrays(self, images, color_order: str = 'rgb', model_names: list = None,
+                       chunk_size: int = None) -> list:
+        """
+        Per-model predictions for in-memory images, without an encode/decode round-trip
+        
+        Args:
+            images: uint8 images as numpy arrays or tensors (see load_input_batch)
+            color_order: 'rgb', or 'bgr' for frames straight from OpenCV
+            model_names: Subset of the loaded models to run (all when None)
+            chunk_size: Images per stacked forward (all at once when None)
+            
+        Returns:
+            List with one {model_name: prediction} dictionary per image
+        """
+        return self._predict_array_chunks(images, color_order, chunk_size,
+                                          lambda batch: self.predict_batch(batch, model_names))
+    
+    def ensemble_predict_arrays(self, images, color_order: str = 'rgb', weights: Dict[str, float] = None,
+                                model_names: list = None, chunk_size: int = None) -> list:
+        """
+        Ensemble results for in-memory images; runs the cascade when one is configured
+        
+        Takes the same arguments as predict_arrays and returns one ensemble_predict
+        style result per image.
+        """
+        predictions = self._predict_array_chunks(images, color_order, chunk_size,
+                                                 lambda batch: self.predict_ensemble_batch(batch, model_names))
+        results = []
+        for individual_predictions in predictions:
+            if "error" in individual_predictions:
+                results.append({
+                    "error": "No valid predictions from any model",
+                    "individual_predictions": individual_predictions
+                })
+            else:
+                results.append(self.aggregate_predictions(individual_predictions, weights))
+        return results
+    
+    def _predict_array_chunks(self, images, color_order: str, chunk_size: Optional[int], predict) -> list:
+        images = list(images)
+        chunk_size = chunk_size or max(len(images), 1)
+        predictions = []
+        for start in range(0, len(images), chunk_size):
+            # Each chunk is done with before the next is preprocessed
+            batch = self.load_input_batch(images[start:start + chunk_size], color_order, reuse=True)
+            predictions.extend(predict(batch))
+        return predictions
+    
+    def aggregate_predictions(self, individual_predictions: Dict[str, Any], weights: Dict[str, float] = None) -> Dict[str, Any]:
+        """Combine per-model predictions for one image into an ensemble result"""
+        
+        with timed_stage("aggregate"):
+            return self._aggregate_predictions(individual_predictions, weights)
+    
+    def _aggregate_predictions(self, individual_predictions: Dict[str, Any], weights: Dict[str, float] = None) -> Dict[str, Any]:
+        if weights is None:
+            weights = self.DEFAULT_WEIGHTS
         
         # Aggregate predictions
         fake_scores = []
@@ -350,7 +729,7 @@ class DeepfakeModelLoader:
             }
         
         # Calculate ensemble result
-        ensemble_score = sum(fake_scores) / sum(weights[m] for m in valid_models)
+        ensemble_score = sum(fake_scores) / sum(weights.get(m, 1.0) for m in valid_models)
         
         return {
             "ensemble_fake_probability": float(ensemble_score),
@@ -360,12 +739,48 @@ class DeepfakeModelLoader:
             "individual_predictions": individual_predictions
         }
     
+    def ensemble_predict(self, image, weights: Dict[str, float] = None, model_names: list = None,
+                         color_order: str = 'rgb') -> Dict[str, Any]:
+        """Ensemble prediction using multiple models (all loaded models unless `model_names` is given)"""
+        
+        try:
+            input_tensor = self.load_input_tensor(image, color_order).unsqueeze(0)
+        except Exception as e:
+            return {
+                "error": "No valid predictions from any model",
+                "individual_predictions": {"error": f"Failed to load image: {e}"}
+            }
+        individual_predictions = self.predict_ensemble_batch(input_tensor, model_names, record_latency=True)[0]
+        
+        if "error" in individual_predictions:
+            return {
+                "error": "No valid predictions from any model",
+                "individual_predictions": individual_predictions
+            }
+        
+        return self.aggregate_predictions(individual_predictions, weights)
+    
+    def get_model_version(self) -> str:
+        """Short identifier derived from the checksums and execution backends of all loaded models"""
+        digest = hashlib.sha256()
+        for model_name in sorted(self.models):
+            # Backends fold and reorder float operations, so their scores differ slightly
+            digest.update(f"{model_name}:{self.model_checksums.get(model_name, 'unknown')}:"
+                          f"{self.models[model_name].name};".encode())
+        if self.cascade is not None:
+            digest.update(self.cascade.describe().encode())
+        return digest.hexdigest()[:16]
+    
     def get_model_status(self) -> Dict[str, Any]:
         """Get status of all loaded models"""
         return {
             "loaded_models": list(self.models.keys()),
             "total_models": len(self.models),
             "device": str(self.device),
+            "precision": {name: model.precision for name, model in self.models.items()},
+            "backend": {name: model.name for name, model in self.models.items()},
+            "model_version": self.get_model_version(),
+            "latency_estimates_ms": {name: seconds * 1000.0 for name, seconds in self.latency_estimates.items()},
             "available_models": ['faceforensics', 'dfdc', 'celebdf']
         }
 
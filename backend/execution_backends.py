@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Execution backends
+Runs each ensemble member through eager PyTorch, a CPU-optimized (BatchNorm-folded,
+channels-last, optionally torch.compile'd) module, a frozen TorchScript graph or
+ONNX Runtime's CPU provider behind one call interface, and exports the
+TorchScript / ONNX checkpoints those backends load (dynamic batch axis).
+
+Usage: python execution_backends.py [--backends eager,optimized,torchscript,onnxruntime] [paths ...]
+Exports every model, checks each backend's fake probabilities against eager on
+the given images/videos, and prints startup time, batch-1 latency and batched
+throughput per backend. Exits non-zero when a backend drifts beyond --tolerance.
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+from typing import Dict, Any, List
+
+import torch
+import torch.nn as nn
+from torch.fx.experimental.optimization import fuse
+
+from quantization import load_quantized, pin_batch_size, plain_convs, run_fixed_batch
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    onnxruntime = None
+    ONNXRUNTIME_AVAILABLE = False
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIR = os.path.join(BACKEND_DIR, 'DeepSecure-AI', 'checkpoints')
+
+BACKENDS = ('eager', 'optimized', 'torchscript', 'onnxruntime')
+
+# Suffixes of the exported checkpoints, next to faceforensics_model.pth and friends
+EXPORT_SUFFIXES = {
+    'torchscript': '.ts.pt',
+    'onnxruntime': '.onnx'
+}
+
+ONNX_OPSET = 17
+
+# Inductor's on-disk cache for compiled kernels, unless TORCHINDUCTOR_CACHE_DIR is set
+COMPILE_CACHE_DIR = os.path.join(CHECKPOINT_DIR, 'compile_cache')
+
+
+def exported_model_path(model_path: str, backend: str) -> str:
+    """Export next to an fp32 checkpoint: faceforensics_model.pth -> faceforensics_model.onnx"""
+    return os.path.splitext(model_path)[0] + EXPORT_SUFFIXES[backend]
+
+
+def parse_backend_overrides(value: str) -> Dict[str, str]:
+    """Parse MODEL_BACKENDS, e.g. "dfdc=onnxruntime,celebdf=torchscript\""""
+    overrides = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        model_name, _, backend = item.partition("=")
+        backend = backend.strip()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r} for {model_name.strip()!r}, expected one of {BACKENDS}")
+        overrides[model_name.strip()] = backend
+    return overrides
+
+
+class EagerBackend:
+    """The nn.Module itself"""
+
+    name = 'eager'
+    precision = 'fp32'
+
+    def __init__(self, module: nn.Module):
+        self.module = module
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        return self.module(batch)
+
+    def freeze(self):
+        self.module.eval()
+        for parameter in self.module.parameters():
+            parameter.requires_grad_(False)
+
+
+class OptimizedBackend:
+    """
+    The eager model rewritten for CPU inference
+
+    BatchNorm is folded into the preceding convolutions, weights and inputs
+    are kept channels-last (the layout oneDNN's convolutions run natively),
+    and forwards run under torch.inference_mode. With compile=True the forward
+    is also compiled by torch.compile when a C++ compiler is available. The
+    first forward at batch 1 and the first at any other batch size each
+    compile; inductor caches the kernels on disk, so later starts mostly load them.
+    The rewritten module stays on `device`; compilation is CPU only.
+    """
+
+    name = 'optimized'
+    precision = 'fp32'
+
+    def __init__(self, module: nn.Module, compile: bool = False, device: str = 'cpu'):
+        model = _exportable(module)
+        # Stock convs, so FX sees conv -> batch norm pairs it can fold
+        plain_convs(model)
+        self.module = fuse(model.eval()).to(device, memory_format=torch.channels_last)
+        on_cpu = torch.device(device).type == 'cpu'
+        self.compiled = compile and on_cpu and compile_available()
+        if compile and not on_cpu:
+            print(f"⚠️ torch.compile is only used on CPU, running the optimized model uncompiled on {device}")
+        elif compile and not self.compiled:
+            print("⚠️ torch.compile needs a C++ compiler, running the optimized model uncompiled")
+        if self.compiled:
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", COMPILE_CACHE_DIR)
+            self._forward = torch.compile(self.module)
+        else:
+            self._forward = self.module
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self._forward(batch.contiguous(memory_format=torch.channels_last))
+
+    def freeze(self):
+        for parameter in self.module.parameters():
+            parameter.requires_grad_(False)
+
+
+def compile_available() -> bool:
+    """torch.compile's CPU backend generates C++, so it needs a compiler on PATH"""
+    compiler = os.getenv("CXX", "g++")
+    return hasattr(torch, "compile") and any(shutil.which(name) for name in (compiler, "c++", "clang++"))
+
+
+class TorchScriptBackend:
+    """A traced graph, frozen at export so weights are constants and batch norms folded"""
+
+    name = 'torchscript'
+    precision = 'fp32'
+
+    def __init__(self, path: str, device: str = 'cpu'):
+        self.module = torch.jit.load(path, map_location=device)
+        self.module.eval()
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        return self.module(batch)
+
+    def freeze(self):
+        pass
+
+
+class QuantizedBackend(TorchScriptBackend):
+    """An INT8 checkpoint from quantization.py, always run at its pinned batch size"""
+
+    precision = 'int8'
+
+    def __init__(self, path: str, batch_size: int, device: str = 'cpu'):
+        self.module = load_quantized(path, device)
+        self.batch_size = batch_size
+        pin_batch_size(self.module, batch_size)
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        return run_fixed_batch(self.module, batch, self.batch_size)
+
+
+class OnnxRuntimeBackend:
+    """
+    An ONNX export run on ONNX Runtime's CPU execution provider
+
+    The session is created on first use in each process: its thread pool does
+    not survive fork, so a session built before gunicorn forks would hang.
+    """
+
+    name = 'onnxruntime'
+    precision = 'fp32'
+    module = None
+
+    def __init__(self, path: str, threads: int = None):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime not installed")
+        with open(path, 'rb') as f:
+            self.model_bytes = f.read()
+        self.threads = threads
+        self._session = None
+        self._pid = None
+
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.threads or torch.get_num_threads()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = onnxruntime.InferenceSession(self.model_bytes, options,
+                                                         providers=['CPUExecutionProvider'])
+            self._pid = os.getpid()
+        return self._session
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        session = self.session()
+        inputs = {session.get_inputs()[0].name: batch.detach().cpu().contiguous().numpy()}
+        return torch.from_numpy(session.run(None, inputs)[0])
+
+    def freeze(self):
+        pass
+
+
+def load_backend(backend: str, path: str, device: str = 'cpu'):
+    """Load an exported checkpoint for `backend` ('torchscript' or 'onnxruntime')"""
+    if backend == 'torchscript':
+        return TorchScriptBackend(path, device)
+    if backend == 'onnxruntime':
+        if device != 'cpu':
+            raise ValueError("The onnxruntime backend only runs on CPU")
+        return OnnxRuntimeBackend(path)
+    raise ValueError(f"No exported checkpoint for backend {backend!r}")
+
+
+def _exportable(model: nn.Module) -> nn.Module:
+    """CPU copy without the memory-efficient Swish, a custom autograd function tracing cannot record"""
+    model = copy.deepcopy(model).cpu()
+    model.backbone.set_swish(memory_efficient=False)
+    model.eval()
+    return model
+
+
+def export_torchscript(model: nn.Module, path: str) -> str:
+    """Trace and freeze a model; the graph keeps the batch dimension dynamic"""
+    model = _exportable(model)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.zeros((2, 3, 224, 224)))
+        frozen = torch.jit.freeze(traced)
+    torch.jit.save(frozen, path)
+    return path
+
+
+def export_onnx(model: nn.Module, path: str, opset: int = ONNX_OPSET) -> str:
+    """Export a model to ONNX with a dynamic batch axis"""
+    model = _exportable(model)
+    with torch.no_grad():
+        # The TorchScript-based exporter; the dynamo one needs onnxscript, not a dependency here
+        torch.onnx.export(model, (torch.zeros((2, 3, 224, 224)),), path, dynamo=False,
+                          input_names=['input'], output_names=['output'], opset_version=opset,
+                          dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}})
+    return path
+
+
+def _timed(function, batch: torch.Tensor, repeats: int) -> float:
+    """Median seconds per call over `repeats` calls, after two warm-up calls"""
+    timings = []
+    with torch.no_grad():
+        for attempt in range(repeats + 2):
+            started = time.perf_counter()
+            function(batch)
+            if attempt >= 2:
+                timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def compare(loader, model_name: str, reference, candidate, batches: List[torch.Tensor],
+            repeats: int = 5) -> Dict[str, Any]:
+    """Fake-probability drift of a backend against eager, plus its latency and throughput"""
+    drifts = []
+    agree = 0
+    output_difference = 0.0
+    with torch.no_grad():
+        for batch in batches:
+            expected_output = reference(batch)
+            actual_output = candidate(batch)
+            output_difference = max(output_difference, (actual_output - expected_output).abs().max().item())
+            for row in range(len(batch)):
+                expected = loader._format_prediction(model_name, expected_output[row])
+                actual = loader._format_prediction(model_name, actual_output[row])
+                drifts.append(abs(actual["fake_probability"] - expected["fake_probability"]))
+                agree += actual["is_fake"] == expected["is_fake"]
+
+    stacked = torch.cat(batches)[:max(len(batch) for batch in batches)]
+    return {
+        "images": len(drifts),
+        "max_drift": max(drifts),
+        "max_output_difference": output_difference,
+        "verdict_agreement": agree / len(drifts),
+        "batch_1_ms": _timed(candidate, stacked[:1], repeats) * 1000.0,
+        "batch_size": len(stacked),
+        "images_per_second": len(stacked) / _timed(candidate, stacked, repeats)
+    }
+
+
+def main():
+    from benchmark_cascade import DEFAULT_PATHS, load_images
+    from deepfake_models import DeepfakeModelLoader
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--models", default="faceforensics,dfdc,celebdf")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--skip-export", action="store_true", help="Benchmark the existing exports")
+    parser.add_argument("--no-compile", action="store_true", help="Run the optimized backend without torch.compile")
+    parser.add_argument("--frames-per-video", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Max fake-probability drift from eager")
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    unknown = [name for name in backends if name not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backends {unknown}, expected some of {BACKENDS}")
+    if 'onnxruntime' in backends and not ONNXRUNTIME_AVAILABLE:
+        print("⚠️ onnxruntime not installed, skipping it (pip install onnxruntime)")
+        backends.remove('onnxruntime')
+
+    images = [image for _, image in load_images(args.paths, args.frames_per_video)]
+    if not images:
+        print("❌ No images found")
+        sys.exit(1)
+    loader = DeepfakeModelLoader(precision='fp32', backend='eager')
+    batches = [loader.load_input_batch(images[start:start + args.batch_size])
+               for start in range(0, len(images), args.batch_size)]
+    print(f"🔄 Comparing {', '.join(backends)} on {len(images)} images ({torch.get_num_threads()} threads)")
+
+    report = {"threads": torch.get_num_threads(), "tolerance": args.tolerance, "models": {}}
+    failures = 0
+    for model_name in [name.strip() for name in args.models.split(",") if name.strip()]:
+        model_path = os.path.join(args.checkpoint_dir, f"{model_name}_model.pth")
+        if not loader.load_model(model_name, model_path):
+            continue
+        eager = loader.models[model_name]
+
+        results = {}
+        for backend in backends:
+            started = time.perf_counter()
+            if backend == 'eager':
+                runner = eager
+            elif backend == 'optimized':
+                runner = OptimizedBackend(eager.module, compile=not args.no_compile)
+            else:
+                path = exported_model_path(model_path, backend)
+                if not args.skip_export:
+                    started = time.perf_counter()
+                    (export_torchscript if backend == 'torchscript' else export_onnx)(eager.module, path)
+                    print(f"✅ {model_name} exported for {backend} in {time.perf_counter() - started:.1f}s -> {path}")
+                if not os.path.exists(path):
+                    print(f"⚠️ No {backend} export at {path}")
+                    continue
+                started = time.perf_counter()
+                runner = load_backend(backend, path)
+            # Loading plus the first forward at each benchmarked batch size (compiles, for torch.compile)
+            with torch.no_grad():
+                runner(batches[0][:1])
+                runner(torch.cat(batches)[:args.batch_size])
+            startup = time.perf_counter() - started
+            result = compare(loader, model_name, eager, runner, batches, args.repeats)
+            result["startup_s"] = startup
+            result["passed"] = result["max_drift"] <= args.tolerance
+            failures += not result["passed"]
+            results[backend] = result
+
+        passing = {backend: result for backend, result in results.items() if result["passed"]}
+        report["models"][model_name] = {
+            "backends": results,
+            "fastest_batch_1": min(passing, key=lambda name: passing[name]["batch_1_ms"]) if passing else None,
+            "fastest_batched": max(passing, key=lambda name: passing[name]["images_per_second"]) if passing else None
+        }
+
+    print()
+    print(f"{'model':<15}{'backend':<13}{'max drift':>11}{'logit diff':>12}{'agree':>8}{'startup s':>11}"
+          f"{'batch-1 ms':>12}{f'images/s @{args.batch_size}':>15}{'ok':>5}")
+    for model_name, summary in report["models"].items():
+        for backend, result in summary["backends"].items():
+            print(f"{model_name:<15}{backend:<13}{result['max_drift']:>11.2e}"
+                  f"{result['max_output_difference']:>12.2e}{result['verdict_agreement']:>7.0%}{result['startup_s']:>11.1f}"
+                  f"{result['batch_1_ms']:>12.1f}{result['images_per_second']:>15.1f}"
+                  f"{'yes' if result['passed'] else 'NO':>5}")
+
+    fastest = {name: summary["fastest_batch_1"] for name, summary in report["models"].items()
+               if summary["fastest_batch_1"]}
+    report_path = args.report or os.path.join(args.checkpoint_dir, "backend_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {report_path}")
+    if fastest:
+        print(f"💡 Fastest at batch 1 on this machine: MODEL_BACKENDS="
+              f"{','.join(f'{name}={backend}' for name, backend in fastest.items())}")
+
+    if failures:
+        print(f"❌ {failures} backend(s) drift from eager by more than {args.tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Bounded inference executor
+Runs blocking DeepSecureInference calls off the asyncio event loop and sheds load when full
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any
+
+import metrics
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the inference queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Per-process engine used by the process executor
+_process_engine = None
+
+
+def _init_process_engine():
+    """ProcessPoolExecutor initializer: build one inference engine per worker process"""
+    global _process_engine
+    # N executor workers each starting M shard workers would hold N x M model copies
+    os.environ["VIDEO_SHARD_WORKERS"] = "0"
+    metrics.forward_batch_sizes()
+    from inference import DeepSecureInference
+    _process_engine = DeepSecureInference()
+    _process_engine.warm_up()
+
+
+def _call_process_engine(method: str, args: tuple, kwargs: dict):
+    started_at = time.time()
+    with metrics.collect_timings() as timings:
+        result = getattr(_process_engine, method)(*args, **kwargs)
+    return started_at, time.time(), result, timings, metrics.drain_batch_sizes()
+
+
+def _call_remote_engine(method: str, args: tuple, kwargs: dict):
+    from inference_server import connect_service
+    return connect_service().call(method, args, kwargs)
+
+
+def _call_thread_engine(engine, method: str, args: tuple, kwargs: dict):
+    started_at = time.time()
+    with metrics.collect_timings() as timings:
+        result = getattr(engine, method)(*args, **kwargs)
+    # Observed directly into this process's registry
+    return started_at, time.time(), result, timings, []
+
+
+class InferenceExecutor:
+    """
+    Thread or process pool with a bounded number of outstanding jobs
+
+    At most `max_workers` jobs run at once and at most `max_queue` more may wait.
+    Any further submission fails fast with ExecutorBusyError. The "remote" kind
+    forwards jobs to a shared inference server (inference_server.py) instead of
+    running them in this process. A thread executor's `engine` may be attached
+    after construction, once the models have loaded.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 32,
+                 engine=None, min_retry_after: int = 1):
+        if kind not in ("thread", "process", "remote"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.engine = engine
+        self.min_retry_after = max(1, int(min_retry_after))
+
+        if kind == "remote":
+            # Adopt the server's authkey before any manager queues are created; a
+            # server that has not started yet is read again on first connection
+            from inference_server import configure_authkey
+            try:
+                configure_authkey()
+            except FileNotFoundError:
+                pass
+
+        if kind in ("thread", "remote"):
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        else:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_engine
+            )
+
+        self._lock = threading.Lock()
+        self._outstanding = 0
+
+        # Counters
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    @classmethod
+    def from_env(cls, engine=None) -> "InferenceExecutor":
+        """Build an executor from INFERENCE_EXECUTOR / INFERENCE_WORKERS / INFERENCE_QUEUE_SIZE"""
+        return cls(
+            kind=os.getenv("INFERENCE_EXECUTOR", "thread"),
+            max_workers=int(os.getenv("INFERENCE_WORKERS", "4")),
+            max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "32")),
+            engine=engine,
+            min_retry_after=int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a slot frees up, based on average service time"""
+        if not self.completed:
+            return self.min_retry_after
+        avg_service = self.total_service / self.completed
+        backlog = max(self._outstanding - self.max_workers + 1, 1)
+        return max(self.min_retry_after, int(math.ceil(avg_service * backlog / self.max_workers)))
+
+    async def run(self, method: str, *args, **kwargs) -> Any:
+        """Run DeepSecureInference.<method>(*args, **kwargs) on the pool"""
+        with self._lock:
+            if self._outstanding >= self.capacity:
+                self.rejected += 1
+                raise ExecutorBusyError(self.retry_after())
+            self._outstanding += 1
+
+        submitted_at = time.time()
+        try:
+            if self.kind == "thread":
+                future = self._pool.submit(_call_thread_engine, self.engine, method, args, kwargs)
+            elif self.kind == "remote":
+                future = self._pool.submit(_call_remote_engine, method, args, kwargs)
+            else:
+                future = self._pool.submit(_call_process_engine, method, args, kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the pool job itself finishes: a cancelled caller
+        # (client disconnect) does not stop a job that is already running
+        future.add_done_callback(self._release)
+        started_at, finished_at, result, timings, batch_sizes = await asyncio.wrap_future(future)
+
+        # Stage timings from the worker belong to the calling request
+        wait = max(started_at - submitted_at, 0.0)
+        metrics.record_stage("queue_wait", wait)
+        metrics.add_timings(timings)
+        metrics.add_batch_sizes(batch_sizes)
+        
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_service += finished_at - started_at
+
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._outstanding -= 1
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait time counters"""
+        with self._lock:
+            outstanding = self._outstanding
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "outstanding": outstanding,
+                "queue_depth": max(outstanding - self.max_workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "average_wait_ms": (self.total_wait / self.completed * 1000.0) if self.completed else 0.0,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "average_service_ms": (self.total_service / self.completed * 1000.0) if self.completed else 0.0
+            }
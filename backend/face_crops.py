@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Face-crop preprocessing
+Finds the faces in an image or frame and cuts each one out, aligned and at model
+input size, so the ensemble scores faces instead of a downscaled whole image
+
+Usage: python face_crops.py <yunet onnx url> <sha256>
+Downloads the YuNet detector to DeepSecure-AI/checkpoints, keeping it only if
+its SHA-256 matches. The server never downloads it and loads it only when
+FACE_DETECTOR_SHA256 matches the file.
+"""
+
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+import requests
+
+from cv_features import HAAR_CASCADE
+from metrics import timed_stage
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DeepSecure-AI', 'checkpoints')
+
+YUNET_FILENAME = 'face_detection_yunet_2023mar.onnx'
+
+
+def _sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_yunet(path: str, expected_sha256: str) -> bool:
+    """
+    Whether the YuNet model at `path` is the pinned one
+
+    OpenCV executes whatever graph the file holds, so an unpinned or altered
+    file is never loaded.
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ No YuNet face detector at {path} (fetch it with `python face_crops.py <url> <sha256>`)")
+        return False
+    if not expected_sha256:
+        print("⚠️ FACE_DETECTOR_SHA256 is not set, not loading the unverified YuNet face detector")
+        return False
+    actual = _sha256(path)
+    if actual != expected_sha256.strip().lower():
+        print(f"❌ YuNet face detector at {path} has SHA-256 {actual}, expected {expected_sha256}")
+        return False
+    return True
+
+
+def download_yunet(url: str, expected_sha256: str, path: str) -> bool:
+    """Download the YuNet model to `path`, keeping it only if its SHA-256 matches"""
+    try:
+        print(f"📥 Downloading the YuNet face detector to {path}...")
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        actual = hashlib.sha256(response.content).hexdigest()
+        if actual != expected_sha256.strip().lower():
+            print(f"❌ Downloaded file has SHA-256 {actual}, expected {expected_sha256}; discarded")
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            f.write(response.content)
+        os.replace(partial, path)
+        print(f"✅ YuNet face detector saved; set FACE_DETECTOR_SHA256={actual}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to download the YuNet face detector: {e}")
+        return False
+
+
+def _haar_available() -> bool:
+    data = getattr(cv2, 'data', None)
+    return (hasattr(cv2, 'CascadeClassifier') and data is not None
+            and os.path.exists(os.path.join(data.haarcascades, HAAR_CASCADE)))
+
+
+class FaceCropper:
+    """
+    Detects faces and cuts out one aligned, square crop per face
+
+    Detection runs on a copy scaled down to `detect_size` on its long side, so
+    a 4K photo costs about as much as a 640px one. Each crop is the detected box
+    grown by `margin` on every side. When the detector reports eye landmarks
+    (YuNet), the crop is rotated so the eyes are level. The Haar cascade reports
+    no landmarks, so its crops are unrotated. Crops are `size` x `size`, so the
+    preprocessor's resize step skips them.
+    """
+
+    def __init__(self, detector: str = 'yunet', model_path: str = None, min_score: float = 0.7,
+                 max_faces: int = 8, margin: float = 0.25, detect_size: int = 640, size: int = 224):
+        if detector not in ('yunet', 'haar'):
+            raise ValueError(f"FACE_DETECTOR must be 'yunet' or 'haar', got {detector!r}")
+        self.detector = detector
+        self.model_path = model_path or os.path.join(CHECKPOINT_DIR, YUNET_FILENAME)
+        self.min_score = float(min_score)
+        self.max_faces = max(1, int(max_faces))
+        self.margin = float(margin)
+        self.detect_size = max(64, int(detect_size))
+        self.size = int(size)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        # Counters
+        self.images = 0
+        self.images_without_faces = 0
+        self.faces = 0
+        self.detect_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional["FaceCropper"]:
+        """
+        Build a cropper from FACE_CROPS / FACE_DETECTOR / FACE_DETECTOR_SHA256 / FACE_MIN_SCORE /
+        FACE_MAX_FACES / FACE_MARGIN / FACE_DETECT_SIZE, or None when disabled or no detector can be loaded
+        """
+        if os.getenv("FACE_CROPS", "false").lower() != "true":
+            return None
+        detector = os.getenv("FACE_DETECTOR", "yunet")
+        cropper = cls(
+            detector=detector,
+            min_score=float(os.getenv("FACE_MIN_SCORE", "0.7")),
+            max_faces=int(os.getenv("FACE_MAX_FACES", "8")),
+            margin=float(os.getenv("FACE_MARGIN", "0.25")),
+            detect_size=int(os.getenv("FACE_DETECT_SIZE", "640"))
+        )
+        if detector == 'yunet':
+            if not hasattr(cv2, 'FaceDetectorYN'):
+                print("⚠️ This OpenCV build has no FaceDetectorYN (needs opencv-python>=4.8)")
+            elif verify_yunet(cropper.model_path, os.getenv("FACE_DETECTOR_SHA256", "")):
+                return cropper
+            cropper.detector = 'haar'
+            print("🔄 Falling back to the Haar cascade face detector")
+        if not _haar_available():
+            print("❌ No face detector available, scoring whole images instead")
+            return None
+        return cropper
+
+    def describe(self) -> str:
+        """Stable description, folded into the model version since crops change every score"""
+        return f"faces-{self.detector}-m{self.margin}-k{self.max_faces}-s{self.min_score}-d{self.detect_size}"
+
+    def _detector(self):
+        """One detector per thread; YuNet keeps per-call input size state"""
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            if self.detector == 'yunet':
+                detector = cv2.FaceDetectorYN.create(self.model_path, "", (self.detect_size, self.detect_size),
+                                                     self.min_score, 0.3, 5000)
+            else:
+                detector = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, HAAR_CASCADE))
+            self._local.detector = detector
+        return detector
+
+    def detect(self, image: np.ndarray, color_order: str = 'bgr') -> list:
+        """
+        Find the faces in a uint8 HxWx3 image
+
+        Returns:
+            Up to max_faces faces, largest first, as dictionaries with "box" ([x, y, w, h]
+            in image pixels), "score" (None for Haar) and "eyes" (two [x, y] points, or None)
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, self.detect_size / max(height, width))
+        small = image if scale == 1.0 else cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                                      interpolation=cv2.INTER_AREA)
+        if color_order == 'rgb':
+            small = np.ascontiguousarray(small[..., ::-1])
+
+        faces = []
+        detector = self._detector()
+        if self.detector == 'yunet':
+            detector.setInputSize((small.shape[1], small.shape[0]))
+            _, detections = detector.detect(small)
+            for row in (detections if detections is not None else []):
+                faces.append({
+                    "box": [float(value) / scale for value in row[0:4]],
+                    "score": float(row[14]),
+                    "eyes": [[float(row[4]) / scale, float(row[5]) / scale],
+                             [float(row[6]) / scale, float(row[7]) / scale]]
+                })
+        else:
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            for x, y, w, h in detector.detectMultiScale(gray, 1.1, 5, minSize=(24, 24)):
+                faces.append({"box": [float(x) / scale, float(y) / scale, float(w) / scale, float(h) / scale],
+                              "score": None, "eyes": None})
+
+        faces.sort(key=lambda face: face["box"][2] * face["box"][3], reverse=True)
+        return faces[:self.max_faces]
+
+    def crop(self, image: np.ndarray, face: Dict[str, Any]) -> np.ndarray:
+        """Cut one face out of `image` as a size x size crop, in the image's own channel order"""
+        x, y, w, h = face["box"]
+        center_x, center_y = x + w / 2.0, y + h / 2.0
+        side = max(w, h) * (1.0 + 2.0 * self.margin)
+        angle = 0.0
+        if face.get("eyes"):
+            (left_x, left_y), (right_x, right_y) = sorted(face["eyes"])
+            angle = math.degrees(math.atan2(right_y - left_y, right_x - left_x))
+
+        # Cut out a region that covers the crop at any rotation, and shrink it
+        # with area averaging first, since warpAffine would alias a large downscale
+        half = side * 0.75
+        height, width = image.shape[:2]
+        left, top = max(0, int(center_x - half)), max(0, int(center_y - half))
+        right, bottom = min(width, int(math.ceil(center_x + half))), min(height, int(math.ceil(center_y + half)))
+        region = image[top:bottom, left:right]
+        factor = self.size / side
+        if factor < 1.0:
+            region = cv2.resize(region, (max(1, round(region.shape[1] * factor)), max(1, round(region.shape[0] * factor))),
+                                interpolation=cv2.INTER_AREA)
+            scale = 1.0
+            factor_x, factor_y = region.shape[1] / (right - left), region.shape[0] / (bottom - top)
+        else:
+            scale = factor
+            factor_x = factor_y = 1.0
+        center = ((center_x - left) * factor_x, (center_y - top) * factor_y)
+
+        matrix = cv2.getRotationMatrix2D(center, angle, scale)
+        matrix[0, 2] += self.size / 2.0 - center[0]
+        matrix[1, 2] += self.size / 2.0 - center[1]
+        return cv2.warpAffine(region, matrix, (self.size, self.size), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def crops(self, image: np.ndarray, color_order: str = 'bgr') -> Tuple[list, list]:
+        """Detect and crop every face; returns (faces, crops) in matching order"""
+        started = time.perf_counter()
+        with timed_stage("face_detect"):
+            faces = self.detect(image, color_order)
+            crops = [self.crop(image, face) for face in faces]
+        with self._stats_lock:
+            self.images += 1
+            self.images_without_faces += not faces
+            self.faces += len(faces)
+            self.detect_seconds += time.perf_counter() - started
+        return faces, crops
+
+    def expected_faces(self) -> float:
+        """Average faces per image among images that had any, 1.0 before the first"""
+        with self._stats_lock:
+            with_faces = self.images - self.images_without_faces
+            return max(1.0, self.faces / with_faces) if with_faces else 1.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Images seen, how many had no face, and the detection cost"""
+        with self._stats_lock:
+            return {
+                "detector": self.detector,
+                "images": self.images,
+                "images_without_faces": self.images_without_faces,
+                "faces": self.faces,
+                "average_faces_per_image": (self.faces / self.images) if self.images else 0.0,
+                "average_detect_ms": (self.detect_seconds / self.images * 1000.0) if self.images else 0.0
+            }
+
+
+def combine_faces(faces: list, ensemble_results: list) -> Dict[str, Any]:
+    """
+    Per-face ensemble results for one image folded into one ensemble-style result
+
+    The most suspicious face decides the image: a single swapped face makes the
+    whole image a deepfake, and averaging with genuine faces would hide it.
+    The result carries a "faces" list with each face's box and scores.
+    """
+    entries = []
+    for face, result in zip(faces, ensemble_results):
+        entry = {
+            "box": [round(value, 1) for value in face["box"]],
+            "detection_score": face["score"]
+        }
+        if "error" in result:
+            entry["error"] = result["error"]
+            entry["individual_predictions"] = result.get("individual_predictions", {})
+        else:
+            entry.update({
+                "fake_probability": result["ensemble_fake_probability"],
+                "is_fake": result["ensemble_is_fake"],
+                "confidence": result["confidence"],
+                "models_used": result["models_used"],
+                "individual_predictions": result["individual_predictions"]
+            })
+        entries.append(entry)
+
+    if not entries:
+        return {"error": "No face detected", "faces": []}
+    scored = [index for index, entry in enumerate(entries) if "error" not in entry]
+    if not scored:
+        return {
+            "error": "No valid predictions from any model",
+            "faces": entries,
+            "individual_predictions": entries[0]["individual_predictions"]
+        }
+
+    decisive = max(scored, key=lambda index: entries[index]["fake_probability"])
+    fake_probability = entries[decisive]["fake_probability"]
+    models_used = []
+    for index in scored:
+        models_used += [name for name in entries[index]["models_used"] if name not in models_used]
+    return {
+        "ensemble_fake_probability": fake_probability,
+        "ensemble_is_fake": bool(fake_probability > 0.5),
+        "confidence": float(max(fake_probability, 1 - fake_probability)),
+        "models_used": models_used,
+        "individual_predictions": entries[decisive]["individual_predictions"],
+        "decisive_face": decisive,
+        "faces": entries
+    }
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+    url, expected_sha256 = sys.argv[1:]
+    if not download_yunet(url, expected_sha256, os.path.join(CHECKPOINT_DIR, YUNET_FILENAME)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings used by run.py when API_WORKERS > 1
+
+With PRELOAD_MODELS=true (the default) the master imports main.py, and with it
+loads the deepfake models, once before forking. Workers then share the weight
+pages copy-on-write instead of each loading FaceForensics, DFDC and CelebDF again.
+Preloading is meant for CPU serving; CUDA cannot be used in a forked child.
+"""
+
+import gc
+import os
+
+preload_app = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+
+if preload_app:
+    # main.py normally loads the models in the background after startup; when
+    # preloading they must be in memory before the workers are forked
+    os.environ["LOAD_MODELS_AT_IMPORT"] = "true"
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation, otherwise
+    # the first collection in a worker writes to every object header and
+    # un-shares the pages holding them
+    gc.freeze()
@@ -1,4 +1,3 @@
-import sys
 import os
 import torch
 import numpy as np
@@ -6,12 +5,28 @@ from PIL import Image
 import cv2
 import librosa
 import tempfile
-import json
-from typing import Dict, Any, Optional
+import time
+import io
+from contextlib import closing
+from typing import Dict, Any, Optional, Callable
+
+from metrics import timed_stage, collect_timings, record_stage
+from face_crops import FaceCropper, combine_faces
+from cv_features import CVFeatureExtractor
+from video_pipeline import VideoPipeline
+from video_shards import VideoShardPool
+from video_sampling import create_frame_sampler, AdaptiveSampling, sample_indices
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:
+    SOUNDFILE_AVAILABLE = False
 
 # Try to import deepfake models, fallback to basic CV if not available
 try:
-    from deepfake_models import get_model_loader, DeepfakeModelLoader, EFFICIENTNET_AVAILABLE
+    from deepfake_models import get_model_loader, DeepfakeModelLoader, EnsembleCascade, EFFICIENTNET_AVAILABLE
+    from batching import ImageBatchScheduler
     DEEPFAKE_MODELS_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Deepfake models not available: {e}")
@@ -23,13 +38,38 @@ class DeepSecureInference:
     Advanced DeepSecure-AI inference using state-of-the-art deepfake detection models
     """
     
-    def __init__(self):
-        """Initialize the inference engine with real deepfake detection models"""
+    def __init__(self, start_batching: bool = True):
+        """
+        Initialize the inference engine with real deepfake detection models
+        
+        Args:
+            start_batching: Start the image batching thread right away. Pass False when
+                the engine is built before forking (gunicorn --preload) and call
+                start_batching() in each worker instead, since threads do not survive fork.
+        """
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.models_loaded = False
         self.models_available = False
         self.model_loader = None
+        self.batch_scheduler = None
+        self.warmup_summary = None
+        # Images per stacked forward for bulk images and video frames; streamed
+        # videos use smaller chunks so frame events and early stopping stay prompt
+        self.batch_chunk_size = max(1, int(os.getenv("BATCH_CHUNK_SIZE", "16")))
+        self.stream_chunk_size = max(1, int(os.getenv("VIDEO_STREAM_CHUNK_SIZE", "2")))
+        self.frame_sampler = create_frame_sampler()
+        # Default confidence for adaptive video sampling; None samples a fixed 10 frames
+        confidence = os.getenv("VIDEO_SAMPLING_CONFIDENCE")
+        self.sampling_confidence = float(confidence) if confidence else None
+        self.video_shards = VideoShardPool.from_env()
+        # Batches buffered between video preprocessing and inference
+        self.pipeline_depth = max(1, int(os.getenv("VIDEO_PIPELINE_DEPTH", "2")))
+        # Score detected faces instead of whole images and frames (FACE_CROPS=true)
+        self.face_cropper = FaceCropper.from_env()
+        self.cv_features = CVFeatureExtractor()
         self.load_models()
+        if start_batching:
+            self.start_batching()
     
     def load_models(self):
         """Load real deepfake detection models"""
@@ -68,6 +108,10 @@ class DeepSecureInference:
             if successful_models:
                 self.models_loaded = True
                 self.models_available = True
+                self.model_loader.freeze()
+                
+                # Optionally gate the expensive ensemble members on uncertainty
+                self.model_loader.cascade = EnsembleCascade.from_env()
                 print(f"✅ Successfully loaded {len(successful_models)} deepfake detection models:")
                 for model_name in successful_models:
                     print(f"   📸 {model_name.upper()}")
@@ -88,34 +132,189 @@ class DeepSecureInference:
             self.models_available = True
             self.models_loaded = True
     
-    def detect_image(self, image_path: str) -> Dict[str, Any]:
+    def start_batching(self):
+        """Batch concurrent image requests into stacked forwards (IMAGE_BATCH_MAX_SIZE > 1)"""
+        if self.model_loader is None or self.batch_scheduler is not None:
+            return
+        scheduler = ImageBatchScheduler.from_env(self.model_loader)
+        if scheduler.max_batch_size > 1:
+            scheduler.start()
+            self.batch_scheduler = scheduler
+    
+    def warm_up(self, batch_sizes: list = None,
+                progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Run synthetic forwards so the first real request does not pay for kernel
+        selection and allocator growth
+        
+        Args:
+            batch_sizes: Batch sizes to run. Defaults to WARMUP_BATCH_SIZES, or every
+                power of two up to the image batching limit (plus the limit itself)
+                and the bulk and video chunk sizes
+            progress_callback: Called with (sizes done, sizes planned) after each size
+            
+        Returns:
+            Summary with the batch sizes run and the time taken; later calls return it again
+        """
+        if self.warmup_summary is not None:
+            return self.warmup_summary
+        
+        if batch_sizes is None:
+            batch_sizes = self._default_warmup_batch_sizes()
+        
+        started_at = time.time()
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, size=(256, 256, 3), dtype=np.uint8)
+        
+        # Warm-up timings are not request timings; keep them out of the stage histogram
+        with collect_timings():
+            for done, batch_size in enumerate(batch_sizes, start=1):
+                if self.model_loader is None:
+                    self._detect_image_cv_fallback(image, "warmup")
+                else:
+                    tensor = self.model_loader.load_input_tensor(image)
+                    self.model_loader.predict_batch(tensor.unsqueeze(0).repeat(batch_size, 1, 1, 1))
+                if progress_callback is not None:
+                    progress_callback(done, len(batch_sizes))
+            
+            if self.model_loader is not None:
+                # The first forwards include one-off kernel selection; seed the
+                # latency estimates from a warm single-image pass instead
+                self.model_loader.reset_latency_estimates()
+                self.model_loader.predict_batch(self.model_loader.load_input_tensor(image).unsqueeze(0),
+                                                record_latency=True)
+            
+            if self.face_cropper is not None:
+                self.face_cropper.detect(image)
+        
+        # Shard workers load their own models; do it now rather than on the first long video
+        self.video_shards.start()
+        
+        self.warmup_summary = {
+            "batch_sizes": list(batch_sizes),
+            "seconds": time.time() - started_at
+        }
+        print(f"🔥 Warm-up finished in {self.warmup_summary['seconds']:.1f}s (batch sizes {batch_sizes})")
+        return self.warmup_summary
+    
+    def _default_warmup_batch_sizes(self) -> list:
+        configured = os.getenv("WARMUP_BATCH_SIZES")
+        if configured:
+            return [int(size) for size in configured.split(",") if size.strip()]
+        if self.model_loader is None:
+            return [1]
+        
+        max_size = self.batch_scheduler.max_batch_size if self.batch_scheduler is not None else 1
+        sizes = []
+        size = 1
+        while size < max_size:
+            sizes.append(size)
+            size *= 2
+        sizes.append(max_size)
+        # Bulk images and video frames arrive in chunks of these sizes; an
+        # optimized backend would otherwise compile for them on the first request
+        sizes += [self.batch_chunk_size, self.stream_chunk_size]
+        return sorted(set(sizes))
+    
+    def detect_image(self, image_path: str, latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
         """
         Detect deepfakes in an image using state-of-the-art models or CV fallback
         
         Args:
             image_path: Path to the image file
+            latency_budget_ms: Run only the models expected to finish within this budget
             
         Returns:
             Dictionary containing detection results
         """
+        return self._detect_image(image_path, image_path, latency_budget_ms)
+    
+    def detect_image_bytes(self, data: bytes, filename: str = "upload",
+                           latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Detect deepfakes in an encoded image held in memory
+        
+        Args:
+            data: Encoded image bytes (JPEG, PNG, ...)
+            filename: Name reported back in the result
+            latency_budget_ms: Run only the models expected to finish within this budget
+            
+        Returns:
+            Dictionary containing detection results
+        """
+        with timed_stage("decode"):
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return {
+                "error": "Could not decode image",
+                "file_path": filename
+            }
+        return self._detect_image(image, filename, latency_budget_ms)
+    
+    def detect_image_array(self, image: np.ndarray, source: str = "array",
+                           latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Detect deepfakes in a decoded BGR uint8 image array
+        
+        Args:
+            image: Image as returned by cv2.imread / cv2.imdecode
+            source: Name reported back in the result
+            latency_budget_ms: Run only the models expected to finish within this budget
+            
+        Returns:
+            Dictionary containing detection results
+        """
+        return self._detect_image(image, source, latency_budget_ms)
+    
+    def _detect_image(self, image, source: str, latency_budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Shared image detection path; `image` is a file path or a BGR array"""
         try:
             if not self.models_available:
                 return {
                     "error": "Deepfake detection models not available",
-                    "file_path": image_path,
+                    "file_path": source,
                     "status": "models_missing"
                 }
             
             # Check if we have advanced models or need to use CV fallback
             if self.model_loader is None:
-                return self._detect_image_cv_fallback(image_path)
+                with timed_stage("cv_features"):
+                    return self._detect_image_cv_fallback(image, source)
+            
+            # Decoded arrays arrive in OpenCV's BGR order; the loader swaps channels
+            color_order = 'bgr' if isinstance(image, np.ndarray) else 'rgb'
+            
+            # With a latency budget, run the best subset of models that fits it
+            model_names = None
+            estimated = None
+            if latency_budget_ms is not None:
+                # With face crops every face is another image in the forward
+                forwards = self.face_cropper.expected_faces() if self.face_cropper is not None else 1.0
+                model_names, estimated = self.model_loader.select_models(latency_budget_ms / 1000.0,
+                                                                         forwards=forwards)
+            
+            if self.face_cropper is not None:
+                started_at = time.perf_counter()
+                result = self._detect_faces([(image, source)], model_names)[0]
+                if latency_budget_ms is not None and "models_used" in result:
+                    result["latency_budget"] = self._latency_budget_report(
+                        latency_budget_ms, result["models_used"], estimated, time.perf_counter() - started_at
+                    )
+                return result
             
             # Use ensemble prediction for best accuracy
-            ensemble_result = self.model_loader.ensemble_predict(image_path)
+            started_at = time.perf_counter()
+            if self.batch_scheduler is not None:
+                ensemble_result = self.batch_scheduler.ensemble_predict(image, model_names=model_names,
+                                                                        color_order=color_order)
+            else:
+                ensemble_result = self.model_loader.ensemble_predict(image, model_names=model_names,
+                                                                     color_order=color_order)
+            elapsed = time.perf_counter() - started_at
             
             if "error" in ensemble_result:
                 # Fallback to individual model prediction
-                individual_predictions = self.model_loader.predict_image(image_path)
+                individual_predictions = self.model_loader.predict_image(image, model_names, color_order)
                 
                 # Find best available prediction
                 best_prediction = None
@@ -127,7 +326,7 @@ class DeepSecureInference:
                 if best_prediction is None:
                     return {
                         "error": "All deepfake detection models failed",
-                        "file_path": image_path,
+                        "file_path": source,
                         "model_errors": individual_predictions
                     }
                 
@@ -141,38 +340,186 @@ class DeepSecureInference:
                     "confidence": float(confidence),
                     "fake_probability": float(fake_prob),
                     "result": f"The image is {'FAKE' if is_fake else 'REAL'}. Confidence: {confidence:.3f}",
-                    "file_path": image_path,
+                    "file_path": source,
                     "detection_method": "single_model_fallback",
                     "model_predictions": individual_predictions
                 }
             
             # Use ensemble result
-            fake_prob = ensemble_result["ensemble_fake_probability"]
-            is_fake = ensemble_result["ensemble_is_fake"]
-            confidence = ensemble_result["confidence"]
-            
-            return {
-                "is_fake": bool(is_fake),
-                "confidence": float(confidence),
-                "fake_probability": float(fake_prob),
-                "result": f"The image is {'FAKE' if is_fake else 'REAL'}. Confidence: {confidence:.3f}",
-                "file_path": image_path,
-                "detection_method": "ensemble",
-                "models_used": ensemble_result["models_used"],
-                "individual_predictions": ensemble_result["individual_predictions"]
-            }
+            result = self._format_ensemble_result(ensemble_result, source)
+            if latency_budget_ms is not None:
+                result["latency_budget"] = self._latency_budget_report(
+                    latency_budget_ms, ensemble_result["models_used"], estimated, elapsed
+                )
+            return result
                 
         except Exception as e:
             return {
                 "error": f"Error processing image: {str(e)}",
-                "file_path": image_path
+                "file_path": source
             }
     
-    def _detect_image_cv_fallback(self, image_path: str) -> Dict[str, Any]:
-        """Computer vision fallback for image detection"""
+    def _format_ensemble_result(self, ensemble_result: Dict[str, Any], source: str) -> Dict[str, Any]:
+        """Build the image response from a DeepfakeModelLoader ensemble result"""
+        fake_prob = ensemble_result["ensemble_fake_probability"]
+        is_fake = ensemble_result["ensemble_is_fake"]
+        confidence = ensemble_result["confidence"]
+        
+        return {
+            "is_fake": bool(is_fake),
+            "confidence": float(confidence),
+            "fake_probability": float(fake_prob),
+            "result": f"The image is {'FAKE' if is_fake else 'REAL'}. Confidence: {confidence:.3f}",
+            "file_path": source,
+            "detection_method": "ensemble",
+            "models_used": ensemble_result["models_used"],
+            "individual_predictions": ensemble_result["individual_predictions"]
+        }
+    
+    def _detect_faces(self, items: list, model_names: list = None) -> list:
+        """
+        Face-crop detection for (image, source) pairs
+        
+        The faces of all the images are scored together, in stacked forwards of
+        up to BATCH_CHUNK_SIZE crops. An image without a face never reaches the
+        neural models and gets the computer vision analysis instead.
+        """
+        results = [None] * len(items)
+        found = []
+        for i, (image, source) in enumerate(items):
+            with timed_stage("decode"):
+                image = self._load_bgr_image(image)
+            if image is None:
+                results[i] = {"error": "Could not decode image", "file_path": source}
+                continue
+            faces, crops = self.face_cropper.crops(image, 'bgr')
+            if faces:
+                found.append((i, faces, crops))
+                continue
+            with timed_stage("cv_features"):
+                # The face consistency analysis scores an image without faces 0.5
+                result = self._detect_image_cv_fallback(image, source, face_score=0.5)
+            if "error" not in result:
+                result.update({"detection_method": "no_face_computer_vision", "faces_detected": 0, "faces": []})
+            results[i] = result
+        
+        if not found:
+            return results
+        ensemble_results = self.model_loader.ensemble_predict_arrays(
+            [crop for _, _, crops in found for crop in crops], color_order='bgr',
+            model_names=model_names, chunk_size=self.batch_chunk_size
+        )
+        row = 0
+        for i, faces, _ in found:
+            combined = combine_faces(faces, ensemble_results[row:row + len(faces)])
+            row += len(faces)
+            source = items[i][1]
+            if "error" in combined:
+                results[i] = {
+                    "error": "All deepfake detection models failed",
+                    "file_path": source,
+                    "faces": combined["faces"]
+                }
+                continue
+            result = self._format_ensemble_result(combined, source)
+            result.update({
+                "detection_method": "face_ensemble",
+                "faces_detected": len(faces),
+                "decisive_face": combined["decisive_face"],
+                "faces": combined["faces"]
+            })
+            results[i] = result
+        return results
+    
+    def _latency_budget_report(self, budget_ms: float, models_run: list,
+                               estimated: Optional[float], elapsed: float) -> Dict[str, Any]:
+        """Which models a budgeted request ran, their renormalized weights and estimated vs actual cost"""
+        weights = self.model_loader.DEFAULT_WEIGHTS
+        total_weight = sum(weights.get(name, 1.0) for name in models_run)
+        return {
+            "budget_ms": float(budget_ms),
+            "models_run": list(models_run),
+            "models_skipped": [name for name in self.model_loader.models if name not in models_run],
+            "weights": {name: weights.get(name, 1.0) / total_weight for name in models_run},
+            "estimated_ms": estimated * 1000.0 if estimated is not None else None,
+            "actual_ms": elapsed * 1000.0,
+            "within_budget": elapsed * 1000.0 <= budget_ms
+        }
+    
+    def detect_image_bytes_batch(self, items: list) -> list:
+        """
+        Detect deepfakes in several encoded images with one stacked forward per model
+        
+        Args:
+            items: List of (data, filename) tuples
+            
+        Returns:
+            List of detection results, in the same order as `items`
+        """
+        results = [None] * len(items)
+        decoded = []
+        
+        for i, (data, filename) in enumerate(items):
+            with timed_stage("decode"):
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                results[i] = {"error": "Could not decode image", "file_path": filename}
+            else:
+                decoded.append((i, image, filename))
+        
+        if not decoded:
+            return results
+        
+        # Without the neural models every image takes the per-image CV path
+        if not self.models_available or self.model_loader is None:
+            for i, image, filename in decoded:
+                results[i] = self._detect_image(image, filename)
+            return results
+        
         try:
-            # Use traditional computer vision techniques
-            fake_probability = self._analyze_image_for_deepfakes(image_path)
+            if self.face_cropper is not None:
+                for (i, _, _), result in zip(decoded, self._detect_faces([(image, filename) for _, image, filename in decoded])):
+                    results[i] = result
+                return results
+            ensemble_results = self.model_loader.ensemble_predict_arrays(
+                [image for _, image, _ in decoded], color_order='bgr', chunk_size=self.batch_chunk_size
+            )
+        except Exception as e:
+            for i, _, filename in decoded:
+                results[i] = {"error": f"Error processing image: {str(e)}", "file_path": filename}
+            return results
+        
+        for (i, _, filename), ensemble_result in zip(decoded, ensemble_results):
+            if "error" in ensemble_result:
+                results[i] = {
+                    "error": "All deepfake detection models failed",
+                    "file_path": filename,
+                    "model_errors": ensemble_result["individual_predictions"]
+                }
+            else:
+                results[i] = self._format_ensemble_result(ensemble_result, filename)
+        
+        return results
+    
+    def _detect_image_cv_fallback(self, image, source: str, face_score: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Computer vision fallback for image detection
+        
+        `face_score` replaces the face consistency analysis when the caller already
+        knows its outcome, sparing a second face detection pass.
+        """
+        try:
+            # Decode once and share the array between analyzers
+            image = self._load_bgr_image(image)
+            if image is None:
+                return {
+                    "error": "Could not decode image",
+                    "file_path": source
+                }
+            
+            # Use traditional computer vision techniques, all features from one grayscale pass
+            features = self.cv_features.extract(image, face_score)
+            fake_probability = self.cv_features.fake_probability(features)
             is_fake = bool(fake_probability > 0.6)
             confidence = max(fake_probability, 1 - fake_probability)
             
@@ -181,26 +528,31 @@ class DeepSecureInference:
                 "confidence": float(confidence),
                 "fake_probability": float(fake_probability),
                 "result": f"The image is {'FAKE' if is_fake else 'REAL'}. Confidence: {confidence:.3f}",
-                "file_path": image_path,
+                "file_path": source,
                 "detection_method": "computer_vision_fallback",
-                "analysis": {
-                    "noise_analysis": float(self._analyze_noise_patterns(image_path)),
-                    "compression_artifacts": float(self._analyze_compression_artifacts(image_path)),
-                    "face_consistency": float(self._analyze_face_consistency(image_path))
-                }
+                "analysis": self.cv_features.as_dict(features)
             }
         except Exception as e:
             return {
                 "error": f"CV analysis failed: {str(e)}",
-                "file_path": image_path
+                "file_path": source
             }
     
-    def detect_video(self, video_path: str) -> Dict[str, Any]:
+    def detect_video(self, video_path: str,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     frame_callback: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                     confidence: Optional[float] = None) -> Dict[str, Any]:
         """
         Detect deepfakes in a video using frame-by-frame analysis
         
         Args:
             video_path: Path to the video file
+            progress_callback: Optional callable receiving (frames_done, frames_planned)
+            frame_callback: Optional callable receiving each frame's scores plus the running
+                aggregate; returning True stops scoring the remaining frames
+            confidence: Sample adaptively and stop once the verdict is settled at this
+                confidence (defaults to VIDEO_SAMPLING_CONFIDENCE; unset samples 10
+                evenly spaced frames)
             
         Returns:
             Dictionary containing detection results
@@ -213,73 +565,152 @@ class DeepSecureInference:
                     "status": "models_missing"
                 }
             
-            # Extract frames from video
-            frames = self._extract_video_frames(video_path, max_frames=10)
+            if confidence is None:
+                confidence = self.sampling_confidence
             
-            if not frames:
+            with timed_stage("decode"):
+                video = self.frame_sampler.probe(video_path)
+            total_frames, fps = video["total_frames"], video["fps"]
+            
+            if confidence is None:
+                plan = None
+                frame_numbers = sample_indices(total_frames, 10)
+            else:
+                plan = AdaptiveSampling.from_env(confidence)
+                frame_cap = plan.frame_cap(total_frames, fps)
+                frame_numbers = plan.initial(total_frames, frame_cap)
+            
+            if not frame_numbers:
                 return {
                     "error": "Could not extract frames from video",
                     "file_path": video_path
                 }
             
-            # Analyze each frame
+            # Decode, preprocess and score overlap; frames are stacked into batches
+            # of chunk_size, smaller for streamed videos so stopping early still saves work
+            chunk_size = self.batch_chunk_size if frame_callback is None else self.stream_chunk_size
+            if frame_callback is None and self.video_shards.should_shard(total_frames, fps):
+                # Long clips are split into time ranges scored by separate processes
+                pipeline = self.video_shards.scorer(chunk_size)
+            else:
+                pipeline = VideoPipeline(self.model_loader, self.frame_sampler, chunk_size, self.pipeline_depth,
+                                         self.face_cropper)
             frame_results = []
-            temp_files = []
-            
-            for i, frame in enumerate(frames):
-                # Save frame temporarily
-                temp_frame_path = os.path.join(tempfile.gettempdir(), f"temp_frame_{i}_{os.getpid()}.jpg")
-                cv2.imwrite(temp_frame_path, frame)
-                temp_files.append(temp_frame_path)
+            frames_decoded = []
+            scores = {}
+            attempted = set(frame_numbers)
+            frames_seen = 0
+            frames_without_faces = 0
+            frames_planned = len(frame_numbers)
+            rounds = 0
+            stopped_early = False
+            stopped_by = None
+            
+            if progress_callback is not None:
+                progress_callback(0, frames_planned)
+            
+            while True:
+                rounds += 1
+                with closing(pipeline.results(video_path, frame_numbers, video["seekable"])) as results:
+                    for frame_number, frame_result in results:
+                        frames_seen += 1
+                        frames_decoded.append(frame_number)
+                        
+                        if frame_result.get("faces") == []:
+                            frames_without_faces += 1
+                        elif "error" not in frame_result:
+                            scores[frame_number] = frame_result["ensemble_fake_probability"]
+                            frame_results.append({
+                                "frame_index": frames_seen - 1,
+                                "frame_number": frame_number,
+                                "timestamp_seconds": (frame_number / fps) if fps > 0 else None,
+                                "fake_probability": frame_result["ensemble_fake_probability"],
+                                "is_fake": frame_result["ensemble_is_fake"],
+                                "confidence": frame_result["confidence"]
+                            })
+                            if "faces" in frame_result:
+                                frame_results[-1]["faces"] = [
+                                    {key: value for key, value in face.items() if key != "individual_predictions"}
+                                    for face in frame_result["faces"]
+                                ]
+                            
+                            if frame_callback is not None:
+                                event = dict(frame_results[-1], frames_planned=frames_planned, running=self._summarize_frames(frame_results))
+                                if frame_callback(event):
+                                    stopped_early = True
+                        
+                        if progress_callback is not None:
+                            progress_callback(frames_seen, frames_planned)
+                        
+                        if stopped_early:
+                            break
                 
-                # Analyze frame with ensemble
-                frame_result = self.model_loader.ensemble_predict(temp_frame_path)
+                if plan is None or stopped_early:
+                    break
+                if plan.is_decided(list(scores.values()), frame_cap):
+                    stopped_by = "confidence"
+                    break
                 
-                if "error" not in frame_result:
-                    frame_results.append({
-                        "frame_index": i,
-                        "fake_probability": frame_result["ensemble_fake_probability"],
-                        "is_fake": frame_result["ensemble_is_fake"],
-                        "confidence": frame_result["confidence"]
-                    })
-            
-            # Clean up temporary files
-            for temp_file in temp_files:
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
+                # Add frames where the scores disagree or are uncertain
+                frame_numbers = plan.refine(scores, attempted, frame_cap)
+                if not frame_numbers:
+                    stopped_by = "frame_cap" if len(attempted) >= frame_cap else "exhausted"
+                    break
+                attempted.update(frame_numbers)
+                frames_planned += len(frame_numbers)
             
-            if not frame_results:
+            pipeline_stats = pipeline.get_stats()
+            record_stage("decode", pipeline_stats["stages"].get("decode", {}).get("busy_seconds", 0.0))
+            
+            if frames_seen == 0:
                 return {
-                    "error": "No frames could be analyzed successfully",
+                    "error": "Could not extract frames from video",
                     "file_path": video_path
                 }
             
-            # Aggregate results
-            fake_probabilities = [r["fake_probability"] for r in frame_results]
-            confidences = [r["confidence"] for r in frame_results]
+            sampling = {"mode": "uniform" if plan is None else "adaptive", "frames_needed": len(frame_results)}
+            if plan is not None:
+                sampling.update({
+                    "confidence": plan.confidence,
+                    "frame_cap": frame_cap,
+                    "rounds": rounds,
+                    "stopped_by": "client" if stopped_early else stopped_by
+                })
+            # Frames arrive out of order across shards and sampling rounds; index
+            # them by their position in the video among the frames decoded
+            positions = {frame_number: index for index, frame_number in enumerate(sorted(frames_decoded))}
+            for frame_result in frame_results:
+                frame_result["frame_index"] = positions[frame_result["frame_number"]]
+            frame_results.sort(key=lambda r: r["frame_index"])
             
-            avg_fake_probability = np.mean(fake_probabilities)
-            avg_confidence = np.mean(confidences)
-            is_fake = bool(avg_fake_probability > 0.5)
+            if not frame_results:
+                return {
+                    "error": "No faces found in the sampled frames" if frames_without_faces == frames_seen
+                    else "No frames could be analyzed successfully",
+                    "file_path": video_path
+                }
             
-            # Calculate consistency score
-            fake_votes = sum(1 for r in frame_results if r["is_fake"])
-            consistency = max(fake_votes, len(frame_results) - fake_votes) / len(frame_results)
+            # Aggregate results
+            with timed_stage("aggregate"):
+                summary = self._summarize_frames(frame_results)
             
             return {
-                "is_fake": is_fake,
-                "confidence": float(avg_confidence),
-                "fake_probability": float(avg_fake_probability),
-                "result": f"The video is {'FAKE' if is_fake else 'REAL'}. Confidence: {avg_confidence:.3f}",
+                "is_fake": summary["is_fake"],
+                "confidence": summary["confidence"],
+                "fake_probability": summary["fake_probability"],
+                "result": f"The video is {'FAKE' if summary['is_fake'] else 'REAL'}. Confidence: {summary['confidence']:.3f}",
                 "file_path": video_path,
                 "frame_analysis": {
-                    "total_frames_analyzed": len(frame_results),
-                    "fake_frames": fake_votes,
-                    "real_frames": len(frame_results) - fake_votes,
-                    "consistency_score": float(consistency),
-                    "frame_results": frame_results
+                    "total_frames_analyzed": summary["frames_scored"],
+                    "fake_frames": summary["fake_frames"],
+                    "real_frames": summary["real_frames"],
+                    "consistency_score": summary["consistency_score"],
+                    "frames_planned": frames_planned,
+                    "frames_without_faces": frames_without_faces if self.face_cropper is not None else None,
+                    "stopped_early": stopped_early,
+                    "frame_results": frame_results,
+                    "sampling": sampling,
+                    "pipeline": pipeline_stats
                 }
             }
                 
@@ -289,6 +720,25 @@ class DeepSecureInference:
                 "file_path": video_path
             }
     
+    def _summarize_frames(self, frame_results: list) -> Dict[str, Any]:
+        """Aggregate per-frame scores into a video-level verdict"""
+        avg_fake_probability = float(np.mean([r["fake_probability"] for r in frame_results]))
+        avg_confidence = float(np.mean([r["confidence"] for r in frame_results]))
+        
+        # Calculate consistency score
+        fake_votes = sum(1 for r in frame_results if r["is_fake"])
+        consistency = max(fake_votes, len(frame_results) - fake_votes) / len(frame_results)
+        
+        return {
+            "is_fake": bool(avg_fake_probability > 0.5),
+            "confidence": avg_confidence,
+            "fake_probability": avg_fake_probability,
+            "frames_scored": len(frame_results),
+            "fake_frames": fake_votes,
+            "real_frames": len(frame_results) - fake_votes,
+            "consistency_score": float(consistency)
+        }
+    
     def detect_audio(self, audio_path: str) -> Dict[str, Any]:
         """
         Detect deepfakes in an audio file using advanced audio analysis
@@ -299,16 +749,66 @@ class DeepSecureInference:
         Returns:
             Dictionary containing detection results
         """
+        return self._detect_audio(audio_path, audio_path)
+    
+    def detect_audio_bytes(self, data: bytes, filename: str = "upload") -> Dict[str, Any]:
+        """
+        Detect deepfakes in an encoded audio file held in memory
+        
+        Args:
+            data: Encoded audio bytes (WAV, FLAC, OGG, ...)
+            filename: Name reported back in the result
+            
+        Returns:
+            Dictionary containing detection results
+        """
+        try:
+            with timed_stage("decode"):
+                audio = self._decode_audio_bytes(data, filename)
+        except Exception as e:
+            return {
+                "error": f"Could not decode audio: {str(e)}",
+                "file_path": filename
+            }
+        return self._detect_audio(audio, filename)
+    
+    def detect_audio_array(self, y: np.ndarray, sr: int, source: str = "array") -> Dict[str, Any]:
+        """
+        Detect deepfakes in a decoded mono waveform
+        
+        Args:
+            y: Audio samples as float32
+            sr: Sample rate of `y`
+            source: Name reported back in the result
+            
+        Returns:
+            Dictionary containing detection results
+        """
+        return self._detect_audio((y, sr), source)
+    
+    def _detect_audio(self, audio, source: str) -> Dict[str, Any]:
+        """Shared audio detection path; `audio` is a file path or a (y, sr) tuple"""
         try:
             if not self.models_available:
                 return {
                     "error": "Audio analysis models not available",
-                    "file_path": audio_path,
+                    "file_path": source,
                     "status": "models_missing"
                 }
             
+            # Decode and resample once, then share the waveform between analyzers
+            with timed_stage("decode"):
+                audio = self._load_audio(audio)
+            
             # Advanced audio analysis for deepfake detection
-            fake_probability = self._analyze_audio_deepfakes(audio_path)
+            with timed_stage("audio_features"):
+                fake_probability = self._analyze_audio_deepfakes(audio)
+                analysis = {
+                    "spectral_analysis": float(self._analyze_spectral_features(audio)),
+                    "temporal_consistency": float(self._analyze_temporal_consistency(audio)),
+                    "voice_quality": float(self._analyze_voice_quality(audio)),
+                    "prosodic_features": float(self._analyze_prosodic_features(audio))
+                }
             is_fake = bool(fake_probability > 0.6)
             confidence = max(fake_probability, 1 - fake_probability)
             
@@ -317,66 +817,55 @@ class DeepSecureInference:
                 "confidence": float(confidence),
                 "fake_probability": float(fake_probability),
                 "result": f"The audio is {'FAKE' if is_fake else 'REAL'}. Confidence: {confidence:.3f}",
-                "file_path": audio_path,
-                "analysis": {
-                    "spectral_analysis": float(self._analyze_spectral_features(audio_path)),
-                    "temporal_consistency": float(self._analyze_temporal_consistency(audio_path)),
-                    "voice_quality": float(self._analyze_voice_quality(audio_path)),
-                    "prosodic_features": float(self._analyze_prosodic_features(audio_path))
-                }
+                "file_path": source,
+                "analysis": analysis
             }
                 
         except Exception as e:
             return {
                 "error": f"Error processing audio: {str(e)}",
-                "file_path": audio_path
+                "file_path": source
             }
     
-    def _extract_video_frames(self, video_path: str, max_frames: int = 10) -> list:
-        """Extract frames from video for analysis"""
+    def _decode_audio_bytes(self, data: bytes, filename: str = "upload") -> tuple:
+        """Decode audio bytes to a mono (y, sr) tuple, in memory where possible"""
+        if SOUNDFILE_AVAILABLE:
+            try:
+                y, sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+                return y.mean(axis=1), sr
+            except Exception:
+                pass
+        
+        # Containers libsndfile cannot parse (e.g. MP3/M4A) go through librosa's file loader
+        suffix = os.path.splitext(filename)[1] or '.wav'
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+            tmp_file.write(data)
+            tmp_path = tmp_file.name
         try:
-            cap = cv2.VideoCapture(video_path)
-            frames = []
-            frame_count = 0
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames == 0:
-                cap.release()
-                return []
-            
-            # Sample frames evenly
-            sample_indices = np.linspace(0, total_frames-1, min(max_frames, total_frames), dtype=int)
-            
-            for i in range(total_frames):
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                if i in sample_indices:
-                    frames.append(frame)
-                    frame_count += 1
-                    
-                if frame_count >= max_frames:
-                    break
-            
-            cap.release()
-            return frames
-            
-        except Exception as e:
-            print(f"Error extracting video frames: {e}")
-            return []
+            return librosa.load(tmp_path, sr=22050)
+        finally:
+            os.unlink(tmp_path)
+    
+    def _load_audio(self, audio, target_sr: int = 22050) -> tuple:
+        """Return a mono (y, sr) tuple at `target_sr` from a file path or (y, sr) tuple"""
+        if isinstance(audio, tuple):
+            y, sr = audio
+            if sr != target_sr:
+                y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+            return y, target_sr
+        return librosa.load(audio, sr=target_sr)
     
-    def _analyze_audio_deepfakes(self, audio_path: str) -> float:
+    def _analyze_audio_deepfakes(self, audio) -> float:
         """Advanced audio deepfake analysis"""
         try:
             # Load audio
-            y, sr = librosa.load(audio_path, sr=22050)
+            y, sr = self._load_audio(audio)
             
             # Multiple analysis techniques
-            spectral_score = self._analyze_spectral_features(audio_path)
-            temporal_score = self._analyze_temporal_consistency(audio_path)
-            voice_score = self._analyze_voice_quality(audio_path)
-            prosodic_score = self._analyze_prosodic_features(audio_path)
+            spectral_score = self._analyze_spectral_features((y, sr))
+            temporal_score = self._analyze_temporal_consistency((y, sr))
+            voice_score = self._analyze_voice_quality((y, sr))
+            prosodic_score = self._analyze_prosodic_features((y, sr))
             
             # Advanced feature analysis
             mfcc_score = self._analyze_mfcc_patterns(y, sr)
@@ -398,10 +887,10 @@ class DeepSecureInference:
             print(f"Error in audio analysis: {e}")
             return 0.5
     
-    def _analyze_spectral_features(self, audio_path: str) -> float:
+    def _analyze_spectral_features(self, audio) -> float:
         """Analyze spectral features for artificial patterns"""
         try:
-            y, sr = librosa.load(audio_path, sr=22050)
+            y, sr = self._load_audio(audio)
             
             # Extract spectral features
             spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
@@ -422,10 +911,10 @@ class DeepSecureInference:
         except:
             return 0.5
     
-    def _analyze_temporal_consistency(self, audio_path: str) -> float:
+    def _analyze_temporal_consistency(self, audio) -> float:
         """Analyze temporal consistency of audio"""
         try:
-            y, sr = librosa.load(audio_path, sr=22050)
+            y, sr = self._load_audio(audio)
             
             # Analyze temporal patterns
             tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
@@ -443,10 +932,10 @@ class DeepSecureInference:
         except:
             return 0.5
     
-    def _analyze_voice_quality(self, audio_path: str) -> float:
+    def _analyze_voice_quality(self, audio) -> float:
         """Analyze voice quality indicators"""
         try:
-            y, sr = librosa.load(audio_path, sr=22050)
+            y, sr = self._load_audio(audio)
             
             # Voice quality features
             spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
@@ -468,10 +957,10 @@ class DeepSecureInference:
         except:
             return 0.5
     
-    def _analyze_prosodic_features(self, audio_path: str) -> float:
+    def _analyze_prosodic_features(self, audio) -> float:
         """Analyze prosodic features for naturalness"""
         try:
-            y, sr = librosa.load(audio_path, sr=22050)
+            y, sr = self._load_audio(audio)
             
             # Prosodic features
             pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
@@ -563,94 +1052,42 @@ class DeepSecureInference:
         
         return status
     
-    def _analyze_image_for_deepfakes(self, image_path: str) -> float:
-        """Analyze image for deepfake indicators using computer vision"""
-        try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                return 0.5
-            
-            # Convert to grayscale for analysis
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Multiple analysis techniques
-            noise_score = self._analyze_noise_patterns(image_path)
-            compression_score = self._analyze_compression_artifacts(image_path)
-            face_score = self._analyze_face_consistency(image_path)
-            
-            # Combine scores (weighted average)
-            combined_score = (noise_score * 0.4 + compression_score * 0.3 + face_score * 0.3)
-            
-            return min(combined_score, 1.0)
-            
-        except Exception as e:
-            print(f"Error in image analysis: {e}")
-            return 0.5
-    
-    def _analyze_noise_patterns(self, image_path: str) -> float:
-        """Analyze noise patterns for inconsistencies"""
-        try:
-            image = cv2.imread(image_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply noise analysis filters
-            laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-            variance = laplacian.var()
-            
-            # Normalize variance (typical range: 0-1000)
-            normalized_variance = min(variance / 500.0, 1.0)
-            
-            # Higher variance might indicate artificial noise
-            return normalized_variance
-            
-        except:
-            return 0.5
+    def get_model_version(self) -> str:
+        """
+        Identifier of the weights producing results; changes whenever a checkpoint changes
+        
+        Returns:
+            Model version string
+        """
+        if self.model_loader is None:
+            return "cv-fallback"
+        version = self.model_loader.get_model_version()
+        # Adaptive sampling by default changes what a video result covers
+        if self.sampling_confidence is not None:
+            version += f"-adaptive{self.sampling_confidence}"
+        if self.face_cropper is not None:
+            version += f"-{self.face_cropper.describe()}"
+        return version
     
-    def _analyze_compression_artifacts(self, image_path: str) -> float:
-        """Analyze compression artifacts"""
-        try:
-            image = cv2.imread(image_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # DCT-based analysis for compression artifacts
-            # Simple edge detection for artifacts
-            edges = cv2.Canny(gray, 50, 150)
-            edge_density = np.sum(edges > 0) / (edges.shape[0] * edges.shape[1])
-            
-            # Normalize edge density
-            return min(edge_density * 10, 1.0)
-            
-        except:
-            return 0.5
+    def get_runtime_stats(self) -> Dict[str, Any]:
+        """
+        Get runtime counters for the serving path
+        
+        Returns:
+            Dictionary containing batching, latency estimate and cascade statistics
+        """
+        cascade = self.model_loader.cascade if self.model_loader is not None else None
+        return {
+            "model_latency_ms": {
+                name: seconds * 1000.0 for name, seconds in self.model_loader.latency_estimates.items()
+            } if self.model_loader is not None else {},
+            "image_batching": self.batch_scheduler.get_stats() if self.batch_scheduler is not None else None,
+            "ensemble_cascade": cascade.get_stats() if cascade is not None else None,
+            "face_crops": self.face_cropper.get_stats() if self.face_cropper is not None else None
+        }
     
-    def _analyze_face_consistency(self, image_path: str) -> float:
-        """Analyze face consistency and naturalness"""
-        try:
-            # Load face detection model
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
-            image = cv2.imread(image_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            if len(faces) == 0:
-                return 0.5  # No face detected
-            
-            # Analyze face regions for consistency
-            face_scores = []
-            for (x, y, w, h) in faces:
-                face_roi = gray[y:y+h, x:x+w]
-                
-                # Analyze face region
-                # Simple texture analysis
-                texture_variance = np.var(face_roi)
-                normalized_texture = min(texture_variance / 1000.0, 1.0)
-                face_scores.append(normalized_texture)
-            
-            return np.mean(face_scores) if face_scores else 0.5
-            
-        except:
-            return 0.5
\ No newline at end of file
+    def _load_bgr_image(self, image) -> Optional[np.ndarray]:
+        """Return a BGR array for a file path, or the array itself if already decoded"""
+        if isinstance(image, np.ndarray):
+            return image
+        return cv2.imread(image)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Standalone inference server
+Loads the models once and serves any number of API frontends over local IPC
+(INFERENCE_EXECUTOR=remote)
+"""
+
+import multiprocessing
+import os
+import secrets
+import stat
+import tempfile
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Union, Tuple
+
+import metrics
+
+# Written next to the socket when INFERENCE_SERVER_AUTHKEY is not set
+AUTHKEY_FILENAME = "authkey"
+
+
+def default_address() -> str:
+    """A socket in a directory only this user can enter, e.g. /tmp/deepsecure-1000/inference.sock"""
+    return os.path.join(tempfile.gettempdir(), f"deepsecure-{os.getuid()}", "inference.sock")
+
+
+def server_address() -> Union[str, Tuple[str, int]]:
+    """INFERENCE_SERVER_ADDRESS: a unix socket path or host:port"""
+    address = os.getenv("INFERENCE_SERVER_ADDRESS") or default_address()
+    if address.startswith("/") or ":" not in address:
+        return address
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def private_directory(path: str, create: bool = False) -> str:
+    """
+    Check that `path` is a directory owned by this user that nobody else can
+    write to (or, with create=True, make it 0700), since whoever can replace the
+    socket or the key file there can feed pickles to the server or its frontends
+    """
+    if create:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(f"{path} must be a directory owned by this user and not writable by others")
+    return path
+
+
+def configure_authkey(generate: bool = False) -> bytes:
+    """
+    Adopt the inference server's authkey as this process's multiprocessing authkey
+
+    The server and its frontends must share the key, both for the connection
+    itself and so that queue proxies passed along with a call (SSE frame events)
+    can be reconnected on the other side. The key is INFERENCE_SERVER_AUTHKEY,
+    which TCP addresses require. Otherwise the server (generate=True) creates a
+    random key in a 0600 file next to its socket and frontends read it there.
+
+    Raises:
+        FileNotFoundError: If the server has not written its key yet
+    """
+    authkey = os.getenv("INFERENCE_SERVER_AUTHKEY")
+    if authkey is not None:
+        key = authkey.encode()
+    else:
+        address = server_address()
+        if not isinstance(address, str):
+            raise ValueError("INFERENCE_SERVER_AUTHKEY must be set when serving over TCP")
+        path = os.path.join(private_directory(os.path.dirname(address), create=generate), AUTHKEY_FILENAME)
+        if generate:
+            key = secrets.token_hex(32).encode()
+            if os.path.lexists(path):
+                os.unlink(path)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+        else:
+            with open(path, "rb") as f:
+                key = f.read().strip()
+    multiprocessing.current_process().authkey = key
+    return key
+
+
+class InferenceService:
+    """Engine wrapper exposed to frontends; every connection is served on its own thread"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def call(self, method: str, args: tuple, kwargs: dict):
+        """Run DeepSecureInference.<method> and return (started, finished, result, timings, batch sizes)"""
+        started_at = time.time()
+        with metrics.collect_timings() as timings:
+            result = getattr(self.engine, method)(*args, **kwargs)
+        # Batch sizes of any call since the last one, so each is exported by exactly one frontend
+        return started_at, time.time(), result, timings, metrics.drain_batch_sizes()
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register("service")
+
+_client_service = None
+_client_lock = threading.Lock()
+
+
+def connect_service():
+    """Proxy to the server's InferenceService, connected on first use"""
+    global _client_service
+    with _client_lock:
+        if _client_service is None:
+            manager = _ClientManager(address=server_address(), authkey=configure_authkey())
+            manager.connect()
+            _client_service = manager.service()
+        return _client_service
+
+
+def serve(engine=None):
+    """Load the models (unless an engine is given) and serve them until interrupted"""
+    metrics.forward_batch_sizes()
+    if engine is None:
+        from inference import DeepSecureInference
+        engine = DeepSecureInference()
+    engine.warm_up()
+
+    service = InferenceService(engine)
+    _ServerManager.register("service", callable=lambda: service, exposed=("call",))
+
+    address = server_address()
+    authkey = configure_authkey(generate=True)
+    if isinstance(address, str):
+        private_directory(os.path.dirname(address), create=True)
+        if os.path.lexists(address):
+            os.unlink(address)
+
+    # Bind the unix socket as 0600 from the start
+    umask = os.umask(0o177)
+    try:
+        server = _ServerManager(address=address, authkey=authkey).get_server()
+    finally:
+        os.umask(umask)
+    print(f"🚀 Inference server listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        if isinstance(address, str) and os.path.lexists(address):
+            os.unlink(address)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Asynchronous video analysis jobs
+SQLite-backed job store shared by the API process and any number of worker processes
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class JobStore:
+    """
+    Job table in a local SQLite database
+
+    Every operation opens its own short-lived connection, so the store can be
+    used from several threads and from separate worker processes at once.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, "
+                "kind TEXT NOT NULL, "
+                "status TEXT NOT NULL, "
+                "input_path TEXT NOT NULL, "
+                "filename TEXT, "
+                "frames_done INTEGER NOT NULL DEFAULT 0, "
+                "frames_planned INTEGER NOT NULL DEFAULT 0, "
+                "result TEXT, "
+                "error TEXT, "
+                "worker TEXT, "
+                "created_at REAL NOT NULL, "
+                "started_at REAL, "
+                "updated_at REAL NOT NULL, "
+                "finished_at REAL, "
+                "heartbeat_at REAL)"
+            )
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        """Open the store at JOB_DB"""
+        return cls(os.getenv("JOB_DB", os.path.join(BACKEND_DIR, "jobs", "jobs.db")))
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def create_job(self, kind: str, input_path: str, filename: str = None) -> str:
+        """Queue a new job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, input_path, filename, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, input_path, filename, now, now)
+            )
+        return job_id
+
+    def claim_next(self, worker: str, kind: str = "video") -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND kind = ? ORDER BY created_at LIMIT 1",
+                (kind,)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, updated_at = ?, heartbeat_at = ? "
+                "WHERE id = ?",
+                (worker, now, now, now, row["id"])
+            )
+            db.execute("COMMIT")
+        return dict(row)
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Mark a running job as still owned by `worker`; False once it was requeued"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker)
+            )
+            return cursor.rowcount > 0
+
+    def update_progress(self, job_id: str, frames_done: int, frames_planned: int):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET frames_done = ?, frames_planned = ?, updated_at = ? WHERE id = ?",
+                (frames_done, frames_planned, time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, result: Dict[str, Any], worker: str) -> bool:
+        """Store the result, unless the job was requeued away from `worker` meanwhile"""
+        now = time.time()
+        status = "failed" if "error" in result else "completed"
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result), result.get("error"), now, now, job_id, worker)
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, job_id: str, error: str, worker: str) -> bool:
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, now, now, job_id, worker)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, max_age_seconds: float) -> int:
+        """Return running jobs whose worker stopped sending heartbeats (it died) to the queue"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, updated_at) < ?",
+                (time.time() - max_age_seconds,)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job: status, progress and result"""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        planned = row["frames_planned"]
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "progress": {
+                "frames_done": row["frames_done"],
+                "frames_planned": planned,
+                "fraction": (row["frames_done"] / planned) if planned else 0.0
+            },
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class JobProgress:
+    """
+    Progress callback for one job
+
+    Picklable (the store only holds its path), so a process pool worker or the
+    shared inference server can report progress straight to the job table.
+    """
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+
+    def __call__(self, frames_done: int, frames_planned: int):
+        self.store.update_progress(self.job_id, frames_done, frames_planned)
+
+
+class VideoJobWorker:
+    """
+    Polls the job store and runs claimed jobs through `detect_video`
+
+    `detect_video(input_path, progress_callback)` returns a detection result:
+    DeepSecureInference.detect_video itself, or a function that submits to the
+    API's inference executor. While a job runs, a heartbeat marks it as owned
+    by this worker; jobs whose heartbeat is older than `stale_seconds` belong
+    to a dead worker and are requeued.
+    """
+
+    def __init__(self, detect_video: Callable[[str, Callable[[int, int], None]], Dict[str, Any]],
+                 store: JobStore, poll_interval: float = 1.0, name: str = None,
+                 heartbeat_interval: float = 30.0, stale_seconds: float = 600.0):
+        self.detect_video = detect_video
+        self.store = store
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_seconds = stale_seconds
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_requeue = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name=f"video-job-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """Stop after the current job; wait=False returns without waiting for it"""
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def run(self):
+        while not self._stop.is_set():
+            if time.time() - self._last_requeue >= self.heartbeat_interval:
+                self._last_requeue = time.time()
+                requeued = self.store.requeue_stale(self.stale_seconds)
+                if requeued:
+                    print(f"🔄 Requeued {requeued} video job(s) from workers that stopped responding")
+            job = self.store.claim_next(self.name)
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        while not done.wait(self.heartbeat_interval):
+            try:
+                if not self.store.heartbeat(job_id, self.name):
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️ Job heartbeat failed: {e}")
+
+    def run_job(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, done),
+                                     name=f"video-job-heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        owned = True
+        try:
+            result = self.detect_video(job["input_path"], JobProgress(self.store, job_id))
+            result["file_path"] = job["filename"] or result.get("file_path")
+            owned = self.store.complete(job_id, result, self.name)
+        except Exception as e:
+            owned = self.store.fail(job_id, f"Error processing video: {str(e)}", self.name)
+        finally:
+            done.set()
+            # A job requeued to another worker still needs its input
+            if owned:
+                try:
+                    os.remove(job["input_path"])
+                except OSError:
+                    pass
+
+
+def job_storage_dir() -> str:
+    """Directory where queued uploads wait for a worker (JOB_STORAGE_DIR)"""
+    directory = os.getenv("JOB_STORAGE_DIR", os.path.join(BACKEND_DIR, "jobs", "uploads"))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def start_workers(detect_video: Callable[[str, Callable[[int, int], None]], Dict[str, Any]],
+                  store: JobStore, count: int) -> list:
+    """Start `count` worker threads sharing one detect_video function (JOB_HEARTBEAT_SECONDS / JOB_STALE_SECONDS)"""
+    heartbeat_interval = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+    stale_seconds = float(os.getenv("JOB_STALE_SECONDS", "600"))
+    if stale_seconds <= heartbeat_interval:
+        raise ValueError("JOB_STALE_SECONDS must be longer than JOB_HEARTBEAT_SECONDS")
+    workers = [VideoJobWorker(detect_video, store, heartbeat_interval=heartbeat_interval,
+                              stale_seconds=stale_seconds) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def main():
+    """Run standalone video job workers: python jobs.py [num_workers]"""
+    from inference import DeepSecureInference
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("JOB_WORKERS", "1"))
+    store = JobStore.from_env()
+    engine = DeepSecureInference()
+
+    print(f"🚀 Starting {count} video job worker(s) on {store.db_path}")
+    workers = start_workers(
+        lambda path, progress_callback: engine.detect_video(path, progress_callback=progress_callback),
+        store, count
+    )
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print("🛑 Stopping video job workers...")
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
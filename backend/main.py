@@ -1,11 +1,22 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from typing import List, Optional
+import asyncio
+import hashlib
+import json
+import tarfile
+import zipfile
 import uvicorn
-from inference import DeepSecureInference
+from executor import InferenceExecutor, ExecutorBusyError
+from uploads import (read_upload, save_upload, UploadTooLargeError, TooManyItemsError, is_archive,
+                     expand_archive, max_upload_bytes)
+from result_cache import ResultCache
+from jobs import JobStore, job_storage_dir, start_workers
+from streaming import FrameEventChannel, format_sse
+from metrics import REGISTRY, ServerTimingMiddleware, timed_stage
+from readiness import Readiness
 import os
-import tempfile
-import shutil
 
 app = FastAPI(
     title="DeepSecure-AI API",
@@ -42,10 +53,213 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache"],
 )
 
-# Initialize the inference engine
-inference_engine = DeepSecureInference()
+# Per-stage timings for every request, reported as a Server-Timing header
+app.add_middleware(ServerTimingMiddleware)
+
+# The inference engine loads in the background after the port is open; /ready
+# reports progress. With INFERENCE_EXECUTOR=process each worker process builds
+# its own engine, and with INFERENCE_EXECUTOR=remote a shared inference server
+# (python inference_server.py) holds it, so the API process never loads the
+# models. Under gunicorn --preload (gunicorn_conf.py sets LOAD_MODELS_AT_IMPORT)
+# the models load here, in the master, so the forked workers share them.
+# Threads are started per worker at startup because they do not survive fork.
+inference_engine = None
+if os.getenv("INFERENCE_EXECUTOR", "thread") == "thread" and os.getenv("LOAD_MODELS_AT_IMPORT", "false").lower() == "true":
+    from inference import DeepSecureInference
+    inference_engine = DeepSecureInference(start_batching=False)
+
+readiness = Readiness()
+
+# Blocking inference runs on a bounded pool, never on the event loop
+inference_executor = InferenceExecutor.from_env(engine=inference_engine)
+
+def require_ready():
+    """Refuse inference with 503 until the models are loaded and warm"""
+    if not readiness.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Models are not ready ({readiness.stage}), please retry later",
+            headers={"Retry-After": str(readiness.retry_after)}
+        )
+
+async def run_inference(method: str, *args, **kwargs):
+    """Run an inference method on the executor, shedding load with 503 when full or still loading"""
+    require_ready()
+    try:
+        return await inference_executor.run(method, *args, **kwargs)
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Inference queue is full, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+# Results are cached under the SHA-256 of the upload and the serving model version
+result_cache = ResultCache.from_env()
+model_version = None
+
+async def cache_key(kind: str, digest: str) -> str:
+    """Result cache key for an upload digest under the serving model version"""
+    global model_version
+    if model_version is None:
+        model_version = await run_inference("get_model_version")
+    return f"{kind}:{model_version}:{digest}"
+
+async def cached_inference(kind: str, digest: str, filename: str, method: str, *args,
+                           latency_budget_ms: Optional[float] = None, **kwargs):
+    """
+    Run inference through the result cache; returns (result, cache status)
+    
+    Keyword arguments that change the result must also be reflected in `kind`.
+    """
+    key = await cache_key(kind, digest)
+    if latency_budget_ms is None:
+        result, status = await result_cache.get_or_compute(key, lambda: run_inference(method, *args, **kwargs))
+        result["file_path"] = filename
+        return result, status
+    
+    # A cached full-ensemble result beats any subset that fits the budget. Only
+    # budgeted results that still ran every model are cached, without the report.
+    cached = await result_cache.aget(key) if result_cache.enabled else None
+    if cached is not None:
+        cached["file_path"] = filename
+        return cached, "hit"
+    
+    result = await run_inference(method, *args, latency_budget_ms=latency_budget_ms)
+    report = result.get("latency_budget")
+    if result_cache.enabled and "error" not in result and (report is None or not report["models_skipped"]):
+        await result_cache.aput(key, {name: value for name, value in result.items() if name != "latency_budget"})
+    result["file_path"] = filename
+    return result, "miss"
+
+# Long videos can be submitted as jobs; state lives in SQLite so extra
+# workers can run in separate processes (python jobs.py)
+job_store = JobStore.from_env()
+job_workers = []
+
+def json_response(result: dict, cache_status: str) -> JSONResponse:
+    """Serialize a detection result, timed as the "serialize" stage"""
+    with timed_stage("serialize"):
+        return JSONResponse(content=result, headers={"X-Cache": cache_status})
+
+def image_batching_stats() -> Optional[dict]:
+    if inference_engine is None:
+        return None
+    return inference_engine.get_runtime_stats().get("image_batching")
+
+# Prometheus gauges and counters read from the components' own stats at scrape time
+REGISTRY.gauge(
+    "deepsecure_ready",
+    "1 once the models are loaded and warmed up",
+    lambda: [({}, 1.0 if readiness.ready else 0.0)]
+)
+REGISTRY.gauge(
+    "deepsecure_executor_queue_depth",
+    "Inference jobs waiting for a free worker",
+    lambda: [({}, inference_executor.get_stats()["queue_depth"])]
+)
+REGISTRY.gauge(
+    "deepsecure_executor_outstanding",
+    "Inference jobs queued or running",
+    lambda: [({}, inference_executor.get_stats()["outstanding"])]
+)
+REGISTRY.counter(
+    "deepsecure_executor_rejected_total",
+    "Inference jobs rejected with 503 because the queue was full",
+    lambda: [({}, inference_executor.get_stats()["rejected"])]
+)
+REGISTRY.counter(
+    "deepsecure_result_cache_lookups_total",
+    "Result cache lookups by outcome",
+    lambda: [
+        ({"result": name}, result_cache.get_stats()[name])
+        for name in ("memory_hits", "disk_hits", "misses", "coalesced")
+    ]
+)
+REGISTRY.gauge(
+    "deepsecure_result_cache_entries",
+    "Results held in the in-memory cache",
+    lambda: [({}, result_cache.get_stats()["entries"])]
+)
+REGISTRY.gauge(
+    "deepsecure_image_batch_queue_depth",
+    "Images waiting for the micro-batching scheduler",
+    lambda: [({}, stats["queued_images"]) for stats in [image_batching_stats()] if stats]
+)
+
+async def prepare_engine():
+    """Load (unless preloaded) and warm the models, then start the job workers"""
+    global inference_engine
+    try:
+        if inference_executor.kind == "thread":
+            if inference_engine is None:
+                readiness.set_stage("loading")
+                from inference import DeepSecureInference
+                inference_engine = await asyncio.to_thread(DeepSecureInference, start_batching=False)
+                inference_executor.engine = inference_engine
+            inference_engine.start_batching()
+            
+            readiness.set_stage("warming")
+            await asyncio.to_thread(inference_engine.warm_up, progress_callback=readiness.warmup_progress)
+        else:
+            # Process workers and the inference server warm up before taking work;
+            # wait until one answers (the server may still be starting)
+            readiness.set_stage("warming")
+            while True:
+                try:
+                    await inference_executor.run("warm_up")
+                    break
+                except (OSError, EOFError) as e:
+                    print(f"⏳ Waiting for inference workers: {e}")
+                    await asyncio.sleep(readiness.retry_after)
+        
+        readiness.mark_ready()
+        start_job_workers(asyncio.get_running_loop())
+    except Exception as e:
+        print(f"❌ Model loading failed: {e}")
+        readiness.mark_failed(str(e))
+
+async def run_job_inference(input_path: str, progress_callback) -> dict:
+    """Score a queued video on the executor, waiting out a full queue instead of failing the job"""
+    while True:
+        try:
+            return await inference_executor.run("detect_video", input_path, progress_callback=progress_callback)
+        except ExecutorBusyError as e:
+            await asyncio.sleep(e.retry_after)
+
+def start_job_workers(loop: asyncio.AbstractEventLoop):
+    """Start JOB_WORKERS job threads that submit through the inference executor, whatever its kind"""
+    worker_count = int(os.getenv("JOB_WORKERS", "1"))
+    if worker_count <= 0:
+        print("⚠️ JOB_WORKERS=0: /jobs/video jobs wait for `python jobs.py` workers on the same JOB_DB")
+        return
+    
+    def detect_video(input_path: str, progress_callback) -> dict:
+        return asyncio.run_coroutine_threadsafe(run_job_inference(input_path, progress_callback), loop).result()
+    
+    job_workers.extend(start_workers(detect_video, job_store, worker_count))
+    print(f"🚀 Started {worker_count} video job worker(s) on the {inference_executor.kind} executor")
+
+engine_task = None
+
+@app.on_event("startup")
+async def start_background_workers():
+    global engine_task
+    result_cache.after_fork()
+    engine_task = asyncio.ensure_future(prepare_engine())
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    # Workers block on the event loop, so do not wait for their current job here
+    for worker in job_workers:
+        worker.stop(wait=False)
+    inference_executor.shutdown(wait=False)
+    if inference_engine is not None:
+        inference_engine.video_shards.shutdown()
+    result_cache.close()
 
 @app.get("/")
 async def root():
@@ -53,57 +267,329 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving HTTP, whether or not the models are ready"""
     return {"status": "healthy", "service": "DeepSecure-AI"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the models are loaded and warmed up, 503 with progress until then"""
+    state = readiness.snapshot()
+    return JSONResponse(content=state, status_code=200 if state["ready"] else 503)
+
+@app.get("/stats")
+async def runtime_stats():
+    stats = {
+        "readiness": readiness.snapshot(),
+        "executor": inference_executor.get_stats(),
+        "result_cache": result_cache.get_stats(),
+        # JobStore is synchronous SQLite and may wait on a worker's write lock
+        "jobs": await asyncio.to_thread(job_store.count_by_status)
+    }
+    if inference_engine is not None:
+        stats.update(inference_engine.get_runtime_stats())
+    return stats
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of stage latencies, batch sizes and queue depths"""
+    if os.getenv("ENABLE_METRICS", "true").lower() != "true":
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/detect/image")
-async def detect_image(file: UploadFile = File(...)):
+async def detect_image(file: UploadFile = File(...), latency_budget_ms: Optional[float] = None,
+                       x_latency_budget_ms: Optional[float] = Header(None)):
     """
     Detect deepfakes in uploaded images
+    
+    A latency budget (`latency_budget_ms` query parameter or `X-Latency-Budget-Ms`
+    header) runs only the subset of ensemble models expected to fit in it.
     """
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    budget = latency_budget_ms if latency_budget_ms is not None else x_latency_budget_ms
+    if budget is not None and budget <= 0:
+        raise HTTPException(status_code=400, detail="Latency budget must be positive")
+    
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
-            tmp_path = tmp_file.name
+        # Read the upload into memory; it is decoded once with cv2.imdecode
+        data, digest = await read_upload(file)
+        filename = file.filename or "upload"
         
-        # Run inference
-        result = inference_engine.detect_image(tmp_path)
+        # Run inference on the executor unless this exact upload was scored already
+        result, cache_status = await cached_inference(
+            "image", digest, filename, "detect_image_bytes", data, filename, latency_budget_ms=budget
+        )
         
-        # Clean up
-        os.unlink(tmp_path)
-        
-        return JSONResponse(content=result)
+        return json_response(result, cache_status)
     
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
+@app.post("/detect/batch")
+async def detect_batch(files: List[UploadFile] = File(...)):
+    """
+    Detect deepfakes in many images (or zip/tar archives of images) at once
+    
+    Streams one NDJSON line per image as soon as its tensor batch is scored.
+    """
+    require_ready()
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    max_bytes = int(os.getenv("BATCH_MAX_MB", "0")) * 1024 * 1024 or max_upload_bytes()
+    chunk_size = max(1, int(os.getenv("BATCH_CHUNK_SIZE", "16")))
+    
+    def expand_and_hash(data: bytes, filename: str, remaining_bytes: int, remaining_items: int) -> list:
+        return [(name, member, hashlib.sha256(member).hexdigest())
+                for name, member in expand_archive(data, filename, remaining_bytes, remaining_items)]
+    
+    # Collect every image up front so malformed requests fail before streaming starts;
+    # the item and byte limits apply across all files as they are read and expanded
+    items = []
+    total_bytes = 0
+    try:
+        for file in files:
+            if len(items) >= max_items:
+                raise TooManyItemsError(max_items)
+            data, digest = await read_upload(file, max_bytes - total_bytes)
+            if is_archive(file.filename, file.content_type):
+                members = await asyncio.to_thread(expand_and_hash, data, file.filename,
+                                                  max_bytes - total_bytes, max_items - len(items))
+                items.extend(members)
+                total_bytes += sum(len(member) for _, member, _ in members)
+            elif file.content_type and file.content_type.startswith('image/'):
+                items.append((file.filename or "upload", data, digest))
+                total_bytes += len(data)
+            else:
+                raise HTTPException(status_code=400, detail=f"{file.filename}: file must be an image or an archive of images")
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the {max_bytes // (1024 * 1024)} MB limit")
+    except TooManyItemsError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read archive: {str(e)}")
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in request")
+    
+    async def score_chunk(chunk: list) -> list:
+        """Score one chunk as a tensor batch, waiting out a full executor instead of failing"""
+        while True:
+            try:
+                return await inference_executor.run(
+                    "detect_image_bytes_batch", [(data, filename) for _, filename, data, _ in chunk]
+                )
+            except ExecutorBusyError as e:
+                await asyncio.sleep(e.retry_after)
+    
+    async def stream_results():
+        # Answer repeated images from the result cache, batch the rest
+        pending = []
+        for index, (filename, data, digest) in enumerate(items):
+            key = await cache_key("image", digest)
+            cached = await result_cache.aget(key) if result_cache.enabled else None
+            if cached is not None:
+                cached["file_path"] = filename
+                yield json.dumps({"index": index, "filename": filename, "cache": "hit", **cached}) + "\n"
+            else:
+                pending.append((index, filename, data, key))
+        
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        concurrency = max(1, min(2, inference_executor.max_workers))
+        running = {}
+        
+        while chunks or running:
+            while chunks and len(running) < concurrency:
+                chunk = chunks.pop(0)
+                running[asyncio.ensure_future(score_chunk(chunk))] = chunk
+            
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                chunk = running.pop(task)
+                try:
+                    results = task.result()
+                except Exception as e:
+                    results = [{"error": f"Error processing image: {str(e)}"} for _ in chunk]
+                
+                for (index, filename, _, key), result in zip(chunk, results):
+                    if "error" not in result:
+                        # The memory tier keeps the stored dict, so it must not see file_path
+                        await result_cache.aput(key, dict(result))
+                    result["file_path"] = filename
+                    yield json.dumps({"index": index, "filename": filename, "cache": "miss", **result}) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def video_cache_kind(confidence: Optional[float]) -> str:
+    """Cache kind for a video result; adaptive sampling at a given confidence is cached apart"""
+    if confidence is None:
+        return "video"
+    if not 0.5 < confidence < 1.0:
+        raise HTTPException(status_code=400, detail="confidence must be between 0.5 and 1.0 (exclusive)")
+    return f"video@{confidence}"
+
 @app.post("/detect/video")
-async def detect_video(file: UploadFile = File(...)):
+async def detect_video(file: UploadFile = File(...), confidence: Optional[float] = None):
     """
     Detect deepfakes in uploaded videos
+    
+    With `confidence`, frames are sampled adaptively and scoring stops once the
+    verdict is settled at that confidence.
     """
     if not file.content_type.startswith('video/'):
         raise HTTPException(status_code=400, detail="File must be a video")
+    kind = video_cache_kind(confidence)
     
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
-            tmp_path = tmp_file.name
+        # Video containers need a seekable file for cv2.VideoCapture
+        tmp_path, digest = await save_upload(file, suffix='.mp4')
         
-        # Run inference
-        result = inference_engine.detect_video(tmp_path)
+        try:
+            # Run inference on the executor unless this exact upload was scored already
+            result, cache_status = await cached_inference(
+                kind, digest, file.filename or "upload", "detect_video", tmp_path, confidence=confidence
+            )
+        finally:
+            # Clean up
+            os.unlink(tmp_path)
         
-        # Clean up
+        return json_response(result, cache_status)
+    
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
+
+@app.post("/detect/video/stream")
+async def detect_video_stream(request: Request, file: UploadFile = File(...),
+                              stop_confidence: Optional[float] = None, min_frames: int = 3,
+                              confidence: Optional[float] = None):
+    """
+    Detect deepfakes in a video, streaming each frame's score as Server-Sent Events
+    
+    Emits a `frame` event per scored frame (with the running aggregate) and a final
+    `result` event. With `stop_confidence`, scoring stops once the running verdict
+    is at least that certain; disconnecting also stops scoring.
+    """
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    if stop_confidence is not None and not 0.5 <= stop_confidence <= 1.0:
+        raise HTTPException(status_code=400, detail="stop_confidence must be between 0.5 and 1.0")
+    kind = video_cache_kind(confidence)
+    require_ready()
+    
+    try:
+        tmp_path, digest = await save_upload(file, suffix='.mp4')
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    # Until the inference task owns the upload, any failure must remove it here
+    try:
+        filename = file.filename or "upload"
+        key = await cache_key(kind, digest)
+        cached = await result_cache.aget(key) if result_cache.enabled else None
+        
+        if cached is not None:
+            os.unlink(tmp_path)
+            cached["file_path"] = filename
+            return StreamingResponse(iter([format_sse("result", cached)]), media_type="text/event-stream")
+        
+        channel = FrameEventChannel.create(inference_executor.kind != "thread", stop_confidence, max(1, min_frames))
+        task = asyncio.ensure_future(run_inference("detect_video", tmp_path, frame_callback=channel,
+                                                     confidence=confidence))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    def cleanup(finished):
         os.unlink(tmp_path)
+        if not finished.cancelled():
+            # Mark the exception as retrieved if the client already left
+            finished.exception()
+    
+    task.add_done_callback(cleanup)
+    
+    # A full executor rejects the job straight away; report that as a plain 503
+    await asyncio.sleep(0)
+    if task.done() and task.exception() is not None:
+        raise task.exception()
+    
+    async def events():
+        try:
+            while not task.done():
+                for event in channel.drain():
+                    yield format_sse("frame", event)
+                if await request.is_disconnected():
+                    return
+                await asyncio.wait({task}, timeout=0.05)
+            
+            for event in channel.drain():
+                yield format_sse("frame", event)
+            
+            try:
+                result = task.result()
+            except Exception as e:
+                yield format_sse("error", {"error": f"Error processing video: {str(e)}"})
+                return
+            
+            result["file_path"] = filename
+            if "error" in result:
+                yield format_sse("error", result)
+                return
+            
+            if not result["frame_analysis"]["stopped_early"]:
+                await result_cache.aput(key, result)
+            yield format_sse("result", result)
+        finally:
+            # Stop scoring if the client went away before the last frame
+            channel.cancel()
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/jobs/video", status_code=202)
+async def submit_video_job(file: UploadFile = File(...)):
+    """
+    Queue a video for background analysis and return its job id immediately
+    """
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    
+    try:
+        input_path, _ = await save_upload(file, suffix='.mp4', directory=job_storage_dir())
+        job_id = await asyncio.to_thread(job_store.create_job, "video", input_path,
+                                         file.filename or "upload")
         
-        return JSONResponse(content=result)
+        response = {
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }
+        if not job_workers:
+            response["warning"] = ("No job worker runs in this API process (JOB_WORKERS=0 or models not ready); "
+                                   "the job waits for a `python jobs.py` worker")
+        return response
     
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing video: {str(e)}")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Get the status, progress and result of a background job
+    """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.post("/detect/audio")
 async def detect_audio(file: UploadFile = File(...)):
@@ -114,19 +600,21 @@ async def detect_audio(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be an audio file")
     
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            shutil.copyfileobj(file.file, tmp_file)
-            tmp_path = tmp_file.name
+        # Read the upload into memory; it is decoded in memory with soundfile
+        data, digest = await read_upload(file)
+        filename = file.filename or "upload"
         
-        # Run inference
-        result = inference_engine.detect_audio(tmp_path)
-        
-        # Clean up
-        os.unlink(tmp_path)
+        # Run inference on the executor unless this exact upload was scored already
+        result, cache_status = await cached_inference(
+            "audio", digest, filename, "detect_audio_bytes", data, filename
+        )
         
-        return JSONResponse(content=result)
+        return json_response(result, cache_status)
     
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
 
@@ -0,0 +1,296 @@
+"""
+Prometheus metrics and per-request stage timing
+Stage durations are collected per request (or per job) and exported both as
+histograms on /metrics and as a Server-Timing header on the response
+"""
+
+import contextvars
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative histogram with an arbitrary set of label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are produced at scrape time"""
+
+    def __init__(self, name: str, documentation: str, metric_type: str,
+                 collect: Callable[[], Iterable[Tuple[Dict[str, Any], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        try:
+            samples = list(self.collect())
+        except Exception:
+            samples = []
+        for labels, value in samples:
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, collect: Callable) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "gauge", collect))
+
+    def counter(self, name: str, documentation: str, collect: Callable) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "counter", collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "deepsecure_stage_seconds",
+    "Time spent in each request stage (upload, spool, queue_wait, decode, preprocess, forward_<model>, aggregate, serialize)",
+    ("stage",)
+))
+
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "deepsecure_batch_size",
+    "Number of images per stacked forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+))
+
+# Batch sizes observed in a worker process (process executor, inference server,
+# video shard) whose own registry is never scraped, waiting to be shipped back
+_pending_batch_sizes = None
+_pending_lock = threading.Lock()
+
+
+def forward_batch_sizes():
+    """Keep this process's batch size observations for drain_batch_sizes()"""
+    global _pending_batch_sizes
+    with _pending_lock:
+        if _pending_batch_sizes is None:
+            _pending_batch_sizes = []
+
+
+def observe_batch_size(size: int):
+    """Record the size of one stacked forward pass"""
+    BATCH_SIZE.observe(size)
+    if _pending_batch_sizes is not None:
+        with _pending_lock:
+            _pending_batch_sizes.append(size)
+
+
+def drain_batch_sizes() -> List[int]:
+    """Batch sizes observed since the last drain, to return to the parent with a result"""
+    global _pending_batch_sizes
+    if _pending_batch_sizes is None:
+        return []
+    with _pending_lock:
+        sizes, _pending_batch_sizes = _pending_batch_sizes, []
+    return sizes
+
+
+def add_batch_sizes(sizes: Iterable[int]):
+    """Merge batch sizes shipped back by a worker process"""
+    for size in sizes:
+        observe_batch_size(size)
+
+
+def process_rss_bytes() -> Optional[float]:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return float(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return float(usage if os.uname().sysname == "Darwin" else usage * 1024)
+
+
+REGISTRY.gauge(
+    "deepsecure_process_resident_memory_bytes",
+    "Resident memory of the API process",
+    lambda: [({}, process_rss_bytes())]
+)
+
+
+# ---- Per-request stage timings
+
+_timings = contextvars.ContextVar("deepsecure_stage_timings", default=None)
+
+
+@contextmanager
+def collect_timings():
+    """Collect every stage timing recorded in this context into a list"""
+    timings = []
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings() -> Optional[list]:
+    """The active timing list, or None outside collect_timings()"""
+    return _timings.get()
+
+
+def record_stage(name: str, seconds: float):
+    """Record one stage duration; observed directly when no collector is active"""
+    timings = _timings.get()
+    if timings is None:
+        STAGE_SECONDS.observe(seconds, stage=name)
+    else:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def timed_stage(name: str):
+    """Time the enclosed block as stage `name`"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started_at)
+
+
+def add_timings(timings: Iterable[Tuple[str, float]]):
+    """Merge timings collected elsewhere (another thread or process) into this context"""
+    for name, seconds in timings:
+        record_stage(name, seconds)
+
+
+def observe_timings(timings: Iterable[Tuple[str, float]]):
+    """Feed collected timings into the stage histogram"""
+    for name, seconds in timings:
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def server_timing_header(timings: Iterable[Tuple[str, float]], total: float = None) -> str:
+    """Format timings as a Server-Timing header, summing repeated stages"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    entries = [f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in totals.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000.0:.2f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects stage timings for each HTTP request
+
+    Adds a Server-Timing header to the response and feeds the timings into the
+    stage histogram once the response has been sent. Time spent waiting for the
+    request body is recorded as the `upload` stage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        with collect_timings() as timings:
+            upload = [0.0, 0]
+
+            async def receive_with_timing():
+                waiting_since = time.perf_counter()
+                message = await receive()
+                if message["type"] == "http.request":
+                    upload[0] += time.perf_counter() - waiting_since
+                    upload[1] += len(message.get("body", b""))
+                    if not message.get("more_body", False) and upload[1]:
+                        timings.append(("upload", upload[0]))
+                return message
+
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    header = server_timing_header(timings, time.perf_counter() - started_at)
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive_with_timing, send_with_timing)
+            finally:
+                observe_timings(timings)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Post-training INT8 quantization
+Quantizes the EfficientNet convolution trunks statically, calibrated on local
+images, and the Linear heads dynamically. Writes TorchScript checkpoints that
+DeepfakeModelLoader loads with MODEL_PRECISION=int8, and reports latency,
+checkpoint size and fake-probability drift against fp32 on held-out images.
+
+Usage: python quantization.py [--holdout held_out/] [--engine onednn] [calibration paths ...]
+Paths may be images, videos (frames are sampled) or directories of either.
+Without --holdout, every fifth calibration image is held out instead.
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import time
+import zipfile
+from typing import Dict, Any, List
+
+import torch
+import torch.nn as nn
+import torch.ao.nn.intrinsic as nni
+from torch.ao.quantization import QConfigMapping, default_dynamic_qconfig, get_default_qconfig, quantize_dynamic
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIR = os.path.join(BACKEND_DIR, 'DeepSecure-AI', 'checkpoints')
+
+# Classifier heads, quantized dynamically rather than with calibrated activations
+HEAD_MODULES = {
+    'faceforensics': 'backbone._fc',
+    'dfdc': 'classifier',
+    'celebdf': 'backbone._fc'
+}
+
+# Stored in the checkpoint, since packed INT8 weights only run on the engine that packed them
+METADATA_FILE = "quantization.json"
+
+
+def default_engine() -> str:
+    """oneDNN where available (VNNI kernels, fast strided depthwise convs), else the platform default"""
+    engines = torch.backends.quantized.supported_engines
+    return 'onednn' if 'onednn' in engines else torch.backends.quantized.engine
+
+
+def quantized_checkpoint_path(model_path: str) -> str:
+    """INT8 checkpoint next to an fp32 one: faceforensics_model.pth -> faceforensics_model.int8.pt"""
+    return os.path.splitext(model_path)[0] + '.int8.pt'
+
+
+def load_quantized(path: str, device: str = 'cpu') -> torch.jit.ScriptModule:
+    """Load an INT8 checkpoint written by save_quantized, switching to the engine it was packed for"""
+    # The weights are repacked for the current engine while loading, so switch first
+    with zipfile.ZipFile(path) as archive:
+        names = [name for name in archive.namelist() if name.endswith(f"extra/{METADATA_FILE}")]
+        metadata = json.loads(archive.read(names[0])) if names else {}
+    engine = metadata.get("engine")
+    if engine and torch.backends.quantized.engine != engine:
+        torch.backends.quantized.engine = engine
+    model = torch.jit.load(path, map_location=device)
+    model.eval()
+    return model
+
+
+def run_fixed_batch(model, input_batch: torch.Tensor, batch_size: int) -> torch.Tensor:
+    """
+    Forward an INT8 model in chunks of exactly `batch_size`, zero-padding the last
+
+    oneDNN caches its INT8 conv kernels for the first input shape a model sees and
+    rebuilds them on every call with any other shape (4x slower at batch 1 here),
+    so a quantized model keeps to the one shape it was pinned to at load time.
+    """
+    outputs = []
+    for start in range(0, len(input_batch), batch_size):
+        chunk = input_batch[start:start + batch_size]
+        count = len(chunk)
+        if count < batch_size:
+            chunk = torch.cat([chunk, chunk.new_zeros((batch_size - count,) + tuple(chunk.shape[1:]))])
+        outputs.append(model(chunk)[:count])
+    return torch.cat(outputs)
+
+
+def pin_batch_size(model, batch_size: int):
+    """Run the first forward at `batch_size`, the shape run_fixed_batch will use"""
+    with torch.no_grad():
+        model(torch.zeros((batch_size, 3, 224, 224)))
+
+
+def save_quantized(model: torch.jit.ScriptModule, path: str, engine: str, calibration_images: int):
+    metadata = {"engine": engine, "calibration_images": calibration_images}
+    torch.jit.save(model, path, _extra_files={METADATA_FILE: json.dumps(metadata)})
+
+
+def plain_convs(module: nn.Module):
+    """
+    Swap efficientnet_pytorch's same-padding conv subclasses for stock layers
+
+    FX tracing would otherwise inline them as functional convs, which keeps the
+    batch norms from being folded and lands on slow quantized kernels.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, nn.Conv2d) and type(child) is not nn.Conv2d:
+            conv = nn.Conv2d(child.in_channels, child.out_channels, child.kernel_size, child.stride,
+                             0, child.dilation, child.groups, child.bias is not None)
+            conv.weight = child.weight
+            conv.bias = child.bias
+            padding = getattr(child, 'static_padding', None)
+            if isinstance(padding, nn.ZeroPad2d):
+                left, right, top, bottom = padding.padding
+                if left == right == top == bottom:
+                    conv.padding = (top, left)
+                else:
+                    conv = nn.Sequential(padding, conv)
+            setattr(module, name, conv)
+        else:
+            plain_convs(child)
+
+
+def quantize_model(model: nn.Module, model_name: str, calibration_batches: List[torch.Tensor],
+                   engine: str = None) -> torch.jit.ScriptModule:
+    """
+    INT8 copy of one ensemble member, traced to TorchScript
+
+    Args:
+        model: fp32 FaceForensicsModel, DFDCModel or CelebDFModel (left untouched)
+        model_name: Ensemble name, to find its classifier head
+        calibration_batches: Preprocessed [N, 3, 224, 224] batches for the activation observers
+        engine: Quantized engine to pack the weights for (default_engine() when None)
+    """
+    engine = engine or default_engine()
+    # The engine is process-wide; switch only while packing so FP32 callers and
+    # other INT8 models in this process keep theirs (load_quantized switches for serving)
+    previous_engine = torch.backends.quantized.engine
+    torch.backends.quantized.engine = engine
+    try:
+        return _quantize_with_current_engine(model, model_name, calibration_batches, engine)
+    finally:
+        torch.backends.quantized.engine = previous_engine
+
+
+def _quantize_with_current_engine(model: nn.Module, model_name: str,
+                                  calibration_batches: List[torch.Tensor], engine: str) -> torch.jit.ScriptModule:
+    model = copy.deepcopy(model).cpu()
+    # The memory-efficient Swish is a custom autograd function FX cannot trace
+    model.backbone.set_swish(memory_efficient=False)
+    plain_convs(model)
+    model.eval()
+
+    mapping = QConfigMapping().set_global(get_default_qconfig(engine)).set_module_name(HEAD_MODULES[model_name], None)
+    example = calibration_batches[0][:1]
+    prepared = prepare_fx(model, mapping, example_inputs=(example,))
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+    quantized = convert_fx(prepared)
+    quantized = quantize_dynamic(quantized, {nn.Linear: default_dynamic_qconfig,
+                                             nni.LinearReLU: default_dynamic_qconfig}, dtype=torch.qint8)
+
+    with torch.no_grad():
+        return torch.jit.trace(quantized, example)
+
+
+def _latency_ms(model, batch: torch.Tensor, repeats: int) -> float:
+    """Median milliseconds per image over `repeats` forwards, after two warm-up forwards"""
+    timings = []
+    with torch.no_grad():
+        for attempt in range(repeats + 2):
+            started = time.perf_counter()
+            model(batch)
+            if attempt >= 2:
+                timings.append((time.perf_counter() - started) * 1000.0 / len(batch))
+    return statistics.median(timings)
+
+
+def compare(loader, model_name: str, fp32, int8, holdout: List[torch.Tensor], int8_batch_size: int,
+            repeats: int = 5) -> Dict[str, Any]:
+    """Latency and fake-probability drift of an INT8 model against its fp32 original"""
+    def int8_forward(batch):
+        return run_fixed_batch(int8, batch, int8_batch_size)
+
+    drifts = []
+    agree = 0
+    with torch.no_grad():
+        for batch in holdout:
+            fp32_output = fp32(batch)
+            int8_output = int8_forward(batch)
+            for row in range(len(batch)):
+                expected = loader._format_prediction(model_name, fp32_output[row])
+                actual = loader._format_prediction(model_name, int8_output[row])
+                drifts.append(abs(actual["fake_probability"] - expected["fake_probability"]))
+                agree += actual["is_fake"] == expected["is_fake"]
+
+    single = holdout[0][:1]
+    stacked = torch.cat(holdout)[:8]
+    drifts.sort()
+    return {
+        "holdout_images": len(drifts),
+        "fake_probability_drift": {
+            "mean": statistics.fmean(drifts),
+            "p95": drifts[min(len(drifts) - 1, int(0.95 * len(drifts)))],
+            "max": drifts[-1]
+        },
+        "verdict_agreement": agree / len(drifts),
+        "latency_ms_per_image": {
+            "fp32_batch_1": _latency_ms(fp32, single, repeats),
+            "int8_batch_1": _latency_ms(int8_forward, single, repeats),
+            f"fp32_batch_{len(stacked)}": _latency_ms(fp32, stacked, repeats),
+            f"int8_batch_{len(stacked)}": _latency_ms(int8_forward, stacked, repeats)
+        }
+    }
+
+
+def _batches(loader, images: list, batch_size: int) -> List[torch.Tensor]:
+    arrays = [image for _, image in images]
+    return [loader.load_input_batch(arrays[start:start + batch_size])
+            for start in range(0, len(arrays), batch_size)]
+
+
+def main():
+    from benchmark_cascade import DEFAULT_PATHS, load_images
+    from deepfake_models import DeepfakeModelLoader
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--holdout", nargs="*", default=None)
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--models", default="faceforensics,dfdc,celebdf")
+    parser.add_argument("--engine", default=default_engine())
+    parser.add_argument("--frames-per-video", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--int8-batch-size", type=int, default=int(os.getenv("INT8_BATCH_SIZE", "1")))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+
+    images = load_images(args.paths, args.frames_per_video)
+    if args.holdout:
+        calibration, holdout = images, load_images(args.holdout, args.frames_per_video)
+    else:
+        calibration = [image for index, image in enumerate(images) if index % 5 != 4]
+        holdout = [image for index, image in enumerate(images) if index % 5 == 4]
+    if not calibration or not holdout:
+        print("❌ Need at least one calibration and one held-out image")
+        return
+    print(f"🔄 Calibrating on {len(calibration)} images, comparing on {len(holdout)} held out ({args.engine})")
+
+    loader = DeepfakeModelLoader(precision='fp32', backend='eager')
+    calibration_batches = _batches(loader, calibration, args.batch_size)
+    holdout_batches = _batches(loader, holdout, args.batch_size)
+
+    report = {"engine": args.engine, "calibration_images": len(calibration), "models": {}}
+    for model_name in [name.strip() for name in args.models.split(",") if name.strip()]:
+        model_path = os.path.join(args.checkpoint_dir, f"{model_name}_model.pth")
+        if not loader.load_model(model_name, model_path):
+            continue
+        fp32 = loader.models[model_name].module
+
+        started = time.perf_counter()
+        int8 = quantize_model(fp32, model_name, calibration_batches, args.engine)
+        quantized_path = quantized_checkpoint_path(model_path)
+        save_quantized(int8, quantized_path, args.engine, len(calibration))
+        int8 = load_quantized(quantized_path)
+        pin_batch_size(int8, args.int8_batch_size)
+        print(f"✅ {model_name} quantized in {time.perf_counter() - started:.1f}s -> {quantized_path}")
+
+        result = compare(loader, model_name, fp32, int8, holdout_batches, args.int8_batch_size, args.repeats)
+        # Size on disk; resident memory also holds activations and unpacked buffers
+        result["checkpoint_file_mb"] = {
+            "fp32": os.path.getsize(model_path) / 1e6 if os.path.exists(model_path) else None,
+            "int8": os.path.getsize(quantized_path) / 1e6
+        }
+        report["models"][model_name] = result
+
+    print()
+    print(f"{'model':<15}{'fp32 ms':>9}{'int8 ms':>9}{'speed-up':>10}{'fp32 file MB':>14}{'int8 file MB':>14}"
+          f"{'mean drift':>12}{'max drift':>11}{'agree':>8}")
+    for model_name, result in report["models"].items():
+        latency = result["latency_ms_per_image"]
+        fp32_ms, int8_ms = latency["fp32_batch_1"], latency["int8_batch_1"]
+        size = result["checkpoint_file_mb"]
+        drift = result["fake_probability_drift"]
+        print(f"{model_name:<15}{fp32_ms:>9.1f}{int8_ms:>9.1f}{fp32_ms / int8_ms:>9.1f}x"
+              f"{size['fp32'] or 0:>14.1f}{size['int8']:>14.1f}{drift['mean']:>12.4f}{drift['max']:>11.4f}"
+              f"{result['verdict_agreement']:>7.0%}")
+
+    report_path = args.report or os.path.join(args.checkpoint_dir, "quantization_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {report_path}")
+    print("💡 Serve the INT8 checkpoints with MODEL_PRECISION=int8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Model readiness tracking
+Reports background model loading and warm-up progress for the /ready probe
+"""
+
+import threading
+import time
+from typing import Dict, Any
+
+
+class Readiness:
+    """
+    Startup state of the inference engine: starting → loading → warming → ready
+
+    A failure at any point moves the state to failed with the error message.
+    Only the ready state should receive traffic.
+    """
+
+    def __init__(self, retry_after: int = 5):
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.stage = "starting"
+        self.stage_started_at = self.started_at
+        self.stage_seconds = {}
+        self.warmup_done = 0
+        self.warmup_planned = 0
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self.stage == "ready"
+
+    def set_stage(self, stage: str):
+        now = time.time()
+        with self._lock:
+            self.stage_seconds[self.stage] = now - self.stage_started_at
+            self.stage = stage
+            self.stage_started_at = now
+        print(f"🔄 Model readiness: {stage}")
+
+    def warmup_progress(self, done: int, planned: int):
+        """progress_callback for DeepSecureInference.warm_up"""
+        with self._lock:
+            self.warmup_done = done
+            self.warmup_planned = planned
+
+    def mark_ready(self):
+        self.set_stage("ready")
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.error = error
+        self.set_stage("failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = {
+                "ready": self.stage == "ready",
+                "stage": self.stage,
+                "uptime_seconds": time.time() - self.started_at,
+                "stage_seconds": dict(self.stage_seconds),
+                "warmup": {
+                    "batch_sizes_done": self.warmup_done,
+                    "batch_sizes_planned": self.warmup_planned
+                }
+            }
+            if self.error is not None:
+                state["error"] = self.error
+        return state
@@ -0,0 +1,238 @@
+"""
+Content-addressed result cache
+Stores detection results under the SHA-256 of the uploaded bytes, with an optional SQLite tier
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+
+class ResultCache:
+    """
+    In-process LRU with TTL, backed by an optional on-disk SQLite table
+
+    Keys are expected to include the upload digest, the media kind and the model
+    version, so a weights change naturally misses old entries. Concurrent lookups
+    for the same key share a single in-flight computation.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0, db_path: Optional[str] = None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.db_path = db_path
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache from RESULT_CACHE_SIZE / RESULT_CACHE_TTL_SECONDS / RESULT_CACHE_DB"""
+        return cls(
+            max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600")),
+            db_path=os.getenv("RESULT_CACHE_DB") or None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def _open_db(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_pid = os.getpid()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+        self._db.commit()
+
+    def after_fork(self):
+        """Reopen the SQLite tier in a forked worker; connections must not cross fork"""
+        if self._db is not None and self._db_pid != os.getpid():
+            # The inherited handle still belongs to the parent, so drop it unclosed
+            self._db = None
+            self._open_db(self.db_path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result, or None"""
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                return value
+            return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() for the event loop; a memory miss reads the SQLite tier on a thread"""
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None or self._db is None:
+                if value is None:
+                    self.misses += 1
+                return value
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_disk_locked, key, now)
+
+    def _get_memory(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return dict(value)
+            del self._entries[key]
+            self.expirations += 1
+        return None
+
+    def _get_disk_locked(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get_disk(key, now)
+
+    def _get_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        """SQLite tier lookup after a memory miss; counts the miss when both tiers miss"""
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                if row[1] >= now:
+                    value = json.loads(row[0])
+                    self._store_memory(key, value, row[1])
+                    self.disk_hits += 1
+                    return dict(value)
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                self.expirations += 1
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a result in memory and, if configured, on disk"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                self._db.commit()
+
+    async def aput(self, key: str, value: Dict[str, Any]):
+        """put() for the event loop; the SQLite write runs on a thread"""
+        if self._db is None:
+            self.put(key, value)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.put, key, value)
+
+    def _store_memory(self, key: str, value: Dict[str, Any], expires_at: float):
+        if self.max_entries == 0:
+            return
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str,
+                             compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """
+        Return (result, status) where status is "hit", "coalesced" or "miss"
+
+        Results containing an "error" key are returned but never cached. When
+        the request computing a result is cancelled (client disconnect), the
+        requests waiting on it do not fail with it: the next one recomputes.
+        """
+        if not self.enabled:
+            return await compute(), "miss"
+
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached, "hit"
+
+        while key in self._inflight:
+            inflight = self._inflight[key]
+            self.coalesced += 1
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled: take over unless this request was too
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                self.coalesced -= 1
+                continue
+            return dict(result), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(result)
+        if "error" not in result:
+            await self.aput(key, result)
+        return dict(result), "miss"
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            stats = {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "disk_tier": self.db_path
+            }
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return stats
@@ -55,11 +55,13 @@ def main():
     
     # Import and run the FastAPI app
     try:
-        # Import from the current directory (backend), not DeepSecure-AI
-        from main import app
-        
-        # Setup environment after importing the app
-        setup_environment()
+        # Read production.env here as well: with gunicorn the app (and its
+        # models) must only be imported by gunicorn, not by this launcher
+        try:
+            from dotenv import load_dotenv
+            load_dotenv("production.env", override=True)
+        except ImportError:
+            pass
         
         print("✅ Dependencies checked successfully")
         print("🚀 Starting FastAPI server...")
@@ -81,6 +83,7 @@ def main():
                 cmd = [
                     "gunicorn", 
                     "main:app",
+                    "-c", str(Path(__file__).parent / "gunicorn_conf.py"),
                     "-w", str(workers),
                     "-k", "uvicorn.workers.UvicornWorker",
                     "--bind", f"{host}:{port}",
@@ -89,9 +92,13 @@ def main():
                     "--error-logfile", "-"
                 ]
                 print(f"🚀 Starting with Gunicorn: {workers} workers")
+                if os.getenv("PRELOAD_MODELS", "true").lower() == "true":
+                    print("📦 Models are loaded once in the master and shared with the workers")
                 subprocess.run(cmd)
             except ImportError:
                 print("⚠️ Gunicorn not available, falling back to single worker")
+                from main import app
+                setup_environment()
                 uvicorn.run(
                     app,
                     host=host,
@@ -101,6 +108,10 @@ def main():
                 )
         else:
             # Single worker with uvicorn
+            # Import from the current directory (backend), not DeepSecure-AI,
+            # then set up the environment
+            from main import app
+            setup_environment()
             uvicorn.run(
                 app,
                 host=host,
@@ -0,0 +1,77 @@
+"""
+Server-Sent Events helpers
+Carry per-frame video scores from an inference worker back to a streaming response
+"""
+
+import json
+import multiprocessing
+import queue
+import threading
+from typing import Dict, Any, Optional
+
+# Shared manager for process executors; queues it creates can be pickled to worker processes
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def _get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager
+
+
+class FrameEventChannel:
+    """
+    Callable passed to DeepSecureInference.detect_video as its frame_callback
+
+    Each scored frame is pushed onto `events`. The return value asks the engine to
+    stop early, either because the consumer went away or because the running
+    verdict reached `stop_confidence` after at least `min_frames` frames.
+    """
+
+    def __init__(self, events, stop_event, stop_confidence: Optional[float] = None, min_frames: int = 3):
+        self.events = events
+        self.stop_event = stop_event
+        self.stop_confidence = stop_confidence
+        self.min_frames = min_frames
+
+    @classmethod
+    def create(cls, cross_process: bool, stop_confidence: Optional[float] = None,
+               min_frames: int = 3) -> "FrameEventChannel":
+        """Build a channel backed by local or manager-proxied queue and event"""
+        if cross_process:
+            manager = _get_manager()
+            return cls(manager.Queue(), manager.Event(), stop_confidence, min_frames)
+        return cls(queue.Queue(), threading.Event(), stop_confidence, min_frames)
+
+    def __call__(self, event: Dict[str, Any]) -> bool:
+        self.events.put(event)
+        if self.stop_event.is_set():
+            return True
+
+        running = event["running"]
+        if (self.stop_confidence is not None
+                and running["frames_scored"] >= self.min_frames
+                and max(running["fake_probability"], 1 - running["fake_probability"]) >= self.stop_confidence):
+            return True
+        return False
+
+    def cancel(self):
+        """Ask the engine to stop at the next frame"""
+        self.stop_event.set()
+
+    def drain(self) -> list:
+        """Return every event queued so far without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,105 @@
+"""
+Parity of the execution backends with eager PyTorch
+Builds a small, randomly initialized EfficientNet with the ensemble members'
+layout (a `backbone` whose `_fc` is the classifier head), exports it and checks
+every backend's logits against the eager module.
+Run with: python -m pytest test_execution_backends.py
+"""
+
+import pytest
+import torch
+import torch.nn as nn
+from efficientnet_pytorch import EfficientNet
+
+from execution_backends import (
+    ONNXRUNTIME_AVAILABLE, EagerBackend, OptimizedBackend, QuantizedBackend,
+    export_onnx, export_torchscript, load_backend
+)
+from quantization import quantize_model, save_quantized, default_engine
+
+# fp32 backends only reorder float operations
+FP32_TOLERANCE = 1e-4
+# INT8 activations and weights shift the logits; checked on the fake probability instead
+INT8_PROBABILITY_TOLERANCE = 0.05
+INT8_BATCH_SIZE = 4
+
+
+class TinyModel(nn.Module):
+    """FaceForensicsModel's layout at a fraction of the width and depth"""
+
+    def __init__(self):
+        super().__init__()
+        self.backbone = EfficientNet.from_name('efficientnet-b0', width_coefficient=0.25,
+                                               depth_coefficient=0.25, num_classes=2)
+
+    def forward(self, x):
+        return self.backbone(x)
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    model = TinyModel()
+    # With the default initialization the activations vanish within a few blocks
+    # and every input gets the same logits. Random affine batch norms, with
+    # statistics gathered on random batches, keep them near unit scale.
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.momentum = None
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.2, 0.2)
+    model.train()
+    with torch.no_grad():
+        for _ in range(4):
+            model(torch.randn((8, 3, 224, 224)))
+    return model.eval()
+
+
+@pytest.fixture(scope="module")
+def batch():
+    torch.manual_seed(1)
+    return torch.randn((3, 3, 224, 224))
+
+
+@pytest.fixture(scope="module")
+def expected(model, batch):
+    with torch.no_grad():
+        logits = EagerBackend(model)(batch)
+    # A model that ignored its input would make every comparison pass
+    assert (logits - logits[0]).abs().max().item() > 100 * FP32_TOLERANCE
+    return logits
+
+
+def test_optimized_matches_eager(model, batch, expected):
+    backend = OptimizedBackend(model)
+    assert (backend(batch) - expected).abs().max().item() <= FP32_TOLERANCE
+
+
+def test_torchscript_matches_eager(model, batch, expected, tmp_path):
+    backend = load_backend('torchscript', export_torchscript(model, str(tmp_path / "tiny.ts.pt")))
+    with torch.no_grad():
+        # The export traces at batch 2; other batch sizes must work too
+        assert (backend(batch) - expected).abs().max().item() <= FP32_TOLERANCE
+        assert (backend(batch[:1]) - expected[:1]).abs().max().item() <= FP32_TOLERANCE
+
+
+@pytest.mark.skipif(not ONNXRUNTIME_AVAILABLE, reason="onnxruntime not installed")
+def test_onnxruntime_matches_eager(model, batch, expected, tmp_path):
+    backend = load_backend('onnxruntime', export_onnx(model, str(tmp_path / "tiny.onnx")))
+    assert (backend(batch) - expected).abs().max().item() <= FP32_TOLERANCE
+    assert (backend(batch[:1]) - expected[:1]).abs().max().item() <= FP32_TOLERANCE
+
+
+def test_quantized_matches_eager(model, batch, expected, tmp_path):
+    torch.manual_seed(2)
+    calibration = [torch.randn((INT8_BATCH_SIZE, 3, 224, 224)) for _ in range(4)]
+    engine = default_engine()
+    path = str(tmp_path / "tiny.int8.pt")
+    save_quantized(quantize_model(model, 'faceforensics', calibration, engine), path, engine, 16)
+
+    backend = QuantizedBackend(path, INT8_BATCH_SIZE)
+    with torch.no_grad():
+        actual = backend(batch)
+    assert actual.shape == expected.shape
+    drift = (actual.softmax(dim=1)[:, 1] - expected.softmax(dim=1)[:, 1]).abs().max().item()
+    assert drift <= INT8_PROBABILITY_TOLERANCE
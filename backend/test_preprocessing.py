@@ -0,0 +1,57 @@
+"""
+Parity of BatchPreprocessor with the PIL Resize / ToTensor / Normalize chain
+Run with: python -m pytest test_preprocessing.py
+"""
+
+import numpy as np
+import pytest
+import torch
+
+from benchmark_preprocessing import TOLERANCE, pil_batch, synthetic_frame
+from preprocessing import BatchPreprocessor
+
+# Odd and non-square sizes, upscales, and the model input size itself (copied as is)
+SIZES = [(224, 224), (333, 517), (225, 223), (97, 61), (1281, 719)]
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return BatchPreprocessor()
+
+
+@pytest.mark.parametrize("width,height", SIZES)
+def test_uint8_rgb_matches_pil(preprocessor, width, height):
+    image = synthetic_frame(width, height, seed=width)
+    difference = (preprocessor.prepare([image]) - pil_batch([image])).abs().max().item()
+    assert difference <= TOLERANCE
+
+
+@pytest.mark.parametrize("width,height", SIZES)
+def test_bgr_matches_pil(preprocessor, width, height):
+    image = synthetic_frame(width, height, seed=height)
+    bgr = np.ascontiguousarray(image[..., ::-1])
+    difference = (preprocessor.prepare([bgr], 'bgr') - pil_batch([image])).abs().max().item()
+    assert difference <= TOLERANCE
+
+
+def test_mixed_batch_matches_pil(preprocessor):
+    images = [synthetic_frame(width, height, seed) for seed, (width, height) in enumerate(SIZES)]
+    batch = preprocessor.prepare(images, reuse=True)
+    assert batch.shape == (len(images), 3, 224, 224)
+    assert (batch - pil_batch(images)).abs().max().item() <= TOLERANCE
+
+
+def test_grayscale_and_chw_tensor_match_pil(preprocessor):
+    image = synthetic_frame(333, 517, seed=7)
+    expected = pil_batch([image])
+    chw = torch.from_numpy(image).permute(2, 0, 1)
+    assert (preprocessor.prepare([chw]) - expected).abs().max().item() <= TOLERANCE
+
+    gray = image[..., 0]
+    gray_expected = pil_batch([np.repeat(gray[..., None], 3, axis=2)])
+    assert (preprocessor.prepare([gray]) - gray_expected).abs().max().item() <= TOLERANCE
+
+
+def test_rejects_non_uint8(preprocessor):
+    with pytest.raises(ValueError):
+        preprocessor.resize(np.zeros((32, 32, 3), dtype=np.float32))
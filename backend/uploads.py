@@ -0,0 +1,146 @@
+"""
+Upload helpers
+Read multipart uploads in chunks straight into memory, touching disk only when a path is required
+"""
+
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+from typing import Tuple, List
+
+from fastapi import UploadFile
+
+from metrics import timed_stage
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_FILE_SIZE_MB"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+class TooManyItemsError(Exception):
+    """Raised when a batch upload holds more images than BATCH_MAX_ITEMS"""
+
+    def __init__(self, max_items: int):
+        super().__init__(f"Batch exceeds {max_items} images")
+        self.max_items = max_items
+
+
+def max_upload_bytes() -> int:
+    """Upload size limit taken from MAX_FILE_SIZE_MB"""
+    return int(os.getenv("MAX_FILE_SIZE_MB", "100")) * 1024 * 1024
+
+
+async def read_upload(file: UploadFile, max_bytes: int = None) -> Tuple[bytes, str]:
+    """Read an upload into memory chunk by chunk, returning (data, sha256 hex digest)"""
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    # Starlette has already received and spooled the body (timed as `upload` by
+    # ServerTimingMiddleware), so this times the local copy
+    with timed_stage("spool"):
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            digest.update(chunk)
+            chunks.append(chunk)
+
+    return b"".join(chunks), digest.hexdigest()
+
+
+async def save_upload(file: UploadFile, suffix: str, max_bytes: int = None,
+                      directory: str = None) -> Tuple[str, str]:
+    """
+    Stream an upload into a named temporary file, returning (path, sha256 hex digest)
+
+    Only used for containers that must be opened by path (e.g. video for cv2.VideoCapture).
+    The caller is responsible for removing the file. `directory` defaults to the system temp dir.
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+
+    digest = hashlib.sha256()
+    size = 0
+    with timed_stage("spool"), tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory) as tmp_file:
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                digest.update(chunk)
+                tmp_file.write(chunk)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+
+    return tmp_file.name, digest.hexdigest()
+
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+
+def is_archive(filename: str, content_type: str = None) -> bool:
+    """True for zip/tar uploads that should be expanded into their members"""
+    if content_type in ("application/zip", "application/x-zip-compressed", "application/x-tar",
+                        "application/gzip", "application/x-gzip"):
+        return True
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def expand_archive(data: bytes, filename: str, max_bytes: int = None,
+                   max_items: int = None) -> List[Tuple[str, bytes]]:
+    """
+    Return (member name, bytes) for every image inside a zip or tar archive
+
+    The combined size of the extracted members is bounded by `max_bytes` and
+    their number by `max_items`; both are checked before a member is extracted.
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+
+    members = []
+    total = 0
+
+    def add(name: str, size: int, read):
+        nonlocal total
+        if not name.lower().endswith(IMAGE_SUFFIXES):
+            return
+        total += size
+        if total > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        if max_items is not None and len(members) >= max_items:
+            raise TooManyItemsError(max_items)
+        members.append((name, read()))
+
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    add(info.filename, info.file_size, lambda: archive.read(info))
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+            for info in archive.getmembers():
+                if info.isfile():
+                    add(info.name, info.size, lambda: archive.extractfile(info).read())
+
+    return members
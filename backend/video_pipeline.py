@@ -0,0 +1,234 @@
+"""
+Video scoring pipeline
+Overlaps frame decoding, preprocessing and model inference with bounded queues
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from typing import Dict, Any, Iterator, Tuple
+
+from face_crops import combine_faces
+
+_END = object()
+
+
+class _Stopped(Exception):
+    """Raised inside the decoder once the consumer has gone away"""
+
+
+class _StageClock:
+    """Busy time of one pipeline stage, plus time starved of input and blocked on output"""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+    def report(self, wall: float) -> Dict[str, float]:
+        return {
+            "busy_seconds": self.busy,
+            "starved_seconds": self.starved,
+            "blocked_seconds": self.blocked,
+            "occupancy": (self.busy / wall) if wall > 0 else 0.0
+        }
+
+
+class VideoPipeline:
+    """
+    Scores one video as decode → preprocess → inference
+
+    A decoder thread reads the requested frames into a queue of `batch_size`
+    frames; a preprocessing thread turns them into normalized, stacked batches;
+    the thread iterating over results() runs the ensemble on each batch. Both
+    queues are bounded, so a slow stage holds back the ones before it instead of
+    buffering the whole video. A partial batch is handed over early whenever
+    inference is waiting, so compute never idles for a batch to fill. results()
+    may be called again for more frames of the same video; get_stats() reports how
+    busy each stage was over all runs and which one bounded them.
+
+    With a FaceCropper, preprocessing batches the face crops of each frame
+    instead of the frame itself (a batch may run over `batch_size` by the faces
+    of its last frame), and frames without a face skip inference.
+    """
+
+    # Seconds between checks for a stopped consumer while waiting on a queue
+    POLL_SECONDS = 0.05
+
+    def __init__(self, model_loader, sampler, batch_size: int = 16, queue_depth: int = 2, face_cropper=None):
+        self.model_loader = model_loader
+        self.sampler = sampler
+        self.batch_size = max(1, int(batch_size))
+        self.face_cropper = face_cropper
+
+        self.queue_depth = max(1, int(queue_depth))
+
+        self.clocks = {"decode": _StageClock(), "preprocess": _StageClock(), "inference": _StageClock()}
+        self.batch_sizes = []
+        self.decoder_runs = []
+        self.wall = 0.0
+
+    def results(self, video_path: str, frame_numbers: list, seek: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yield (frame_number, ensemble_result) for the requested frames, in video order
+
+        Frames past the end of the stream are skipped. Closing the generator early
+        (break out of the loop, or close()) stops decoding and preprocessing.
+        """
+        started = time.perf_counter()
+        self._frames = queue.Queue(maxsize=self.batch_size)
+        self._batches = queue.Queue(maxsize=self.queue_depth)
+        self._stop = threading.Event()
+        self._inference_waiting = threading.Event()
+        threads = []
+        # Copy the request context into each thread so stage timings land on this request
+        for target, args in ((self._decode, (video_path, frame_numbers, seek)), (self._preprocess, ())):
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(target, *args),
+                                      name=f"video-{target.__name__.strip('_')}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        clock = self.clocks["inference"]
+        try:
+            while True:
+                waited = time.perf_counter()
+                self._inference_waiting.set()
+                item = self._batches.get()
+                self._inference_waiting.clear()
+                clock.starved += time.perf_counter() - waited
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                frames, batch = item
+                busy = time.perf_counter()
+                predictions = self.model_loader.predict_ensemble_batch(batch) if batch is not None else []
+                results = [self.model_loader.aggregate_predictions(individual) for individual in predictions]
+                if self.face_cropper is not None:
+                    results = self._combine_faces(frames, results)
+                clock.busy += time.perf_counter() - busy
+                self.batch_sizes.append(len(predictions))
+
+                yield from zip([frame_number for frame_number, _ in frames], results)
+        finally:
+            self._stop.set()
+            self._inference_waiting.set()
+            for thread in threads:
+                thread.join()
+            self.wall += time.perf_counter() - started
+
+    def _combine_faces(self, frames: list, results: list) -> list:
+        """One result per frame from the results of its face crops"""
+        combined = []
+        row = 0
+        for _, faces in frames:
+            combined.append(combine_faces(faces, results[row:row + len(faces)]))
+            row += len(faces)
+        return combined
+
+    def _put(self, target: queue.Queue, item, clock: _StageClock):
+        """Blocking put that gives up once the pipeline is stopped"""
+        waited = time.perf_counter()
+        try:
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped()
+                try:
+                    target.put(item, timeout=self.POLL_SECONDS)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            clock.blocked += time.perf_counter() - waited
+
+    def _decode(self, video_path: str, frame_numbers: list, seek: bool):
+        clock = self.clocks["decode"]
+        started = time.perf_counter()
+        blocked_before = clock.blocked
+
+        def on_frame(frame_number: int, frame, planned: int):
+            self._put(self._frames, (frame_number, frame), clock)
+
+        try:
+            _, stats = self.sampler.read(video_path, frame_numbers, on_frame=on_frame, seek=seek)
+            self.decoder_runs.append(stats)
+        except _Stopped:
+            return
+        except Exception as e:
+            print(f"Error extracting video frames: {e}")
+        finally:
+            clock.busy += time.perf_counter() - started - (clock.blocked - blocked_before)
+        try:
+            self._put(self._frames, _END, clock)
+        except _Stopped:
+            pass
+
+    def _preprocess(self):
+        clock = self.clocks["preprocess"]
+        # (frame number, faces or None) per frame, and the resized rows of the batch
+        frames = []
+        pending = []
+        try:
+            while True:
+                # Hand over a partial batch rather than keep inference waiting
+                if frames and self._inference_waiting.is_set() and self._frames.empty():
+                    frames, pending = self._flush(frames, pending, clock)
+
+                waited = time.perf_counter()
+                try:
+                    item = self._frames.get(timeout=self.POLL_SECONDS)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                finally:
+                    clock.starved += time.perf_counter() - waited
+
+                if item is _END:
+                    if frames:
+                        self._flush(frames, pending, clock)
+                    self._put(self._batches, _END, clock)
+                    return
+
+                frame_number, frame = item
+                busy = time.perf_counter()
+                if self.face_cropper is None:
+                    pending.append(self.model_loader.resize_input(frame, 'bgr'))
+                    frames.append((frame_number, None))
+                else:
+                    faces, crops = self.face_cropper.crops(frame, 'bgr')
+                    pending.extend(self.model_loader.resize_input(crop, 'bgr') for crop in crops)
+                    frames.append((frame_number, faces))
+                clock.busy += time.perf_counter() - busy
+
+                if len(pending) >= self.batch_size or len(frames) >= self.batch_size:
+                    frames, pending = self._flush(frames, pending, clock)
+        except _Stopped:
+            return
+        except Exception as e:
+            try:
+                self._put(self._batches, e, clock)
+            except _Stopped:
+                pass
+
+    def _flush(self, frames: list, pending: list, clock: _StageClock) -> Tuple[list, list]:
+        """Normalize the pending frames into a batch for inference and start a new one"""
+        busy = time.perf_counter()
+        # Not reused: the batch waits in the queue while the next one is prepared
+        batch = self.model_loader.normalize_inputs(pending) if pending else None
+        clock.busy += time.perf_counter() - busy
+        self._put(self._batches, (frames, batch), clock)
+        return [], []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-stage occupancy and stall times over all runs"""
+        stages = {name: clock.report(self.wall) for name, clock in self.clocks.items()}
+        return {
+            "wall_seconds": self.wall,
+            "stages": stages,
+            "bound": max(stages, key=lambda name: stages[name]["occupancy"]),
+            "batch_sizes": list(self.batch_sizes),
+            "decoder": list(self.decoder_runs)
+        }
@@ -0,0 +1,471 @@
+"""
+Video frame sampling
+Reads evenly spaced frames from a video without decoding every frame up to the
+last one, and plans adaptive sampling that stops once the verdict is settled
+"""
+
+import math
+import os
+import shutil
+import subprocess
+import time
+from statistics import NormalDist
+from typing import Dict, Any, Tuple, Optional, Callable
+
+import cv2
+import numpy as np
+
+
+def sample_indices(total_frames: int, max_frames: int) -> list:
+    """Evenly spaced, sorted frame indices covering the whole video"""
+    if total_frames <= 0 or max_frames <= 0:
+        return []
+    indices = np.linspace(0, total_frames - 1, min(max_frames, total_frames), dtype=int)
+    return sorted(set(int(i) for i in indices))
+
+
+class FrameSampler:
+    """
+    Evenly spaced frame sampler
+
+    Frames are visited in order. Short gaps between sampled frames are skipped
+    with grab(), which still decodes but skips the colour conversion and copy
+    that read() does. Gaps longer than `seek_min_gap` frames are skipped by seeking,
+    so the decoder only works from the keyframe before the target. A seek that
+    costs more than grabbing over the gap would have (keyframes far apart) turns
+    seeking off for the rest of the video. Containers where a seek fails or lands
+    on the wrong frame fall back to stepping through the video with grab().
+
+    This is the OpenCV decoder. Other decoders subclass it and override read(),
+    keeping probe() and sample(); create_frame_sampler() picks one by VIDEO_DECODER.
+    """
+
+    decoder = "opencv"
+
+    # Frames grabbed before the first seek to price stepping over one frame
+    CALIBRATION_FRAMES = 4
+
+    def __init__(self, seek_min_gap: int = 30):
+        # 0 disables seeking
+        self.seek_min_gap = max(0, int(seek_min_gap))
+
+    @classmethod
+    def from_env(cls) -> "FrameSampler":
+        """Build a sampler from VIDEO_SEEK_MIN_GAP"""
+        return cls(seek_min_gap=int(os.getenv("VIDEO_SEEK_MIN_GAP", "30")))
+
+    def probe(self, video_path: str) -> Dict[str, Any]:
+        """
+        Frame count and frame rate of a video
+
+        The count is taken from the container header; when the header has none
+        the frames are counted with grab(), and such videos are not seeked.
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+            seekable = total_frames > 0
+            if not seekable:
+                total_frames = self._count_frames(cap)
+        finally:
+            cap.release()
+        return {"total_frames": total_frames, "fps": fps, "seekable": seekable}
+
+    def sample(self, video_path: str, max_frames: int = 10,
+               on_frame: Optional[Callable[[int, np.ndarray, int], None]] = None) -> Tuple[list, Dict[str, Any]]:
+        """
+        Read up to `max_frames` evenly spaced BGR frames
+
+        Args:
+            video_path: Path to the video file
+            max_frames: Number of frames to sample
+            on_frame: Optional callable receiving (frame_number, frame, frames_planned) as
+                each frame is read; the frames are then handed over instead of collected
+
+        Returns:
+            (frames in video order, stats) where stats holds the method used and
+            how many frames were read, grabbed and seeked to
+        """
+        info = self.probe(video_path)
+        return self.read(video_path, sample_indices(info["total_frames"], max_frames), on_frame,
+                         seek=info["seekable"])
+
+    def read(self, video_path: str, indices: list,
+             on_frame: Optional[Callable[[int, np.ndarray, int], None]] = None,
+             seek: bool = True) -> Tuple[list, Dict[str, Any]]:
+        """
+        Read the given frame numbers; takes the same `on_frame` and returns the same as sample()
+
+        Pass seek=False for videos whose probe() found them unseekable.
+        """
+        targets = sorted(set(indices))
+        seek = seek and self.seek_min_gap > 0
+        stats = {"decoder": self.decoder, "method": "seek" if seek else "sequential",
+                 "frames_planned": len(targets), "frames_read": 0, "frames_grabbed": 0, "seeks": 0}
+        frames = {}
+
+        def keep(target: int, frame: np.ndarray):
+            stats["frames_read"] += 1
+            if on_frame is None:
+                frames[target] = frame
+            else:
+                frames[target] = None
+                on_frame(target, frame, len(targets))
+
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if seek:
+                if not self._read_seeking(cap, targets, keep, stats):
+                    stats["method"] = "sequential_fallback"
+                    cap.release()
+                    cap = cv2.VideoCapture(video_path)
+                    self._read_sequential(cap, [t for t in targets if t not in frames], keep, stats)
+            else:
+                self._read_sequential(cap, targets, keep, stats)
+        finally:
+            cap.release()
+
+        if on_frame is not None:
+            return [], stats
+        return [frames[index] for index in sorted(frames)], stats
+
+    def _read_seeking(self, cap, targets: list, keep: Callable, stats: Dict[str, Any]) -> bool:
+        """Read the targets, seeking over long gaps; False once the container misbehaves"""
+        position = 0
+        seeking = True
+        # Time to step over one frame, measured on the grabbed stretches
+        frame_seconds = None
+
+        for target in targets:
+            gap = target - position
+            if seeking and gap > self.seek_min_gap and frame_seconds is None:
+                # Time a few grabs first; the first read() also pays for decoder start-up
+                started = time.perf_counter()
+                for _ in range(self.CALIBRATION_FRAMES):
+                    if not cap.grab():
+                        return False
+                    stats["frames_grabbed"] += 1
+                frame_seconds = (time.perf_counter() - started) / self.CALIBRATION_FRAMES
+                position += self.CALIBRATION_FRAMES
+                gap -= self.CALIBRATION_FRAMES
+
+            seeked = seeking and gap > self.seek_min_gap
+            started = time.perf_counter()
+            if seeked:
+                if not cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                    return False
+                if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != target:
+                    return False
+                stats["seeks"] += 1
+            else:
+                for _ in range(gap):
+                    if not cap.grab():
+                        return False
+                    stats["frames_grabbed"] += 1
+
+            ok, frame = cap.read()
+            if not ok:
+                return False
+            elapsed = time.perf_counter() - started
+            keep(target, frame)
+            position = target + 1
+
+            if not seeked and gap > 0:
+                frame_seconds = elapsed / (gap + 1)
+            elif frame_seconds is not None and elapsed > (gap + 1) * frame_seconds:
+                # Keyframes are too far apart for seeking to pay off (long-GOP H.264);
+                # the decoder restarted further back than the frames it skipped
+                seeking = False
+                stats["method"] = "seek_then_grab"
+        return True
+
+    def _read_sequential(self, cap, targets: list, keep: Callable, stats: Dict[str, Any]):
+        """Read the targets stepping through the video from the start; stops at the end of the stream"""
+        position = 0
+        for target in targets:
+            while position < target:
+                if not cap.grab():
+                    return
+                stats["frames_grabbed"] += 1
+                position += 1
+
+            ok, frame = cap.read()
+            if not ok:
+                return
+            keep(target, frame)
+            position += 1
+
+    def _count_frames(self, cap) -> int:
+        count = 0
+        while cap.grab():
+            count += 1
+        return count
+
+
+class FfmpegFrameSampler(FrameSampler):
+    """
+    Frame sampler that decodes through an ffmpeg subprocess
+
+    ffmpeg picks out the requested frames and scales them to `size`×`size` BGR
+    while decoding, so full-resolution frames are never colour converted or
+    copied into Python. Frames in between are still decoded but not scaled. A gap
+    longer than `seek_min_gap` frames starts a new ffmpeg process seeked to the
+    next frame by timestamp at the average frame rate, so variable frame rate
+    clips can land a frame off. If ffmpeg cannot decode a video, the remaining
+    frames are read with OpenCV at full size.
+    """
+
+    decoder = "ffmpeg"
+
+    def __init__(self, seek_min_gap: int = 30, size: int = 224, ffmpeg_path: str = "ffmpeg"):
+        super().__init__(seek_min_gap)
+        self.size = int(size)
+        self.ffmpeg_path = ffmpeg_path
+
+    @classmethod
+    def from_env(cls) -> "FfmpegFrameSampler":
+        """Build a sampler from VIDEO_SEEK_MIN_GAP / VIDEO_DECODE_SIZE / VIDEO_FFMPEG_PATH"""
+        return cls(
+            seek_min_gap=int(os.getenv("VIDEO_SEEK_MIN_GAP", "30")),
+            size=int(os.getenv("VIDEO_DECODE_SIZE", "224")),
+            ffmpeg_path=os.getenv("VIDEO_FFMPEG_PATH", "ffmpeg")
+        )
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.ffmpeg_path) is not None
+
+    def read(self, video_path: str, indices: list,
+             on_frame: Optional[Callable[[int, np.ndarray, int], None]] = None,
+             seek: bool = True) -> Tuple[list, Dict[str, Any]]:
+        targets = sorted(set(indices))
+        seek = seek and self.seek_min_gap > 0
+        stats = {"decoder": self.decoder, "method": "seek" if seek else "sequential",
+                 "frames_planned": len(targets), "frames_read": 0, "seeks": 0, "processes": 0,
+                 "frame_size": [self.size, self.size]}
+        frames = {}
+
+        def keep(target: int, frame: np.ndarray):
+            stats["frames_read"] += 1
+            if on_frame is None:
+                frames[target] = frame
+            else:
+                frames[target] = None
+                on_frame(target, frame, len(targets))
+
+        # Runs of frames close enough together to decode through in one process
+        runs = []
+        for target in targets:
+            if runs and not (seek and target - runs[-1][-1] > self.seek_min_gap):
+                runs[-1].append(target)
+            else:
+                runs.append([target])
+
+        fps = self._frame_rate(video_path) if seek else 0.0
+        # Time to decode one frame, and to launch ffmpeg and reach the first frame
+        frame_seconds = startup_seconds = None
+        try:
+            index = 0
+            while index < len(runs):
+                run = runs[index]
+                start = run[0] if fps > 0 and run[0] > self.seek_min_gap else 0
+                calibrate = start == 0 and index + 1 < len(runs)
+                complete, arrivals = self._read_run(video_path, run, start, fps, keep, stats, calibrate)
+                if calibrate and len(arrivals) > len(run):
+                    frame_seconds = (arrivals[-1] - arrivals[-2]) / self.CALIBRATION_FRAMES
+                    startup_seconds = arrivals[0] - (run[0] + 1) * frame_seconds
+                elif start > 0 and frame_seconds is not None and arrivals:
+                    gap = run[0] - runs[index - 1][-1]
+                    if arrivals[0] - startup_seconds > gap * frame_seconds and index + 1 < len(runs):
+                        # Keyframes are too far apart for seeking to pay off (long-GOP
+                        # H.264); decode straight through the rest in one process
+                        runs[index + 1:] = [[target for later in runs[index + 1:] for target in later]]
+                        stats["method"] = "seek_then_decode"
+                if not complete:
+                    break
+                index += 1
+        except RuntimeError as e:
+            print(f"⚠️ ffmpeg could not decode {os.path.basename(video_path)}, falling back to OpenCV: {e}")
+            stats["method"] = "opencv_fallback"
+            remaining = [target for target in targets if target not in frames]
+            fallback, _ = FrameSampler.read(self, video_path, remaining, seek=seek)
+            for target, frame in zip(remaining, fallback):
+                keep(target, frame)
+
+        if on_frame is not None:
+            return [], stats
+        return [frames[index] for index in sorted(frames)], stats
+
+    def _read_run(self, video_path: str, run: list, start: int, fps: float,
+                  keep: Callable, stats: Dict[str, Any], calibrate: bool = False) -> Tuple[bool, list]:
+        """
+        Decode one run of frames, seeking to frame `start` first
+
+        With `calibrate`, one more frame CALIBRATION_FRAMES past the run is decoded
+        and dropped, to time stepping over frames. Returns whether the whole run
+        was read (False at the end of the stream) and the seconds from launch to
+        each frame.
+        """
+        command = [self.ffmpeg_path, "-v", "error", "-nostdin"]
+        if start > 0:
+            # Half a frame early, so the first frame decoded from there is `start`
+            command += ["-ss", f"{(start - 0.5) / fps:.6f}"]
+            stats["seeks"] += 1
+        wanted = run + [run[-1] + self.CALIBRATION_FRAMES] if calibrate else run
+        selected = "+".join(f"eq(n\\,{target - start})" for target in wanted)
+        command += ["-i", video_path, "-an", "-sn",
+                    "-vf", f"select='{selected}',scale={self.size}:{self.size}:flags=area",
+                    "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+
+        frame_bytes = self.size * self.size * 3
+        launched = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stats["processes"] += 1
+        arrivals = []
+        read = 0
+        try:
+            for target in wanted:
+                frame = bytearray(frame_bytes)
+                view = memoryview(frame)
+                filled = 0
+                while filled < frame_bytes:
+                    count = process.stdout.readinto(view[filled:])
+                    if not count:
+                        break
+                    filled += count
+                if filled < frame_bytes:
+                    break
+                arrivals.append(time.perf_counter() - launched)
+                if read < len(run):
+                    keep(target, np.frombuffer(frame, dtype=np.uint8).reshape(self.size, self.size, 3))
+                    read += 1
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            if len(arrivals) == len(wanted):
+                # Done with this run; don't let ffmpeg decode on to the end of the video
+                process.kill()
+            _, error = process.communicate()
+
+        if read < len(run) and process.returncode != 0:
+            message = error.decode(errors="replace").strip().splitlines()
+            raise RuntimeError(message[-1] if message else f"exit code {process.returncode}")
+        return read == len(run), arrivals
+
+    def _frame_rate(self, video_path: str) -> float:
+        cap = cv2.VideoCapture(video_path)
+        try:
+            return float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        finally:
+            cap.release()
+
+
+def create_frame_sampler() -> FrameSampler:
+    """Frame sampler for VIDEO_DECODER: 'opencv' (default) or 'ffmpeg'"""
+    decoder = os.getenv("VIDEO_DECODER", "opencv").lower()
+    if decoder == "ffmpeg":
+        sampler = FfmpegFrameSampler.from_env()
+        if sampler.available:
+            return sampler
+        print(f"⚠️ {sampler.ffmpeg_path} not found, decoding video with OpenCV")
+    elif decoder != "opencv":
+        raise ValueError(f"Unknown video decoder: {decoder}")
+    return FrameSampler.from_env()
+
+
+class AdaptiveSampling:
+    """
+    Frame plan for adaptive sampling with sequential early stopping
+
+    Scoring starts with `initial_frames` spread across the clip. Each later round
+    bisects the gaps between neighbouring scored frames whose scores disagree or
+    sit near 0.5, about half as many new frames as already scored. After every
+    round a one-sided test on the mean frame fake probability checks whether the
+    verdict is settled at `confidence`; the looks are Bonferroni-corrected and the
+    frame standard deviation is floored at `min_std` so a few near-identical frames
+    cannot settle it alone. Frames are capped at one per `seconds_per_frame` of video,
+    between `initial_frames` and `max_frames`.
+    """
+
+    def __init__(self, confidence: float = 0.95, initial_frames: int = 5, seconds_per_frame: float = 2.0,
+                 max_frames: int = 64, min_std: float = 0.1):
+        if not 0.5 < confidence < 1.0:
+            raise ValueError(f"confidence must be between 0.5 and 1, got {confidence}")
+        self.confidence = float(confidence)
+        self.initial_frames = max(2, int(initial_frames))
+        self.seconds_per_frame = float(seconds_per_frame)
+        self.max_frames = max(self.initial_frames, int(max_frames))
+        self.min_std = float(min_std)
+
+    @classmethod
+    def from_env(cls, confidence: float) -> "AdaptiveSampling":
+        """Build a plan from VIDEO_ADAPTIVE_INITIAL_FRAMES / VIDEO_SECONDS_PER_FRAME / VIDEO_ADAPTIVE_MAX_FRAMES"""
+        return cls(
+            confidence=confidence,
+            initial_frames=int(os.getenv("VIDEO_ADAPTIVE_INITIAL_FRAMES", "5")),
+            seconds_per_frame=float(os.getenv("VIDEO_SECONDS_PER_FRAME", "2")),
+            max_frames=int(os.getenv("VIDEO_ADAPTIVE_MAX_FRAMES", "64"))
+        )
+
+    def frame_cap(self, total_frames: int, fps: float) -> int:
+        """Most frames worth scoring for a clip of this length"""
+        duration = total_frames / fps if fps > 0 else 0.0
+        by_duration = math.ceil(duration / self.seconds_per_frame) if self.seconds_per_frame > 0 else self.max_frames
+        return min(total_frames, max(self.initial_frames, min(self.max_frames, by_duration)))
+
+    def initial(self, total_frames: int, cap: int) -> list:
+        return sample_indices(total_frames, min(self.initial_frames, cap))
+
+    def _round_size(self, scored: int) -> int:
+        return max(2, math.ceil(scored / 2))
+
+    def max_looks(self, cap: int) -> int:
+        """Rounds needed to reach the frame cap, i.e. the most times the test can be checked"""
+        frames = min(self.initial_frames, cap)
+        looks = 1
+        while frames < cap:
+            frames += self._round_size(frames)
+            looks += 1
+        return looks
+
+    def is_decided(self, probabilities: list, cap: int) -> bool:
+        """True once the mean frame probability is on one side of 0.5 at the requested confidence"""
+        n = len(probabilities)
+        if n < 2:
+            return False
+        mean = float(np.mean(probabilities))
+        std = max(float(np.std(probabilities, ddof=1)), self.min_std)
+        alpha = (1.0 - self.confidence) / self.max_looks(cap)
+        z = NormalDist().inv_cdf(1.0 - alpha)
+        return abs(mean - 0.5) >= z * std / math.sqrt(n)
+
+    def refine(self, scores: Dict[int, float], attempted: set, cap: int) -> list:
+        """
+        Frame numbers for the next round: midpoints of the most uncertain gaps
+
+        Args:
+            scores: Fake probability of every frame scored so far, by frame number
+            attempted: Every frame number already requested, scored or not
+            cap: frame_cap() for the clip
+        """
+        budget = min(cap - len(attempted), self._round_size(len(scores)))
+        if budget <= 0:
+            return []
+
+        def uncertainty(p: float) -> float:
+            return 1.0 - abs(2.0 * p - 1.0)
+
+        numbers = sorted(scores)
+        candidates = []
+        for left, right in zip(numbers, numbers[1:]):
+            middle = (left + right) // 2
+            if middle in attempted or middle == left:
+                continue
+            p_left, p_right = scores[left], scores[right]
+            priority = abs(p_left - p_right) + (uncertainty(p_left) + uncertainty(p_right)) / 2.0
+            candidates.append((priority, right - left, middle))
+
+        candidates.sort(reverse=True)
+        return sorted(middle for _, _, middle in candidates[:budget])
@@ -0,0 +1,195 @@
+"""
+Time-sharded video scoring
+Splits the frames of a long video into contiguous time ranges and scores each
+range in its own worker process, with its own VideoCapture
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, Tuple
+
+import torch
+
+import metrics
+from video_pipeline import VideoPipeline
+
+# Per-process engine used by the shard workers
+_shard_engine = None
+
+
+def _init_shard_worker(threads: int):
+    """ProcessPoolExecutor initializer: one engine per shard worker, sharing the cores"""
+    global _shard_engine
+    # A shard worker never shards again itself
+    os.environ["VIDEO_SHARD_WORKERS"] = "0"
+    metrics.forward_batch_sizes()
+    torch.set_num_threads(threads)
+    from inference import DeepSecureInference
+    _shard_engine = DeepSecureInference(start_batching=False)
+    _shard_engine.warm_up()
+
+
+def _worker_ready() -> bool:
+    return _shard_engine is not None
+
+
+def _score_shard(video_path: str, frame_numbers: list, seek: bool, batch_size: int):
+    """Decode and score one time range; returns (results, pipeline stats, stage timings, batch sizes)"""
+    engine = _shard_engine
+    pipeline = VideoPipeline(engine.model_loader, engine.frame_sampler, batch_size, engine.pipeline_depth,
+                             engine.face_cropper)
+    with metrics.collect_timings() as timings:
+        results = list(pipeline.results(video_path, frame_numbers, seek))
+    return results, pipeline.get_stats(), timings, metrics.drain_batch_sizes()
+
+
+def split_ranges(frame_numbers: list, shards: int) -> list:
+    """Split sorted frame numbers into up to `shards` contiguous runs of near-equal size"""
+    frame_numbers = sorted(frame_numbers)
+    shards = max(1, min(shards, len(frame_numbers)))
+    size, extra = divmod(len(frame_numbers), shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (1 if shard < extra else 0)
+        ranges.append(frame_numbers[start:end])
+        start = end
+    return [frames for frames in ranges if frames]
+
+
+class VideoShardPool:
+    """
+    Worker processes for scoring long videos in parallel time ranges
+
+    Disabled with `workers` below 2. Workers are spawned (not forked, since the
+    serving process runs threads) and each loads its own engine, so memory grows
+    with the worker count. They start on first use or on start(); each gets an
+    equal share of the cores for its torch threads. Videos of at least
+    `min_seconds` are sharded.
+    """
+
+    def __init__(self, workers: int = 0, min_seconds: float = 120.0, threads_per_worker: int = None):
+        self.workers = max(0, int(workers))
+        self.min_seconds = float(min_seconds)
+        cores = os.cpu_count() or 1
+        self.threads_per_worker = max(1, int(threads_per_worker or cores // max(self.workers, 1)))
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "VideoShardPool":
+        """Build a pool from VIDEO_SHARD_WORKERS / VIDEO_SHARD_MIN_SECONDS / VIDEO_SHARD_THREADS"""
+        threads = os.getenv("VIDEO_SHARD_THREADS")
+        return cls(
+            workers=int(os.getenv("VIDEO_SHARD_WORKERS", "0")),
+            min_seconds=float(os.getenv("VIDEO_SHARD_MIN_SECONDS", "120")),
+            threads_per_worker=int(threads) if threads else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def should_shard(self, total_frames: int, fps: float) -> bool:
+        return self.enabled and fps > 0 and total_frames / fps >= self.min_seconds
+
+    def start(self):
+        """Spawn the workers and wait until each has loaded its models"""
+        with self._lock:
+            if self._pool is not None or not self.enabled:
+                return
+            print(f"🔄 Starting {self.workers} video shard workers ({self.threads_per_worker} threads each)...")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_worker,
+                initargs=(self.threads_per_worker,)
+            )
+            for future in [self._pool.submit(_worker_ready) for _ in range(self.workers)]:
+                future.result()
+            print("✅ Video shard workers ready")
+
+    def submit(self, video_path: str, frame_numbers: list, seek: bool, batch_size: int) -> Future:
+        """Score one time range on a worker; the future resolves to (results, pipeline stats, stage timings)"""
+        self.start()
+        return self._pool.submit(_score_shard, video_path, frame_numbers, seek, batch_size)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def scorer(self, batch_size: int) -> "ShardedVideoScorer":
+        self.start()
+        return ShardedVideoScorer(self, batch_size)
+
+
+class ShardedVideoScorer:
+    """
+    Drop-in for VideoPipeline that spreads each call's frames across the shard workers
+
+    results() yields a shard's frames as soon as that shard finishes, so frames
+    arrive in video order within a shard but not across shards; callers sort.
+    """
+
+    def __init__(self, pool: VideoShardPool, batch_size: int):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.shards = []
+        self.wall = 0.0
+        # Worker-seconds available: each call's wall time times its shard count
+        self.capacity = 0.0
+
+    def results(self, video_path: str, frame_numbers: list, seek: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        started = time.perf_counter()
+        ranges = split_ranges(frame_numbers, self.pool.workers)
+        futures = {
+            self.pool.submit(video_path, frames, seek, self.batch_size): frames
+            for frames in ranges
+        }
+        try:
+            for future in as_completed(futures):
+                results, stats, timings, batch_sizes = future.result()
+                metrics.add_timings(timings)
+                metrics.add_batch_sizes(batch_sizes)
+                frames = futures[future]
+                self.shards.append(dict(stats, frame_range=[frames[0], frames[-1]], frames=len(frames)))
+                yield from results
+        finally:
+            for future in futures:
+                future.cancel()
+            elapsed = time.perf_counter() - started
+            self.wall += elapsed
+            self.capacity += elapsed * len(ranges)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """VideoPipeline-style stats summed over the shards, plus each shard's own"""
+        stages = {}
+        for shard in self.shards:
+            for name, stage in shard["stages"].items():
+                total = stages.setdefault(name, {"busy_seconds": 0.0, "starved_seconds": 0.0, "blocked_seconds": 0.0})
+                for key in total:
+                    total[key] += stage[key]
+        for stage in stages.values():
+            stage["occupancy"] = (stage["busy_seconds"] / self.capacity) if self.capacity > 0 else 0.0
+
+        return {
+            "wall_seconds": self.wall,
+            "stages": stages,
+            "bound": max(stages, key=lambda name: stages[name]["occupancy"]) if stages else None,
+            "batch_sizes": [size for shard in self.shards for size in shard["batch_sizes"]],
+            "decoder": [run for shard in self.shards for run in shard["decoder"]],
+            "shards": [
+                {
+                    "frame_range": shard["frame_range"],
+                    "frames": shard["frames"],
+                    "wall_seconds": shard["wall_seconds"],
+                    "bound": shard["bound"]
+                }
+                for shard in self.shards
+            ]
+        }